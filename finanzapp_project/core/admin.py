@@ -1,11 +1,101 @@
+import os
+
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Case, CharField, DateField, DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Concat, LPad
+from django.http import FileResponse, Http404
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.urls import path, reverse
+from django.utils.html import format_html_join
 from .models import (
-    Deudor, Deuda, PagoDeuda, CuotaDiferida, 
+    Deudor, Deuda, PagoDeuda, CuotaDiferida, CausacionInteres,
     Acreedor, MiDeuda, MiPago, RecordatorioDeuda,
     CategoriaFinanciera, SubcategoriaFinanciera, MovimientoFinanciero, 
-    PresupuestoCategoria, MetaFinanciera
+    PresupuestoCategoria, MetaFinanciera, SaldoDiario, PerfilPeticion,
+    MovimientoFinancieroArchivo, PagoDeudaArchivo, MiPagoArchivo,
+    LineaBaseGasto, AlertaGasto, AporteMeta, RegistroCambio, Trabajo
 )
 
+# ===== UTILIDADES PARA TABLAS GRANDES =====
+
+class PaginadorEstimado(Paginator):
+    """Paginador que, sin filtros y en PostgreSQL, usa el conteo estimado del planificador.
+
+    Un COUNT(*) exacto recorre la tabla completa; con millones de filas la
+    estadística de pg_class es suficiente para numerar las páginas.
+    """
+    umbral = 100000
+    
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        conexion = connections[queryset.db]
+        if conexion.vendor == 'postgresql' and not queryset.query.where:
+            with conexion.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table]
+                )
+                fila = cursor.fetchone()
+            if fila and fila[0] > self.umbral:
+                return fila[0]
+        return super().count
+
+class TablaGrandeAdmin(admin.ModelAdmin):
+    """Listados de tablas que crecen sin límite: sin conteo total y con conteo estimado"""
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    list_per_page = 50
+
+def filtro_texto(campo, titulo):
+    """Filtro lateral con una caja de búsqueda en lugar de listar todas las filas relacionadas.
+
+    ``filtro_texto('categoria__nombre', 'categoría')`` filtra con ``icontains``.
+    """
+    class FiltroTexto(admin.SimpleListFilter):
+        title = titulo
+        parameter_name = campo
+        template = 'admin/filtro_texto.html'
+        
+        def lookups(self, request, model_admin):
+            return ()
+        
+        def has_output(self):
+            return True
+        
+        def queryset(self, request, queryset):
+            if self.value():
+                return queryset.filter(**{f'{campo}__icontains': self.value()})
+            return queryset
+        
+        def choices(self, changelist):
+            yield {
+                'valor': self.value() or '',
+                'parametro': self.parameter_name,
+                'otros': [
+                    (clave, valor)
+                    for clave, valores in changelist.get_filters_params().items() if clave != self.parameter_name
+                    for valor in (valores if isinstance(valores, list) else [valores])
+                ],
+                'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            }
+    
+    FiltroTexto.__name__ = f'Filtro_{campo}'
+    return FiltroTexto
+
+class SoloLecturaAdmin(TablaGrandeAdmin):
+    """Tablas derivadas o históricas: se consultan pero no se editan desde el admin"""
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # ===== ADMIN PARA DEUDORES (LO QUE ME DEBEN) =====
 
 @admin.register(Deudor)
@@ -16,23 +106,32 @@ class DeudorAdmin(admin.ModelAdmin):
     ordering = ['nombre']
 
 @admin.register(Deuda)
-class DeudaAdmin(admin.ModelAdmin):
-    list_display = ['deudor', 'concepto', 'monto_original', 'monto_pendiente', 'fecha_vencimiento', 'estado']
-    list_filter = ['estado', 'tipo_pago', 'fecha_prestamo']
+class DeudaAdmin(TablaGrandeAdmin):
+    list_display = [
+        'deudor', 'concepto', 'monto_original', 'monto_pendiente', 'interes_causado', 'interes_pagado', 'total_pendiente',
+        'fecha_vencimiento', 'estado'
+    ]
+    list_filter = ['estado', 'tipo_pago', 'periodo_tasa', filtro_texto('deudor__nombre', 'deudor'), 'fecha_prestamo']
     search_fields = ['deudor__nombre', 'concepto']
     date_hierarchy = 'fecha_prestamo'
+    list_select_related = ['deudor']
+    autocomplete_fields = ['deudor']
 
 @admin.register(PagoDeuda)
-class PagoDeudaAdmin(admin.ModelAdmin):
+class PagoDeudaAdmin(TablaGrandeAdmin):
     list_display = ['deuda', 'monto_pago', 'fecha_pago', 'metodo_pago']
-    list_filter = ['metodo_pago', 'fecha_pago']
+    list_filter = ['metodo_pago', filtro_texto('deuda__deudor__nombre', 'deudor'), 'fecha_pago']
     search_fields = ['deuda__deudor__nombre', 'comprobante']
+    list_select_related = ['deuda__deudor']
+    autocomplete_fields = ['deuda']
 
 @admin.register(CuotaDiferida)
-class CuotaDiferidaAdmin(admin.ModelAdmin):
+class CuotaDiferidaAdmin(TablaGrandeAdmin):
     list_display = ['deuda', 'numero_cuota', 'monto_cuota', 'fecha_vencimiento', 'pagada']
     list_filter = ['pagada', 'fecha_vencimiento']
     search_fields = ['deuda__deudor__nombre']
+    list_select_related = ['deuda__deudor']
+    autocomplete_fields = ['deuda']
 
 # ===== ADMIN PARA MIS DEUDAS (LO QUE DEBO) =====
 
@@ -50,15 +149,20 @@ class AcreedorAdmin(admin.ModelAdmin):
             'fields': ('telefono', 'email', 'direccion', 'contacto_principal')
         }),
         ('Configuración', {
-            'fields': ('activo', 'observaciones')
+            'fields': ('propietario', 'activo', 'observaciones')
         }),
     )
 
 @admin.register(MiDeuda)
-class MiDeudaAdmin(admin.ModelAdmin):
-    list_display = ['acreedor', 'tipo_deuda', 'concepto', 'monto_original', 'saldo_pendiente', 'fecha_vencimiento', 'prioridad', 'estado']
-    list_filter = ['tipo_deuda', 'estado', 'prioridad', 'fecha_contrato', 'acreedor']
+class MiDeudaAdmin(TablaGrandeAdmin):
+    list_display = [
+        'acreedor', 'tipo_deuda', 'concepto', 'monto_original', 'saldo_pendiente', 'interes_causado', 'interes_pagado',
+        'total_pendiente', 'fecha_vencimiento', 'prioridad', 'estado'
+    ]
+    list_filter = ['tipo_deuda', 'estado', 'prioridad', 'fecha_contrato', filtro_texto('acreedor__nombre', 'acreedor')]
     search_fields = ['acreedor__nombre', 'concepto', 'numero_cuenta']
+    list_select_related = ['acreedor']
+    autocomplete_fields = ['acreedor']
     date_hierarchy = 'fecha_contrato'
     ordering = ['-fecha_contrato']
     readonly_fields = ['fecha_creacion', 'fecha_actualizacion']
@@ -83,10 +187,12 @@ class MiDeudaAdmin(admin.ModelAdmin):
     )
 
 @admin.register(MiPago)
-class MiPagoAdmin(admin.ModelAdmin):
+class MiPagoAdmin(TablaGrandeAdmin):
     list_display = ['mi_deuda', 'monto_pago', 'monto_capital', 'monto_interes', 'fecha_pago', 'metodo_pago']
-    list_filter = ['metodo_pago', 'fecha_pago', 'mi_deuda__acreedor']
+    list_filter = ['metodo_pago', 'fecha_pago', filtro_texto('mi_deuda__acreedor__nombre', 'acreedor')]
     search_fields = ['mi_deuda__acreedor__nombre', 'numero_transaccion', 'comprobante']
+    list_select_related = ['mi_deuda__acreedor']
+    autocomplete_fields = ['mi_deuda']
     date_hierarchy = 'fecha_pago'
     ordering = ['-fecha_pago']
     
@@ -111,6 +217,8 @@ class RecordatorioDeudaAdmin(admin.ModelAdmin):
     list_filter = ['activo', 'enviado', 'fecha_recordatorio']
     search_fields = ['mi_deuda__acreedor__nombre', 'mensaje']
     ordering = ['fecha_recordatorio']
+    list_select_related = ['mi_deuda__acreedor']
+    autocomplete_fields = ['mi_deuda']
 
 # ===== ADMIN PARA INGRESOS Y EGRESOS =====
 
@@ -126,7 +234,7 @@ class CategoriaFinancieraAdmin(admin.ModelAdmin):
             'fields': ('nombre', 'tipo', 'naturaleza')
         }),
         ('Detalles', {
-            'fields': ('descripcion', 'activo')
+            'fields': ('propietario', 'descripcion', 'activo')
         }),
     )
 
@@ -136,15 +244,19 @@ class SubcategoriaFinancieraAdmin(admin.ModelAdmin):
     list_filter = ['categoria__tipo', 'categoria__naturaleza', 'activo']
     search_fields = ['nombre', 'categoria__nombre']
     ordering = ['categoria__tipo', 'categoria__nombre', 'nombre']
+    list_select_related = ['categoria']
+    autocomplete_fields = ['categoria']
 
 @admin.register(MovimientoFinanciero)
-class MovimientoFinancieroAdmin(admin.ModelAdmin):
+class MovimientoFinancieroAdmin(TablaGrandeAdmin):
     list_display = ['descripcion', 'tipo', 'categoria', 'subcategoria', 'monto', 'fecha', 'metodo_pago']
-    list_filter = ['tipo', 'categoria', 'metodo_pago', 'es_recurrente', 'fecha']
+    list_filter = ['tipo', filtro_texto('categoria__nombre', 'categoría'), 'metodo_pago', 'es_recurrente', 'fecha']
     search_fields = ['descripcion', 'categoria__nombre', 'subcategoria__nombre', 'referencia']
     date_hierarchy = 'fecha'
     ordering = ['-fecha', '-fecha_creacion']
     readonly_fields = ['fecha_creacion', 'fecha_actualizacion']
+    list_select_related = ['categoria', 'subcategoria__categoria']
+    autocomplete_fields = ['categoria', 'subcategoria']
     
     fieldsets = (
         ('Información Principal', {
@@ -165,25 +277,72 @@ class MovimientoFinancieroAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
-    
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related('categoria', 'subcategoria')
+
+@admin.register(SaldoDiario)
+class SaldoDiarioAdmin(SoloLecturaAdmin):
+    # Tabla derivada de los movimientos: se regenera con reconstruir_saldos
+    list_display = ['fecha', 'propietario', 'ingresos', 'egresos', 'saldo_acumulado']
+    date_hierarchy = 'fecha'
+    ordering = ['-fecha']
+
+def _primer_dia(año, mes):
+    """Expresión SQL con la fecha del día 1 del año y mes dados (expresiones enteras)"""
+    return Cast(Concat(
+        Cast(año, CharField()), Value('-'), LPad(Cast(mes, CharField()), 2, Value('0')), Value('-01'),
+        output_field=CharField()
+    ), DateField())
 
 @admin.register(PresupuestoCategoria)
 class PresupuestoCategoriaAdmin(admin.ModelAdmin):
     list_display = ['categoria', 'año', 'mes', 'monto_presupuestado', 'monto_ejecutado', 'porcentaje_ejecucion']
-    list_filter = ['año', 'mes', 'categoria__tipo', 'categoria']
+    list_filter = ['año', 'mes', 'categoria__tipo', filtro_texto('categoria__nombre', 'categoría')]
     search_fields = ['categoria__nombre']
     ordering = ['-año', '-mes', 'categoria__nombre']
+    list_select_related = ['categoria']
+    autocomplete_fields = ['categoria']
+    
+    def get_queryset(self, request):
+        # El monto ejecutado se calcula en la misma consulta del listado (una
+        # subconsulta por fila en SQL) en lugar de un aggregate por fila en Python.
+        # El mes se filtra como rango de fechas para que la subconsulta use los índices por fecha
+        ejecutado = MovimientoFinanciero.objects.filter(
+            categoria=OuterRef('categoria'),
+            fecha__gte=OuterRef('inicio_mes'),
+            fecha__lt=OuterRef('fin_mes'),
+        ).order_by().values('categoria').annotate(total=Sum('monto')).values('total')
+        return super().get_queryset(request).annotate(
+            inicio_mes=_primer_dia(F('año'), F('mes')),
+            fin_mes=_primer_dia(
+                Case(When(mes=12, then=F('año') + 1), default=F('año'), output_field=IntegerField()),
+                Case(When(mes=12, then=Value(1)), default=F('mes') + 1, output_field=IntegerField()),
+            ),
+        ).annotate(
+            ejecutado=Coalesce(Subquery(ejecutado), Value(0), output_field=DecimalField(max_digits=15, decimal_places=2))
+        )
     
     def monto_ejecutado(self, obj):
-        return f"${obj.monto_ejecutado:,.2f}"
+        return f"${obj.ejecutado:,.2f}"
     monto_ejecutado.short_description = "Monto Ejecutado"
+    monto_ejecutado.admin_order_field = 'ejecutado'
     
     def porcentaje_ejecucion(self, obj):
-        return f"{obj.porcentaje_ejecucion:.1f}%"
+        if obj.monto_presupuestado > 0:
+            return f"{obj.ejecutado / obj.monto_presupuestado * 100:.1f}%"
+        return "0.0%"
     porcentaje_ejecucion.short_description = "% Ejecución"
 
+class AporteMetaInline(admin.TabularInline):
+    # Mantenidos por las señales de movimientos: solo lectura
+    model = AporteMeta
+    fields = ['mes', 'monto']
+    readonly_fields = ['mes', 'monto']
+    extra = 0
+    can_delete = False
+    ordering = ['-mes']
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(MetaFinanciera)
 class MetaFinancieraAdmin(admin.ModelAdmin):
     list_display = ['nombre', 'tipo', 'monto_objetivo', 'monto_actual', 'porcentaje_completado', 'fecha_objetivo', 'estado']
@@ -191,6 +350,8 @@ class MetaFinancieraAdmin(admin.ModelAdmin):
     search_fields = ['nombre', 'descripcion']
     ordering = ['-fecha_objetivo']
     readonly_fields = ['porcentaje_completado', 'monto_faltante', 'dias_restantes', 'fecha_creacion', 'fecha_actualizacion']
+    autocomplete_fields = ['categoria', 'subcategoria']
+    inlines = [AporteMetaInline]
     
     fieldsets = (
         ('Información Principal', {
@@ -202,8 +363,12 @@ class MetaFinancieraAdmin(admin.ModelAdmin):
         ('Fechas', {
             'fields': ('fecha_inicio', 'fecha_objetivo', 'dias_restantes')
         }),
+        ('Aportes automáticos', {
+            'fields': ('categoria', 'subcategoria'),
+            'description': 'Si se elige una categoría, sus movimientos desde la fecha de inicio actualizan el monto actual'
+        }),
         ('Estado', {
-            'fields': ('estado', 'notas')
+            'fields': ('propietario', 'estado', 'notas')
         }),
         ('Auditoría', {
             'fields': ('fecha_creacion', 'fecha_actualizacion'),
@@ -211,6 +376,140 @@ class MetaFinancieraAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_readonly_fields(self, request, obj=None):
+        campos = super().get_readonly_fields(request, obj)
+        if obj is not None and obj.vinculada:
+            # Lo mantienen los aportes de la categoría vinculada
+            return [*campos, 'monto_actual']
+        return campos
+    
     def porcentaje_completado(self, obj):
         return f"{obj.porcentaje_completado:.1f}%"
     porcentaje_completado.short_description = "% Completado"
+
+# ===== ADMIN PARA DETECCIÓN DE ANOMALÍAS =====
+
+@admin.register(LineaBaseGasto)
+class LineaBaseGastoAdmin(SoloLecturaAdmin):
+    # Tabla derivada: la mantiene el comando detectar_anomalias
+    list_display = ['categoria', 'subcategoria', 'ambito', 'dia_semana', 'n', 'media', 'desviacion', 'mediana', 'mad', 'actualizado']
+    list_filter = ['ambito', 'dia_semana']
+    search_fields = ['categoria__nombre', 'subcategoria__nombre']
+    list_select_related = ['categoria', 'subcategoria__categoria']
+
+@admin.register(AlertaGasto)
+class AlertaGastoAdmin(TablaGrandeAdmin):
+    list_display = ['fecha', 'tipo', 'categoria', 'subcategoria', 'monto', 'esperado', 'puntaje', 'revisada']
+    list_filter = ['tipo', 'revisada', filtro_texto('categoria__nombre', 'categoría'), 'fecha']
+    search_fields = ['categoria__nombre', 'subcategoria__nombre', 'movimiento__descripcion']
+    date_hierarchy = 'fecha'
+    ordering = ['-fecha', '-puntaje']
+    list_select_related = ['categoria', 'subcategoria__categoria']
+    list_editable = ['revisada']
+    readonly_fields = ['tipo', 'movimiento', 'categoria', 'subcategoria', 'fecha', 'monto', 'esperado', 'puntaje']
+    
+    def has_add_permission(self, request):
+        return False
+
+# ===== ADMIN PARA CAUSACIÓN DE INTERESES =====
+
+@admin.register(CausacionInteres)
+class CausacionInteresAdmin(SoloLecturaAdmin):
+    list_display = ['fecha', 'deuda', 'mi_deuda', 'saldo_base', 'tasa_interes', 'monto', 'propietario']
+    list_filter = ['fecha']
+    date_hierarchy = 'fecha'
+    list_select_related = ['deuda__deudor', 'mi_deuda__acreedor', 'propietario']
+
+# ===== ADMIN PARA SINCRONIZACIÓN =====
+
+@admin.register(RegistroCambio)
+class RegistroCambioAdmin(SoloLecturaAdmin):
+    list_display = ['id', 'recurso', 'objeto_id', 'operacion', 'propietario', 'fecha']
+    list_filter = ['recurso', 'operacion']
+    search_fields = ['=objeto_id']
+    list_select_related = ['propietario']
+
+# ===== ADMIN PARA TRABAJOS EN SEGUNDO PLANO =====
+
+@admin.register(Trabajo)
+class TrabajoAdmin(TablaGrandeAdmin):
+    list_display = ['id', 'tarea', 'estado', 'progreso', 'intentos', 'propietario', 'trabajador', 'fecha_creacion', 'fecha_fin']
+    list_filter = ['estado', 'tarea']
+    search_fields = ['=id', 'tarea', 'trabajador']
+    list_select_related = ['propietario']
+    readonly_fields = [
+        'progreso', 'mensaje', 'resultado', 'archivo', 'error', 'intentos', 'trabajador', 'latido',
+        'fecha_creacion', 'fecha_inicio', 'fecha_fin'
+    ]
+    actions = ['reencolar']
+    
+    @admin.action(description="Volver a encolar los trabajos seleccionados")
+    def reencolar(self, request, queryset):
+        cantidad = queryset.exclude(estado='EN_CURSO').update(
+            estado='PENDIENTE', intentos=0, error='', disponible_desde=timezone.now(), fecha_fin=None
+        )
+        self.message_user(request, f"{cantidad} trabajos encolados de nuevo")
+
+# ===== ADMIN PARA HISTÓRICO ARCHIVADO =====
+
+@admin.register(MovimientoFinancieroArchivo)
+class MovimientoFinancieroArchivoAdmin(SoloLecturaAdmin):
+    list_display = ['descripcion', 'tipo', 'categoria', 'monto', 'fecha', 'fecha_archivo']
+    list_filter = ['tipo', filtro_texto('categoria__nombre', 'categoría')]
+    search_fields = ['descripcion', 'referencia']
+    date_hierarchy = 'fecha'
+    list_select_related = ['categoria']
+
+@admin.register(PagoDeudaArchivo)
+class PagoDeudaArchivoAdmin(SoloLecturaAdmin):
+    list_display = ['deuda', 'monto_pago', 'fecha_pago', 'metodo_pago', 'fecha_archivo']
+    search_fields = ['comprobante']
+    date_hierarchy = 'fecha_pago'
+    list_select_related = ['deuda__deudor']
+
+@admin.register(MiPagoArchivo)
+class MiPagoArchivoAdmin(SoloLecturaAdmin):
+    list_display = ['mi_deuda', 'monto_pago', 'monto_capital', 'monto_interes', 'fecha_pago', 'fecha_archivo']
+    search_fields = ['numero_transaccion', 'comprobante']
+    date_hierarchy = 'fecha_pago'
+    list_select_related = ['mi_deuda__acreedor']
+
+# ===== ADMIN PARA DIAGNÓSTICO =====
+
+@admin.register(PerfilPeticion)
+class PerfilPeticionAdmin(SoloLecturaAdmin):
+    list_display = ['fecha', 'metodo', 'ruta', 'status', 'duracion_ms', 'modo', 'muestras', 'usuario', 'descargas']
+    list_filter = ['modo', 'metodo', 'status', 'fecha']
+    search_fields = ['ruta']
+    date_hierarchy = 'fecha'
+    ordering = ['-fecha']
+    list_select_related = ['usuario']
+    
+    def get_urls(self):
+        urls = [
+            path('<int:pk>/descargar/<str:tipo>/', self.admin_site.admin_view(self.descargar),
+                 name='core_perfilpeticion_descargar'),
+        ]
+        return urls + super().get_urls()
+    
+    def descargar(self, request, pk, tipo):
+        perfil = self.get_object(request, pk)
+        if perfil is None or not self.has_view_permission(request, perfil):
+            raise Http404("Perfil no encontrado")
+        nombre = {'prof': perfil.archivo_perfil, 'pilas': perfil.archivo_pilas}.get(tipo)
+        if not nombre:
+            raise Http404("Archivo no disponible")
+        directorio = getattr(settings, 'PERFILADOR_DIR', settings.BASE_DIR / 'perfiles')
+        ruta = os.path.join(directorio, os.path.basename(nombre))
+        if not os.path.exists(ruta):
+            raise Http404("El archivo ya no existe en el directorio de perfiles")
+        return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=os.path.basename(nombre))
+    
+    def descargas(self, obj):
+        tipos = [('prof', '.prof')] if obj.archivo_perfil else []
+        tipos.append(('pilas', 'pilas'))
+        return format_html_join(' | ', '<a href="{}">{}</a>', (
+            (reverse('admin:core_perfilpeticion_descargar', args=[obj.pk, tipo]), etiqueta)
+            for tipo, etiqueta in tipos
+        ))
+    descargas.short_description = "Descargas"
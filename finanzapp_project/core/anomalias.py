@@ -0,0 +1,331 @@
+"""Detección de gastos atípicos con líneas base incrementales (NumPy).
+
+Cada ejecución solo lee lo nuevo desde la última marca: los movimientos
+creados desde la marca de creación y los meses cerrados posteriores al
+último mes incorporado. La marca de creación va ANOMALIAS_RETRASO_SEGUNDOS
+por detrás del reloj: un movimiento cuya transacción aún no se confirma
+tiene una fecha_creacion anterior a la de otros ya visibles (y quizá un id
+menor), y una marca por id o por el último creado lo saltaría para siempre.
+Lo nuevo se puntúa contra la línea base vigente (z robusto
+con mediana y MAD) y después se incorpora a ella con la combinación de
+momentos de Chan et al. Mediana y MAD se recalculan sobre una ventana móvil
+acotada (ANOMALIAS_VENTANA_MESES), no sobre el historial completo.
+
+Las ediciones y borrados de movimientos ya incorporados no se descuentan de
+media/M2; ``reiniciar=True`` recalcula las líneas base de cero.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Sum
+from django.db.models.functions import Coalesce, ExtractIsoWeekDay, ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from . import sincronizacion
+from .models import AlertaGasto, LineaBaseGasto, MovimientoFinanciero
+
+TRANSACCION = 'TRANSACCION'
+MENSUAL = 'MENSUAL'
+
+# 0.6745 = cuantil 0.75 de la normal: hace el z robusto comparable al z clásico
+FACTOR_MAD = 0.6745
+
+def _parametros():
+    return (
+        getattr(settings, 'ANOMALIAS_UMBRAL', 3.5),
+        getattr(settings, 'ANOMALIAS_VENTANA_MESES', 12),
+        getattr(settings, 'ANOMALIAS_MINIMO_OBSERVACIONES', 8),
+    )
+
+def _corte_creacion():
+    """Los movimientos creados antes de este instante ya están confirmados (o no lo estarán)"""
+    return timezone.now() - timedelta(seconds=getattr(settings, 'ANOMALIAS_RETRASO_SEGUNDOS', 60))
+
+def _indice_mes(fecha):
+    return fecha.year * 12 + fecha.month - 1
+
+def _mes_de_indice(indice):
+    return date(indice // 12, indice % 12 + 1, 1)
+
+# ===== ESTADÍSTICA VECTORIZADA =====
+# Las claves de agrupación son filas (categoría, subcategoría o 0, extra) de
+# una matriz de enteros; extra es el día de la semana o el índice del mes.
+
+def _agrupar(claves):
+    """Índice de grupo de cada fila de claves y matriz de claves únicas"""
+    if not len(claves):
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 3), dtype=np.int64)
+    unicas, indices = np.unique(claves, axis=0, return_inverse=True)
+    return indices.reshape(-1), unicas
+
+def _clave(fila):
+    categoria_id, subcategoria_id, extra = (int(valor) for valor in fila)
+    return categoria_id, subcategoria_id or None, extra
+
+def momentos(indices, valores, grupos):
+    """n, media y M2 de cada grupo en una pasada (bincount)"""
+    n = np.bincount(indices, minlength=grupos).astype(float)
+    suma = np.bincount(indices, weights=valores, minlength=grupos)
+    media = np.divide(suma, n, out=np.zeros_like(suma), where=n > 0)
+    m2 = np.bincount(indices, weights=(valores - media[indices]) ** 2, minlength=grupos)
+    return n, media, m2
+
+def combinar(n_a, media_a, m2_a, n_b, media_b, m2_b):
+    """Combina (n, media, M2) de dos muestras sin volver a leer sus datos (Chan et al.)"""
+    n = n_a + n_b
+    if n == 0:
+        return 0, 0.0, 0.0
+    delta = media_b - media_a
+    return n, media_a + delta * n_b / n, m2_a + m2_b + delta ** 2 * n_a * n_b / n
+
+def medianas_mad(indices, valores, grupos):
+    """Mediana y MAD de cada grupo (ordenando una sola vez)"""
+    orden = np.lexsort((valores, indices))
+    indices, valores = indices[orden], valores[orden]
+    cortes = np.searchsorted(indices, np.arange(grupos + 1))
+    resultado = []
+    for grupo in range(grupos):
+        datos = valores[cortes[grupo]:cortes[grupo + 1]]
+        if not len(datos):
+            resultado.append((0.0, 0.0))
+            continue
+        mediana = float(np.median(datos))
+        resultado.append((mediana, float(np.median(np.abs(datos - mediana)))))
+    return resultado
+
+def puntajes(bases, indices, valores, minimo):
+    """z robusto de cada valor frente a la línea base de su grupo (NaN si no hay base suficiente).
+
+    ``bases`` tiene una línea (o None) por grupo: se resuelven pocas líneas en
+    Python y los puntajes de todas las observaciones se calculan a la vez.
+    """
+    def columna(atributo):
+        return np.array([getattr(linea, atributo) if linea is not None else 0.0 for linea in bases], dtype=float)[indices]
+    n, mediana, mad, media, desviacion = (columna(atributo) for atributo in ('n', 'mediana', 'mad', 'media', 'desviacion'))
+    z = np.full(len(valores), np.nan)
+    robusto = (n >= minimo) & (mad > 0)
+    clasico = (n >= minimo) & ~robusto & (desviacion > 0)
+    z[robusto] = FACTOR_MAD * (valores[robusto] - mediana[robusto]) / mad[robusto]
+    z[clasico] = (valores[clasico] - media[clasico]) / desviacion[clasico]
+    return z
+
+def _expandir(categorias, subcategorias, extras, *columnas):
+    """Cada observación cuenta para su categoría y, si la tiene, para su subcategoría.
+
+    Devuelve las claves y cada columna de valores repetida para las filas con subcategoría.
+    """
+    con_subcategoria = subcategorias > 0
+    claves = np.concatenate([
+        np.column_stack([categorias, np.zeros_like(subcategorias), extras]),
+        np.column_stack([categorias, subcategorias, extras])[con_subcategoria],
+    ])
+    return (claves, *(np.concatenate([columna, columna[con_subcategoria]]) for columna in columnas))
+
+def _matriz(queryset, *campos):
+    """Filas de values_list como matriz de floats, convertidas de una vez y no fila por fila"""
+    return np.array(list(queryset.values_list(*campos)), dtype=float).reshape(-1, len(campos))
+
+def _con_claves(egresos):
+    """Egresos con la subcategoría (0 si no tiene), el día de la semana y el índice del mes calculados en SQL"""
+    return egresos.annotate(
+        sub=Coalesce('subcategoria_id', 0),
+        dia=ExtractIsoWeekDay('fecha') - 1,
+        mes=ExtractYear('fecha') * 12 + ExtractMonth('fecha') - 1,
+    )
+
+# ===== ACTUALIZACIÓN =====
+
+def actualizar_lineas_base(propietario_id=None, todos=True, hoy=None, reiniciar=False):
+    """Actualiza líneas base y genera alertas; devuelve (líneas actualizadas, alertas creadas).
+
+    Con ``todos=True`` recorre todos los hogares con egresos; si no, solo
+    ``propietario_id`` (None = registros sin propietario).
+    """
+    hoy = hoy or timezone.now().date()
+    if todos:
+        propietarios = MovimientoFinanciero.objects.filter(tipo='EGRESO').order_by().values_list(
+            'propietario_id', flat=True
+        ).distinct()
+    else:
+        propietarios = [propietario_id]
+    lineas = alertas = 0
+    for propietario in list(propietarios):
+        actualizadas, creadas = _actualizar_propietario(propietario, hoy, reiniciar)
+        lineas += actualizadas
+        alertas += creadas
+    return lineas, alertas
+
+def _linea(lineas, propietario_id, categoria_id, subcategoria_id, ambito, dia_semana):
+    clave = (categoria_id, subcategoria_id, ambito, dia_semana)
+    if clave not in lineas:
+        lineas[clave] = LineaBaseGasto(
+            propietario_id=propietario_id, categoria_id=categoria_id, subcategoria_id=subcategoria_id,
+            ambito=ambito, dia_semana=dia_semana,
+        )
+    return lineas[clave]
+
+def _base_para(lineas, categoria_id, subcategoria_id, ambito, dia_semana=None):
+    """La línea base más específica disponible: subcategoría y si no, categoría"""
+    if subcategoria_id:
+        linea = lineas.get((categoria_id, subcategoria_id, ambito, dia_semana))
+        if linea is not None and linea.n:
+            return linea
+    return lineas.get((categoria_id, None, ambito, dia_semana))
+
+def _incorporar(lineas, propietario_id, claves, n, suma, suma_cuadrados, ambito):
+    """Incorpora a las líneas base conteos, sumas y sumas de cuadrados por clave"""
+    indices, unicas = _agrupar(claves)
+    grupos = len(unicas)
+    n = np.bincount(indices, weights=n, minlength=grupos)
+    suma = np.bincount(indices, weights=suma, minlength=grupos)
+    suma_cuadrados = np.bincount(indices, weights=suma_cuadrados, minlength=grupos)
+    media = np.divide(suma, n, out=np.zeros_like(suma), where=n > 0)
+    m2 = np.maximum(suma_cuadrados - suma * media, 0.0)
+    for i, fila in enumerate(unicas):
+        categoria_id, subcategoria_id, extra = _clave(fila)
+        linea = _linea(lineas, propietario_id, categoria_id, subcategoria_id, ambito,
+                       extra if ambito == TRANSACCION else None)
+        linea.n, linea.media, linea.m2 = combinar(linea.n, linea.media, linea.m2, int(n[i]), media[i], m2[i])
+
+def _actualizar_ventana(lineas, propietario_id, claves, valores, ambito):
+    for linea in lineas.values():
+        if linea.ambito == ambito:
+            linea.mediana = linea.mad = 0.0
+    indices, unicas = _agrupar(claves)
+    for fila, (mediana, mad) in zip(unicas, medianas_mad(indices, valores, len(unicas))):
+        categoria_id, subcategoria_id, extra = _clave(fila)
+        linea = _linea(lineas, propietario_id, categoria_id, subcategoria_id, ambito,
+                       extra if ambito == TRANSACCION else None)
+        linea.mediana, linea.mad = mediana, mad
+
+def _actualizar_propietario(propietario_id, hoy, reiniciar):
+    umbral, ventana_meses, minimo = _parametros()
+    inicio_mes = hoy.replace(day=1)
+    mes_actual = _indice_mes(inicio_mes)
+    corte_ventana = _mes_de_indice(mes_actual - ventana_meses)
+    egresos = MovimientoFinanciero.objects.filter(propietario_id=propietario_id, tipo='EGRESO')
+    
+    guardadas = LineaBaseGasto.objects.filter(propietario_id=propietario_id)
+    if reiniciar:
+        guardadas.delete()
+    lineas = {
+        (linea.categoria_id, linea.subcategoria_id, linea.ambito, linea.dia_semana): linea
+        for linea in guardadas
+    }
+    alertas = []
+    
+    # --- Transacciones nuevas: puntuar contra la base vigente e incorporarlas ---
+    # Intervalos [marca, corte) de fecha_creacion: cada movimiento se incorpora una sola vez
+    corte = _corte_creacion()
+    marca = max(
+        (linea.marca_creacion for linea in lineas.values() if linea.ambito == TRANSACCION and linea.marca_creacion),
+        default=None,
+    )
+    nuevos = egresos.filter(fecha_creacion__lt=corte)
+    if marca is not None:
+        nuevos = nuevos.filter(fecha_creacion__gte=marca)
+    nuevos = _con_claves(nuevos)
+    if any(linea.ambito == TRANSACCION for linea in lineas.values()):
+        # Sin líneas base (primera ejecución o reinicio) no hay contra qué puntuar ni hace falta leer las filas
+        pk, categoria, subcategoria, dia, monto = _matriz(
+            nuevos.order_by('pk'), 'pk', 'categoria_id', 'sub', 'dia', 'monto'
+        ).T
+        claves = np.column_stack([categoria, subcategoria, dia]).astype(np.int64)
+        indices, unicas = _agrupar(claves)
+        bases = [_base_para(lineas, c, s, TRANSACCION, dia) for c, s, dia in map(_clave, unicas)]
+        z = puntajes(bases, indices, monto, minimo)
+        atipicos = np.flatnonzero(z > umbral)
+        # Fecha y monto de la alerta salen de la fila (el Decimal exacto, no el float de la matriz)
+        originales = {
+            fila[0]: fila[1:]
+            for fila in egresos.filter(pk__in=pk[atipicos].astype(np.int64).tolist()).values_list('pk', 'fecha', 'monto')
+        }
+        for i in atipicos:
+            categoria_id, subcategoria_id, _ = _clave(claves[i])
+            fecha, monto_original = originales[int(pk[i])]
+            alertas.append(AlertaGasto(
+                propietario_id=propietario_id, tipo=TRANSACCION, movimiento_id=int(pk[i]),
+                categoria_id=categoria_id, subcategoria_id=subcategoria_id, fecha=fecha,
+                monto=monto_original, esperado=bases[indices[i]].mediana, puntaje=float(z[i]),
+            ))
+    
+    # Lo nuevo se incorpora con n, suma y suma de cuadrados agregados en SQL por clave
+    agregados = _matriz(
+        nuevos.values('categoria_id', 'sub', 'dia').annotate(
+            n=Count('pk'), suma=Sum('monto'), suma_cuadrados=Sum(F('monto') * F('monto')),
+        ).order_by(),
+        'categoria_id', 'sub', 'dia', 'n', 'suma', 'suma_cuadrados'
+    )
+    if len(agregados):
+        claves, n, suma, suma_cuadrados = _expandir(*agregados[:, :3].astype(np.int64).T, *agregados[:, 3:6].T)
+        _incorporar(lineas, propietario_id, claves, n, suma, suma_cuadrados, TRANSACCION)
+    
+    # --- Meses cerrados nuevos: totales por categoría/subcategoría ---
+    marca_mes = max((linea.marca for linea in lineas.values() if linea.ambito == MENSUAL), default=None)
+    if marca_mes is None:
+        primera = egresos.aggregate(primera=Min('fecha'))['primera']
+        marca_mes = _indice_mes(primera) - 1 if primera else mes_actual - 1
+    if marca_mes < mes_actual - 1:
+        filas = list(
+            _con_claves(egresos.filter(fecha__gte=_mes_de_indice(marca_mes + 1), fecha__lt=inicio_mes)).values(
+                'categoria_id', 'sub', 'mes'
+            ).annotate(total=Sum('monto')).order_by().values_list('categoria_id', 'sub', 'mes', 'total')
+        )
+        if filas:
+            # Totales en centavos enteros: el monto de la alerta es exacto
+            centavos = np.array([int(fila[3] * 100) for fila in filas], dtype=np.int64)
+            claves, centavos = _expandir(*np.array([fila[:3] for fila in filas], dtype=np.int64).T, centavos)
+            indices, unicas = _agrupar(claves)
+            totales_centavos = np.zeros(len(unicas), dtype=np.int64)
+            np.add.at(totales_centavos, indices, centavos)
+            totales = totales_centavos / 100
+            bases = [lineas.get((c, s, MENSUAL, None)) for c, s, _ in map(_clave, unicas)]
+            z = puntajes(bases, np.arange(len(unicas)), totales, minimo)
+            for i in np.flatnonzero(z > umbral):
+                categoria_id, subcategoria_id, mes = _clave(unicas[i])
+                alertas.append(AlertaGasto(
+                    propietario_id=propietario_id, tipo=MENSUAL, categoria_id=categoria_id,
+                    subcategoria_id=subcategoria_id, fecha=_mes_de_indice(mes),
+                    monto=Decimal(int(totales_centavos[i])).scaleb(-2), esperado=bases[i].mediana, puntaje=float(z[i]),
+                ))
+            # Cada total mensual es una observación de la línea base MENSUAL de su categoría/subcategoría
+            # (las claves sin el mes: * [1, 1, 0])
+            _incorporar(lineas, propietario_id, unicas * [1, 1, 0], np.ones(len(totales)), totales, totales ** 2, MENSUAL)
+        marca_mes = mes_actual - 1
+    
+    # --- Ventana móvil: mediana y MAD con una consulta acotada ---
+    ventana = _matriz(
+        _con_claves(egresos.filter(fecha__gte=corte_ventana)), 'categoria_id', 'sub', 'dia', 'mes', 'monto'
+    )
+    categoria, subcategoria, dia, mes = ventana[:, :4].astype(np.int64).T
+    claves, valores = _expandir(categoria, subcategoria, dia, ventana[:, 4])
+    _actualizar_ventana(lineas, propietario_id, claves, valores, TRANSACCION)
+    
+    # Totales de cada mes cerrado de la ventana y, sobre ellos, mediana y MAD por categoría/subcategoría
+    cerrados = mes < mes_actual
+    claves, valores = _expandir(categoria[cerrados], subcategoria[cerrados], mes[cerrados], ventana[cerrados, 4])
+    indices, meses = _agrupar(claves)
+    totales = np.bincount(indices, weights=valores, minlength=len(meses))
+    _actualizar_ventana(lineas, propietario_id, meses * [1, 1, 0], totales, MENSUAL)
+    
+    ahora = timezone.now()
+    for linea in lineas.values():
+        if linea.ambito == TRANSACCION:
+            linea.marca_creacion = corte
+        else:
+            linea.marca = marca_mes
+        linea.actualizado = ahora
+    
+    nuevas = [linea for linea in lineas.values() if linea.pk is None]
+    existentes = [linea for linea in lineas.values() if linea.pk is not None]
+    with transaction.atomic():
+        LineaBaseGasto.objects.bulk_create(nuevas, batch_size=1000)
+        LineaBaseGasto.objects.bulk_update(
+            existentes, ['n', 'media', 'm2', 'mediana', 'mad', 'marca', 'marca_creacion', 'actualizado'], batch_size=1000,
+        )
+        AlertaGasto.objects.bulk_create(alertas, batch_size=1000)
+        sincronizacion.registrar(alertas, 'C')
+    return len(lineas), len(alertas)
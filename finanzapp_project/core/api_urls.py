@@ -1,18 +1,30 @@
 from django.urls import path, include
-from rest_framework.routers import DefaultRouter
 from . import api_views
+from .masivo import RouterMasivo
 
-router = DefaultRouter()
+router = RouterMasivo()
 router.register(r'deudores', api_views.DeudorViewSet)
 router.register(r'deudas', api_views.DeudaViewSet)
 router.register(r'acreedores', api_views.AcreedorViewSet)
 router.register(r'mis-deudas', api_views.MiDeudaViewSet)
 router.register(r'categorias', api_views.CategoriaFinancieraViewSet)
 router.register(r'movimientos', api_views.MovimientoFinancieroViewSet)
+router.register(r'metas', api_views.MetaFinancieraViewSet)
+router.register(r'alertas', api_views.AlertaGastoViewSet)
+router.register(r'trabajos', api_views.TrabajoViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('conciliacion/', api_views.conciliar_extracto, name='conciliar-extracto'),
+    path('exportar/', api_views.exportar_columnar, name='exportar-columnar'),
+    path('sync/', api_views.sincronizar, name='sincronizar'),
     path('dashboard/stats/', api_views.dashboard_stats, name='dashboard-stats'),
     path('dashboard/movimientos/', api_views.movimientos_recientes, name='movimientos-recientes'),
     path('dashboard/graficos/', api_views.graficos_dashboard, name='graficos-dashboard'),
+    path('dashboard/saldos/', api_views.saldos_diarios, name='saldos-diarios'),
+    path('dashboard/metricas/', api_views.metricas_financieras, name='metricas-financieras'),
+    path('dashboard/async/stats/', api_views.dashboard_stats_async, name='dashboard-stats-async'),
+    path('dashboard/async/movimientos/', api_views.movimientos_recientes_async, name='movimientos-recientes-async'),
+    path('dashboard/async/graficos/', api_views.graficos_dashboard_async, name='graficos-dashboard-async'),
+    path('dashboard/eventos/', api_views.dashboard_eventos, name='dashboard-eventos'),
 ]
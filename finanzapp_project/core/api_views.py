@@ -1,93 +1,392 @@
-from rest_framework import viewsets, status
-from rest_framework.decorators import api_view
+import asyncio
+import os
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from rest_framework import mixins, viewsets, status
+from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from django.db import close_old_connections
 from django.db.models import Sum, Count
+from django.conf import settings
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from datetime import datetime, timedelta
+from django.views.decorators.http import require_GET
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 from .models import *
 from .serializers import *
+from . import catalogo, codificacion, estados_cuenta, eventos, exportacion, metas, reportes, sincronizacion, trabajos
+from .archivo import consultar
+from .conciliacion import conciliar, leer_extracto, linea_extracto
+from .masivo import OperacionesMasivasMixin
+
+class DelPropietarioMixin:
+    """Limita el queryset del viewset al hogar del usuario de la petición"""
+    
+    def get_queryset(self):
+        return super().get_queryset().de(self.request.user)
+
+class EstadoCuentaMixin:
+    """Acción estado-cuenta: movimientos con saldo corrido entre ?desde= y ?hasta=, por ?pagina= de ?limite= líneas"""
+    lineas_estado_cuenta = None
+    
+    @action(detail=True, methods=['get'], url_path='estado-cuenta')
+    def estado_cuenta(self, request, pk=None):
+        cuenta = self.get_object()
+        try:
+            desde = _fecha_parametro(request, 'desde', None)
+            hasta = _fecha_parametro(request, 'hasta', None)
+        except ValueError:
+            return Response({'error': 'Las fechas deben tener el formato AAAA-MM-DD'}, status=400)
+        try:
+            pagina = int(request.query_params.get('pagina', 1))
+            limite = int(request.query_params.get('limite', estados_cuenta.PAGINA))
+            if pagina < 1 or limite < 1:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'pagina y limite deben ser números enteros positivos'}, status=400)
+        limite = min(limite, estados_cuenta.PAGINA_MAXIMA)
+        
+        resultado = self.lineas_estado_cuenta(cuenta.pk, desde, hasta, limite, (pagina - 1) * limite)
+        return Response({
+            'desde': desde,
+            'hasta': hasta,
+            'pagina': pagina,
+            'limite': limite,
+            'total': resultado['total'],
+            'hay_mas': pagina * limite < resultado['total'],
+            'saldo_inicial': resultado['saldo_inicial'],
+            'saldo_final': resultado['saldo_final'],
+            'lineas': resultado['lineas'],
+        })
 
-class DeudorViewSet(viewsets.ModelViewSet):
+class DeudorViewSet(DelPropietarioMixin, EstadoCuentaMixin, OperacionesMasivasMixin, viewsets.ModelViewSet):
     queryset = Deudor.objects.filter(activo=True)
     serializer_class = DeudorSerializer
+    lineas_estado_cuenta = staticmethod(estados_cuenta.lineas_deudor)
+    
+    @action(detail=False, methods=['get'])
+    def cartera(self, request):
+        """Cartera por edades (por vencer, 0-30, 31-60, 61-90 y más de 90 días de mora) al ?fecha= (hoy por defecto)"""
+        try:
+            fecha = _fecha_parametro(request, 'fecha', None)
+        except ValueError:
+            return Response({'error': 'La fecha debe tener el formato AAAA-MM-DD'}, status=400)
+        return Response(reportes.cartera_por_edades(request.user, fecha))
 
-class DeudaViewSet(viewsets.ModelViewSet):
-    queryset = Deuda.objects.all()
+class DeudaViewSet(DelPropietarioMixin, OperacionesMasivasMixin, viewsets.ModelViewSet):
+    queryset = Deuda.objects.select_related('deudor')
     serializer_class = DeudaSerializer
 
-class AcreedorViewSet(viewsets.ModelViewSet):
+class AcreedorViewSet(DelPropietarioMixin, OperacionesMasivasMixin, viewsets.ModelViewSet):
     queryset = Acreedor.objects.filter(activo=True)
     serializer_class = AcreedorSerializer
 
-class MiDeudaViewSet(viewsets.ModelViewSet):
-    queryset = MiDeuda.objects.all()
+class MiDeudaViewSet(DelPropietarioMixin, EstadoCuentaMixin, OperacionesMasivasMixin, viewsets.ModelViewSet):
+    queryset = MiDeuda.objects.select_related('acreedor')
     serializer_class = MiDeudaSerializer
+    lineas_estado_cuenta = staticmethod(estados_cuenta.lineas_mi_deuda)
 
-class CategoriaFinancieraViewSet(viewsets.ModelViewSet):
+class CategoriaFinancieraViewSet(DelPropietarioMixin, OperacionesMasivasMixin, viewsets.ModelViewSet):
     queryset = CategoriaFinanciera.objects.filter(activo=True)
     serializer_class = CategoriaFinancieraSerializer
+    
+    @action(detail=False, methods=['get'])
+    def arbol(self, request):
+        """Árbol categoría → subcategoría con totales y presupuesto del mes ?año=&mes= (por defecto el actual)"""
+        hoy = timezone.now().date()
+        try:
+            año = int(request.query_params.get('año') or request.query_params.get('anio') or hoy.year)
+            mes = int(request.query_params.get('mes') or hoy.month)
+            _rango_mes(año, mes)
+        except ValueError:
+            return Response({'error': 'año y mes deben ser un año y un mes (1-12) válidos'}, status=400)
+        return Response(reportes.arbol_categorias(request.user, año, mes))
 
-class MovimientoFinancieroViewSet(viewsets.ModelViewSet):
+class MovimientoFinancieroViewSet(DelPropietarioMixin, OperacionesMasivasMixin, viewsets.ModelViewSet):
     queryset = MovimientoFinanciero.objects.all()
     serializer_class = MovimientoFinancieroSerializer
+    
+    @action(detail=False, methods=['get'])
+    def historico(self, request):
+        """Movimientos entre ?desde= y ?hasta=, incluyendo los archivados si el rango los alcanza"""
+        try:
+            desde = _fecha_parametro(request, 'desde', None)
+            hasta = _fecha_parametro(request, 'hasta', None)
+        except ValueError:
+            return Response({'error': 'Las fechas deben tener el formato AAAA-MM-DD'}, status=400)
+        if desde is None:
+            return Response({'error': 'El parámetro desde es obligatorio'}, status=400)
+        
+        usuario = request.user
+        filtros = {'propietario': usuario} if usuario.is_authenticated else {'propietario__isnull': True}
+        movimientos = []
+        for fila in consultar(MovimientoFinanciero, desde, hasta, **filtros):
+            fila.pop('propietario_id')
+            fila['monto'] = str(fila['monto'])
+            movimientos.append(fila)
+        return Response(movimientos)
 
-@api_view(['GET'])
-def dashboard_stats(request):
-    """Estadísticas para el dashboard"""
-    hoy = timezone.now().date()
-    mes_actual = hoy.month
-    ano_actual = hoy.year
+class MetaFinancieraViewSet(DelPropietarioMixin, OperacionesMasivasMixin, viewsets.ModelViewSet):
+    queryset = MetaFinanciera.objects.all()
+    serializer_class = MetaFinancieraSerializer
+    
+    def list(self, request, *args, **kwargs):
+        # Proyección de cumplimiento de todas las metas listadas en una sola consulta
+        queryset = self.filter_queryset(self.get_queryset())
+        pagina = self.paginate_queryset(queryset)
+        listadas = list(pagina if pagina is not None else queryset)
+        serializer = self.get_serializer(listadas, many=True, context={
+            **self.get_serializer_context(),
+            'proyecciones': metas.proyecciones(listadas),
+        })
+        if pagina is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+class AlertaGastoViewSet(DelPropietarioMixin, viewsets.ReadOnlyModelViewSet):
+    """Alertas de gasto atípico (comando detectar_anomalias); ?revisada=true|false"""
+    queryset = AlertaGasto.objects.all()
+    serializer_class = AlertaGastoSerializer
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        revisada = self.request.query_params.get('revisada')
+        if revisada in ('true', 'false'):
+            queryset = queryset.filter(revisada=revisada == 'true')
+        return queryset
     
+    @action(detail=True, methods=['post'])
+    def revisar(self, request, pk=None):
+        """Marca la alerta como revisada"""
+        alerta = self.get_object()
+        alerta.revisada = True
+        alerta.save(update_fields=['revisada'])
+        return Response(self.get_serializer(alerta).data)
+
+class TrabajoViewSet(DelPropietarioMixin, mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """Trabajos en segundo plano del hogar: POST {"tarea", "parametros"} encola (202) y GET consulta estado y avance"""
+    queryset = Trabajo.objects.all()
+    serializer_class = TrabajoSerializer
+    
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        trabajo = trabajos.encolar(
+            serializer.validated_data['tarea'],
+            propietario=request.user if request.user.is_authenticated else None,
+            parametros=serializer.validated_data.get('parametros', {}),
+        )
+        return Response(self.get_serializer(trabajo).data, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'])
+    def archivo(self, request, pk=None):
+        """Descarga el archivo de resultado de un trabajo completado"""
+        trabajo = self.get_object()
+        ruta = os.path.join(trabajos.directorio_resultados(), os.path.basename(trabajo.archivo))
+        if trabajo.estado != 'COMPLETADO' or not trabajo.archivo or not os.path.exists(ruta):
+            return Response({'error': 'El trabajo no tiene un archivo disponible'}, status=404)
+        return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=trabajo.archivo)
+
+# ===== SINCRONIZACIÓN INCREMENTAL =====
+
+# Recurso de la bitácora → viewset cuyo queryset y serializer dan sus datos actuales
+VIEWSETS_SINCRONIZADOS = {
+    sincronizacion.RECURSOS[viewset.queryset.model]: viewset
+    for viewset in (
+        DeudorViewSet, DeudaViewSet, AcreedorViewSet, MiDeudaViewSet, CategoriaFinancieraViewSet,
+        MovimientoFinancieroViewSet, MetaFinancieraViewSet, AlertaGastoViewSet,
+    )
+}
+
+@api_view(['GET'])
+def sincronizar(request):
+    """Cambios posteriores al cursor ?since=<secuencia>, por páginas de ?limite= (500 por defecto).
+
+    Sin since solo devuelve el cursor actual, que el cliente guarda tras su
+    carga completa. Las creaciones y actualizaciones traen los datos actuales
+    del registro; si ya no existe (o dejó de estar visible) se informa como
+    eliminación. Con hay_mas el cliente pide de nuevo desde el cursor devuelto.
+    """
     try:
-        # Estadísticas generales
-        total_deudores = Deudor.objects.filter(activo=True).count()
-        
-        total_por_cobrar = Deuda.objects.filter(
-            estado__in=['PENDIENTE', 'VENCIDA', 'PARCIAL']
-        ).aggregate(total=Sum('monto_pendiente'))['total'] or Decimal('0')
-        
-        total_acreedores = Acreedor.objects.filter(activo=True).count()
-        
-        total_por_pagar = MiDeuda.objects.filter(
-            estado__in=['PENDIENTE', 'VENCIDA', 'PARCIAL']
-        ).aggregate(total=Sum('saldo_pendiente'))['total'] or Decimal('0')
+        if 'since' not in request.query_params:
+            return Response({'cursor': sincronizacion.cursor_actual(request.user), 'cambios': [], 'hay_mas': False})
+        try:
+            desde = int(request.query_params['since'])
+            limite = int(request.query_params.get('limite', sincronizacion.PAGINA))
+            if limite < 1:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'since y limite deben ser números enteros positivos'}, status=400)
+        cambios, cursor, hay_mas = sincronizacion.cambios(
+            request.user, desde, min(limite, sincronizacion.PAGINA_MAXIMA)
+        )
         
-        # Movimientos del mes actual
-        ingresos_mes = MovimientoFinanciero.objects.filter(
-            tipo='INGRESO', 
-            fecha__month=mes_actual, 
-            fecha__year=ano_actual
-        ).aggregate(total=Sum('monto'))['total'] or Decimal('0')
-        
-        egresos_mes = MovimientoFinanciero.objects.filter(
-            tipo='EGRESO',
-            fecha__month=mes_actual,
-            fecha__year=ano_actual
-        ).aggregate(total=Sum('monto'))['total'] or Decimal('0')
-        
-        # Deudas vencidas
-        deudas_vencidas = Deuda.objects.filter(
+        # Una consulta por recurso para los datos de todos sus registros cambiados
+        ids = defaultdict(list)
+        for cambio in cambios:
+            if cambio['operacion'] != 'D':
+                ids[cambio['recurso']].append(cambio['id'])
+        datos = {}
+        for recurso, pks in ids.items():
+            viewset = VIEWSETS_SINCRONIZADOS[recurso]
+            instancias = list(viewset.queryset.de(request.user).filter(pk__in=pks))
+            contexto = {'request': request}
+            if recurso == 'metas':
+                contexto['proyecciones'] = metas.proyecciones(instancias)
+            datos[recurso] = {
+                fila['id']: fila
+                for fila in viewset.serializer_class(instancias, many=True, context=contexto).data
+            }
+        for cambio in cambios:
+            if cambio['operacion'] != 'D':
+                cambio['datos'] = datos[cambio['recurso']].get(cambio['id'])
+                if cambio['datos'] is None:
+                    cambio['operacion'] = 'D'
+                    del cambio['datos']
+        return Response({'cursor': cursor, 'cambios': cambios, 'hay_mas': hay_mas})
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+# ===== CONSULTAS DEL DASHBOARD =====
+# Cada consulta es independiente de las demás: las vistas síncronas las
+# ejecutan una tras otra y las asíncronas las lanzan en paralelo.
+
+def _rango_mes(año, mes):
+    """Primer día del mes y primer día del mes siguiente.
+
+    Filtrar por rango (y no por fecha__year/fecha__month) permite usar los
+    índices (propietario, tipo, fecha).
+    """
+    inicio = date(año, mes, 1)
+    fin = date(año + 1, 1, 1) if mes == 12 else date(año, mes + 1, 1)
+    return inicio, fin
+
+def _monto(total):
+    # SQLite devuelve las sumas con 15 cifras significativas: se redondean al centavo
+    return (total or Decimal('0')).quantize(Decimal('0.01'))
+
+def _total_movimientos(usuario, tipo, año, mes):
+    inicio, fin = _rango_mes(año, mes)
+    return lambda: _monto(MovimientoFinanciero.objects.de(usuario).filter(
+        tipo=tipo,
+        fecha__gte=inicio,
+        fecha__lt=fin
+    ).aggregate(total=Sum('monto'))['total'])
+
+def _consultas_stats(hoy, usuario):
+    """Consultas de dashboard_stats indexadas por la clave de la respuesta"""
+    propietario_id = usuario.pk if usuario.is_authenticated else None
+    return {
+        'total_deudores': lambda: Deudor.objects.de(usuario).filter(activo=True).count(),
+        'total_por_cobrar': lambda: _monto(Deuda.objects.de(usuario).filter(
+            estado__in=ESTADOS_ABIERTOS
+        ).aggregate(total=Sum(total_pendiente('monto_pendiente')))['total']),
+        'total_acreedores': lambda: Acreedor.objects.de(usuario).filter(activo=True).count(),
+        'total_por_pagar': lambda: _monto(MiDeuda.objects.de(usuario).filter(
+            estado__in=ESTADOS_ABIERTOS
+        ).aggregate(total=Sum(total_pendiente('saldo_pendiente')))['total']),
+        'ingresos_mes': _total_movimientos(usuario, 'INGRESO', hoy.year, hoy.month),
+        'egresos_mes': _total_movimientos(usuario, 'EGRESO', hoy.year, hoy.month),
+        'deudas_vencidas': lambda: Deuda.objects.de(usuario).filter(
             estado__in=['PENDIENTE', 'VENCIDA'],
             fecha_vencimiento__lt=hoy
-        ).count()
-        
-        mis_deudas_vencidas = MiDeuda.objects.filter(
+        ).count(),
+        'mis_deudas_vencidas': lambda: MiDeuda.objects.de(usuario).filter(
             estado__in=['PENDIENTE', 'VENCIDA'],
             fecha_vencimiento__lt=hoy
-        ).count()
-        
-        stats = {
-            'total_deudores': total_deudores,
-            'total_por_cobrar': float(total_por_cobrar),
-            'total_acreedores': total_acreedores,
-            'total_por_pagar': float(total_por_pagar),
-            'ingresos_mes': float(ingresos_mes),
-            'egresos_mes': float(egresos_mes),
-            'deudas_vencidas': deudas_vencidas,
-            'mis_deudas_vencidas': mis_deudas_vencidas,
-        }
-        
+        ).count(),
+        'saldo_actual': lambda: SaldoDiario.saldo_al(hoy, propietario_id),
+    }
+
+def _meses_graficos(hoy):
+    """Primer día de cada uno de los últimos 6 meses, del más reciente al más antiguo"""
+    return [hoy.replace(day=1) - timedelta(days=30*i) for i in range(6)]
+
+def _consultas_graficos(hoy, usuario):
+    consultas = {}
+    for i, mes in enumerate(_meses_graficos(hoy)):
+        consultas[('ingresos', i)] = _total_movimientos(usuario, 'INGRESO', mes.year, mes.month)
+        consultas[('egresos', i)] = _total_movimientos(usuario, 'EGRESO', mes.year, mes.month)
+    
+    # Gastos por categoría del mes actual
+    inicio, fin = _rango_mes(hoy.year, hoy.month)
+    consultas['gastos_por_categoria'] = lambda: list(MovimientoFinanciero.objects.de(usuario).filter(
+        tipo='EGRESO',
+        fecha__gte=inicio,
+        fecha__lt=fin
+    ).values('categoria_id').annotate(
+        total=Sum('monto')
+    ).order_by('-total')[:5])
+    propietario_id = usuario.pk if usuario.is_authenticated else None
+    consultas['nombres_categorias'] = lambda: catalogo.nombres_categorias(propietario_id)
+    return consultas
+
+def _formatear_graficos(hoy, valores):
+    nombres = valores['nombres_categorias']
+    return {
+        'ingresos_egresos_meses': [
+            {
+                'mes': mes.strftime('%B %Y'),
+                'ingresos': valores[('ingresos', i)],
+                'egresos': valores[('egresos', i)]
+            } for i, mes in enumerate(_meses_graficos(hoy))
+        ],
+        'gastos_por_categoria': [
+            {
+                'categoria__nombre': nombres.get(item['categoria_id']),
+                'total': _monto(item['total'])
+            } for item in valores['gastos_por_categoria']
+        ]
+    }
+
+def _movimientos_recientes(usuario):
+    movimientos = MovimientoFinanciero.objects.de(usuario).order_by('-fecha', '-fecha_creacion')[:10]
+    return MovimientoFinancieroSerializer(movimientos, many=True).data
+
+def _en_serie(consultas):
+    return {clave: consulta() for clave, consulta in consultas.items()}
+
+def _aislada(consulta):
+    """Envuelve la consulta para ejecutarla en un hilo del pool con su propia conexión.
+
+    Las conexiones de Django son locales a cada hilo: se cierran al terminar
+    (respetando CONN_MAX_AGE) igual que hace el ciclo de una petición.
+    """
+    def ejecutar():
+        close_old_connections()
+        try:
+            return consulta()
+        finally:
+            close_old_connections()
+    return ejecutar
+
+async def _en_paralelo(consultas):
+    """Ejecuta las consultas concurrentemente y devuelve sus resultados por clave.
+
+    Los métodos a* del ORM (aaggregate, acount...) pasan todos por el mismo
+    hilo de sync_to_async(thread_sensitive=True) y terminarían serializados,
+    por eso cada consulta corre en un hilo independiente (thread_sensitive=False).
+    """
+    resultados = await asyncio.gather(*(
+        sync_to_async(_aislada(consulta), thread_sensitive=False)()
+        for consulta in consultas.values()
+    ))
+    return dict(zip(consultas, resultados))
+
+# ===== VISTAS DEL DASHBOARD =====
+
+@api_view(['GET'])
+def dashboard_stats(request):
+    """Estadísticas para el dashboard"""
+    hoy = timezone.now().date()
+    
+    try:
+        stats = _en_serie(_consultas_stats(hoy, request.user))
         return Response(stats)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
@@ -96,9 +395,7 @@ def dashboard_stats(request):
 def movimientos_recientes(request):
     """Últimos movimientos financieros"""
     try:
-        movimientos = MovimientoFinanciero.objects.order_by('-fecha', '-fecha_creacion')[:10]
-        serializer = MovimientoFinancieroSerializer(movimientos, many=True)
-        return Response(serializer.data)
+        return Response(_movimientos_recientes(request.user))
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
@@ -107,47 +404,227 @@ def graficos_dashboard(request):
     """Datos para gráficos del dashboard"""
     try:
         hoy = timezone.now().date()
+        return Response(_formatear_graficos(hoy, _en_serie(_consultas_graficos(hoy, request.user))))
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+def saldos_diarios(request):
+    """Serie de saldos diarios entre ?desde= y ?hasta= (por defecto los últimos 90 días)"""
+    try:
+        hoy = timezone.now().date()
+        hasta = _fecha_parametro(request, 'hasta', hoy)
+        desde = _fecha_parametro(request, 'desde', hasta - timedelta(days=90))
+        if desde > hasta:
+            return Response({'error': 'desde debe ser anterior a hasta'}, status=400)
         
-        # Ingresos vs Egresos últimos 6 meses
-        meses = []
-        for i in range(6):
-            mes = hoy.replace(day=1) - timedelta(days=30*i)
-            
-            ingresos = MovimientoFinanciero.objects.filter(
-                tipo='INGRESO',
-                fecha__month=mes.month,
-                fecha__year=mes.year
-            ).aggregate(total=Sum('monto'))['total'] or Decimal('0')
-            
-            egresos = MovimientoFinanciero.objects.filter(
-                tipo='EGRESO',
-                fecha__month=mes.month,
-                fecha__year=mes.year
-            ).aggregate(total=Sum('monto'))['total'] or Decimal('0')
-            
-            meses.append({
-                'mes': mes.strftime('%B %Y'),
-                'ingresos': float(ingresos),
-                'egresos': float(egresos)
-            })
-        
-        # Gastos por categoría del mes actual
-        gastos_categoria = MovimientoFinanciero.objects.filter(
-            tipo='EGRESO',
-            fecha__month=hoy.month,
-            fecha__year=hoy.year
-        ).values('categoria__nombre').annotate(
-            total=Sum('monto')
-        ).order_by('-total')[:5]
-        
+        usuario = request.user
+        propietario_id = usuario.pk if usuario.is_authenticated else None
+        dias = SaldoDiario.objects.de(usuario).filter(fecha__range=(desde, hasta)).order_by('fecha')
         return Response({
-            'ingresos_egresos_meses': meses,
-            'gastos_por_categoria': [
+            'desde': desde,
+            'hasta': hasta,
+            'saldo_inicial': SaldoDiario.saldo_al(desde - timedelta(days=1), propietario_id),
+            'saldo_final': SaldoDiario.saldo_al(hasta, propietario_id),
+            'dias': [
                 {
-                    'categoria__nombre': item['categoria__nombre'],
-                    'total': float(item['total'] or 0)
-                } for item in gastos_categoria
+                    'fecha': dia.fecha,
+                    'ingresos': dia.ingresos,
+                    'egresos': dia.egresos,
+                    'saldo': dia.saldo_acumulado,
+                } for dia in dias
             ]
         })
+    except ValueError:
+        return Response({'error': 'Las fechas deben tener el formato AAAA-MM-DD'}, status=400)
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+def metricas_financieras(request):
+    """Métricas de salud financiera de los ?meses= (1-36, por defecto 6) que terminan en ?año=&mes=
+
+    Por defecto el periodo termina en el último mes cerrado.
+    """
+    try:
+        ultimo_cerrado = timezone.now().date().replace(day=1) - timedelta(days=1)
+        try:
+            año = int(request.query_params.get('año') or request.query_params.get('anio') or ultimo_cerrado.year)
+            mes = int(request.query_params.get('mes') or ultimo_cerrado.month)
+            meses = int(request.query_params.get('meses') or 6)
+            _rango_mes(año, mes)
+        except ValueError:
+            return Response({'error': 'año, mes y meses deben ser números válidos'}, status=400)
+        if not 1 <= meses <= 36:
+            return Response({'error': 'meses debe estar entre 1 y 36'}, status=400)
+        return Response(reportes.metricas_financieras(request.user, año, mes, meses))
     except Exception as e:
         return Response({'error': str(e)}, status=500)
+
+@api_view(['POST'])
+def conciliar_extracto(request):
+    """Concilia un extracto bancario: archivo CSV (campo archivo) o JSON {"lineas": [...]}.
+
+    Cada línea lleva fecha, monto (negativo = salida) y opcionalmente
+    referencia y descripcion. ?tolerancia_dias= (por defecto 3).
+    """
+    try:
+        try:
+            tolerancia = int(request.query_params.get('tolerancia_dias') or request.data.get('tolerancia_dias') or 3)
+        except (TypeError, ValueError):
+            return Response({'error': 'tolerancia_dias debe ser un número entero'}, status=400)
+        archivo = request.FILES.get('archivo')
+        if archivo is not None:
+            lineas, errores = leer_extracto(archivo.read().decode('utf-8-sig'))
+        else:
+            lineas, errores = [], []
+            for numero, datos in enumerate(request.data.get('lineas') or []):
+                try:
+                    lineas.append(linea_extracto(datos))
+                except ValueError as e:
+                    errores.append({'fila': numero, 'error': str(e)})
+        if errores:
+            return Response({'errores': errores}, status=400)
+        if not lineas:
+            return Response({'error': 'El extracto no tiene líneas'}, status=400)
+        return Response(conciliar(request.user, lineas, tolerancia))
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['POST'])
+def exportar_columnar(request):
+    """Encola la exportación del historial del hogar en formato columnar (202 con el trabajo).
+
+    formato=npz (por defecto): todas las tablas o las de tablas=movimientos,mis_pagos.
+    formato=parquet&tabla=movimientos: una tabla en Parquet (requiere pyarrow).
+    El archivo se descarga de /api/trabajos/<id>/archivo/ cuando el trabajo termina.
+    """
+    try:
+        def parametro(nombre, por_defecto=None):
+            return request.query_params.get(nombre) or request.data.get(nombre) or por_defecto
+        
+        formato = parametro('formato', 'npz')
+        if formato == 'npz':
+            tablas = parametro('tablas', '')
+            tablas = [tabla for tabla in (tablas.split(',') if isinstance(tablas, str) else tablas) if tabla] or None
+            desconocidas = set(tablas or ()) - set(exportacion.TABLAS)
+            if desconocidas:
+                return Response({'error': f"Tablas desconocidas: {', '.join(sorted(desconocidas))}"}, status=400)
+        elif formato == 'parquet':
+            tabla = parametro('tabla')
+            if tabla not in exportacion.TABLAS:
+                return Response({'error': f"tabla debe ser una de: {', '.join(exportacion.TABLAS)}"}, status=400)
+            if not exportacion.parquet_disponible():
+                return Response({'error': 'La exportación a Parquet requiere pyarrow'}, status=501)
+            tablas = [tabla]
+        else:
+            return Response({'error': 'formato debe ser npz o parquet'}, status=400)
+        trabajo = trabajos.encolar(
+            'exportar_columnar',
+            propietario=request.user if request.user.is_authenticated else None,
+            parametros={'tablas': tablas, 'formato': formato},
+        )
+        return Response(TrabajoSerializer(trabajo).data, status=status.HTTP_202_ACCEPTED)
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+def _fecha_parametro(request, nombre, por_defecto):
+    valor = request.query_params.get(nombre)
+    return datetime.strptime(valor, '%Y-%m-%d').date() if valor else por_defecto
+
+# ===== VERSIONES ASÍNCRONAS (ASGI) =====
+# Misma respuesta que las vistas anteriores; la latencia tiende a la de la
+# consulta más lenta en lugar de la suma de todas.
+
+async def _usuario(request):
+    """Usuario de la petición según los autenticadores de DRF (sesión, Basic...), como en las vistas @api_view"""
+    def autenticar():
+        autenticadores = [clase() for clase in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+        return Request(request, authenticators=autenticadores).user
+    return await sync_to_async(autenticar)()
+
+@require_GET
+async def dashboard_stats_async(request):
+    """Estadísticas para el dashboard con las consultas en paralelo"""
+    hoy = timezone.now().date()
+    
+    try:
+        usuario = await _usuario(request)
+        stats = await _en_paralelo(_consultas_stats(hoy, usuario))
+        return codificacion.RespuestaJSON(stats)
+    except AuthenticationFailed as e:
+        return JsonResponse({'error': str(e.detail)}, status=e.status_code)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@require_GET
+async def movimientos_recientes_async(request):
+    """Últimos movimientos financieros"""
+    try:
+        usuario = await _usuario(request)
+        datos = await sync_to_async(_aislada(lambda: _movimientos_recientes(usuario)), thread_sensitive=False)()
+        return codificacion.RespuestaJSON(datos)
+    except AuthenticationFailed as e:
+        return JsonResponse({'error': str(e.detail)}, status=e.status_code)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@require_GET
+async def graficos_dashboard_async(request):
+    """Datos para gráficos del dashboard con las consultas en paralelo"""
+    try:
+        hoy = timezone.now().date()
+        usuario = await _usuario(request)
+        graficos = _formatear_graficos(hoy, await _en_paralelo(_consultas_graficos(hoy, usuario)))
+        return codificacion.RespuestaJSON(graficos)
+    except AuthenticationFailed as e:
+        return JsonResponse({'error': str(e.detail)}, status=e.status_code)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+# ===== EVENTOS DEL DASHBOARD (SSE) =====
+
+def _evento_sse(nombre, datos):
+    return f"event: {nombre}\ndata: {codificacion.dumps(datos)}\n\n"
+
+@require_GET
+async def dashboard_eventos(request):
+    """Flujo Server-Sent Events con las estadísticas del dashboard.
+
+    El primer evento ``stats`` trae todas las estadísticas; los siguientes,
+    solo las claves que cambiaron tras escribir movimientos, deudas o pagos.
+    Las ráfagas de escrituras se agrupan (EVENTOS_VENTANA_SEGUNDOS) en un solo
+    recálculo y, sin cambios, se envía un comentario de latido para mantener
+    abierta la conexión. Requiere un servidor ASGI.
+    """
+    try:
+        usuario = await _usuario(request)
+    except AuthenticationFailed as e:
+        return JsonResponse({'error': str(e.detail)}, status=e.status_code)
+    propietario_id = usuario.pk if usuario.is_authenticated else None
+    ventana = getattr(settings, 'EVENTOS_VENTANA_SEGUNDOS', 0.5)
+    latido = getattr(settings, 'EVENTOS_LATIDO_SEGUNDOS', 15)
+    
+    async def flujo():
+        suscripcion = eventos.broker().suscribir(eventos.canal_hogar(propietario_id))
+        anteriores = {}
+        try:
+            while True:
+                hoy = timezone.now().date()
+                stats = await _en_paralelo(_consultas_stats(hoy, usuario))
+                delta = {clave: valor for clave, valor in stats.items() if clave not in anteriores or anteriores[clave] != valor}
+                if delta:
+                    yield _evento_sse('stats', delta)
+                anteriores = stats
+                
+                while await suscripcion.recibir(latido) is None:
+                    yield ': latido\n\n'
+                await eventos.agrupar(suscripcion, ventana)
+        finally:
+            suscripcion.cerrar()
+    
+    respuesta = StreamingHttpResponse(flujo(), content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    # Evita que nginx retenga el flujo en su búfer
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Max, Value
+from django.utils import timezone
+
+from . import sincronizacion
+from .models import (
+    MovimientoFinanciero, MovimientoFinancieroArchivo,
+    PagoDeuda, PagoDeudaArchivo,
+    MiPago, MiPagoArchivo,
+)
+from .signals import senales_suspendidas
+
+# (modelo activo, modelo de archivo, campo de fecha)
+ARCHIVABLES = [
+    (MovimientoFinanciero, MovimientoFinancieroArchivo, 'fecha'),
+    (PagoDeuda, PagoDeudaArchivo, 'fecha_pago'),
+    (MiPago, MiPagoArchivo, 'fecha_pago'),
+]
+
+def horizonte_dias():
+    return getattr(settings, 'ARCHIVO_HORIZONTE_DIAS', 730)
+
+def fecha_corte(dias=None):
+    """Los registros con fecha anterior a este día se consideran históricos"""
+    return timezone.now().date() - timedelta(days=dias if dias is not None else horizonte_dias())
+
+def campos_copiables(archivo):
+    return [f.attname for f in archivo._meta.concrete_fields if f.name != 'fecha_archivo']
+
+def archivar(dias=None, lote=5000, informar=None):
+    """Mueve por lotes los registros anteriores al horizonte a sus tablas de archivo.
+
+    Cada lote se copia y se elimina de la tabla activa en una sola transacción.
+    Las señales se suspenden: archivar no es borrar y no debe alterar saldos.
+    Devuelve el número de filas movidas por modelo.
+    """
+    corte = fecha_corte(dias)
+    movidos = {}
+    for activo, archivo, campo_fecha in ARCHIVABLES:
+        campos = campos_copiables(archivo)
+        pendientes = activo.objects.filter(**{f'{campo_fecha}__lt': corte}).order_by('pk')
+        total = 0
+        while True:
+            with transaction.atomic():
+                filas = list(pendientes.values(*campos)[:lote])
+                if not filas:
+                    break
+                archivo.objects.bulk_create([archivo(**fila) for fila in filas])
+                with senales_suspendidas():
+                    activo.objects.filter(pk__in=[fila['id'] for fila in filas]).delete()
+                # Para los clientes el registro archivado deja de existir en la API
+                sincronizacion.registrar_ids(activo, [(fila['id'], fila.get('propietario_id')) for fila in filas], 'D')
+            total += len(filas)
+            if informar:
+                informar(activo, total)
+        movidos[activo._meta.verbose_name_plural] = total
+    return movidos
+
+def consultar(activo, desde=None, hasta=None, **filtros):
+    """Filas (como diccionarios) del modelo activo y, si el rango lo requiere, de su archivo.
+
+    El archivo solo se consulta cuando ``desde`` es anterior a la fecha más
+    reciente archivada para esos filtros, de modo que los rangos recientes no
+    pagan el costo de la unión. Cada fila trae ``archivado`` True/False.
+    """
+    _, archivo, campo_fecha = next(a for a in ARCHIVABLES if a[0] is activo)
+    campos = campos_copiables(archivo)
+    rango = {}
+    if desde is not None:
+        rango[f'{campo_fecha}__gte'] = desde
+    if hasta is not None:
+        rango[f'{campo_fecha}__lte'] = hasta
+    
+    # Sin el orden por defecto de cada modelo: la unión se ordena al final
+    consulta = activo.objects.filter(**filtros, **rango).order_by().values(*campos).annotate(
+        archivado=Value(False, output_field=BooleanField())
+    )
+    archivados = archivo.objects.filter(**filtros)
+    ultima_archivada = archivados.aggregate(ultima=Max(campo_fecha))['ultima']
+    if ultima_archivada is not None and (desde is None or desde <= ultima_archivada):
+        consulta = consulta.union(
+            archivados.filter(**rango).order_by().values(*campos).annotate(
+                archivado=Value(True, output_field=BooleanField())
+            ),
+            all=True,
+        )
+    return consulta.order_by(f'-{campo_fecha}', '-id')
@@ -0,0 +1,111 @@
+"""Árbol de categorías y subcategorías de cada hogar en memoria del proceso.
+
+Las categorías cambian muy poco y se consultan en cada escritura de
+movimientos (validación de tipo y subcategoría), en los serializers y en los
+reportes. Cada proceso guarda una copia del árbol de los hogares que atiende
+junto con la versión con la que se cargó; la versión vive en la caché de
+Django, por hogar, de modo que una escritura confirmada en cualquier proceso
+invalida solo la copia de ese hogar en todos (con una caché compartida: Redis,
+Memcached o base de datos).
+
+Dentro de una transacción el árbol recargado no se guarda (podría incluir
+escrituras que luego se deshagan) y los ids que no están en él se buscan
+uno a uno sin recordar la respuesta.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.db import connection
+
+from . import versiones
+from .models import CategoriaFinanciera, SubcategoriaFinanciera
+
+Categoria = namedtuple('Categoria', 'id nombre tipo naturaleza propietario_id activo')
+Subcategoria = namedtuple('Subcategoria', 'id nombre categoria_id activo')
+
+# Hogares cuyo árbol se conserva en cada proceso (los menos usados se descartan)
+MAXIMO_HOGARES = 1000
+
+_bloqueo = threading.Lock()
+_arboles = OrderedDict()
+
+def version_actual(propietario_id=None):
+    return versiones.version('catalogo', propietario_id)
+
+def invalidar(propietario_id=None):
+    """Descarta la copia del hogar en este proceso y en los demás; se llama al confirmar la escritura"""
+    versiones.invalidar('catalogo', propietario_id)
+    _arboles.pop(propietario_id, None)
+
+def _cargar(propietario_id, version):
+    categorias = {
+        fila[0]: Categoria(*fila)
+        for fila in CategoriaFinanciera.objects.filter(propietario_id=propietario_id).order_by().values_list(
+            *Categoria._fields
+        )
+    }
+    subcategorias = {
+        fila[0]: Subcategoria(*fila)
+        for fila in SubcategoriaFinanciera.objects.filter(categoria__propietario_id=propietario_id).order_by().values_list(
+            *Subcategoria._fields
+        )
+    }
+    # ausentes: ids consultados que no son de este hogar (o no existen), para no volver a buscarlos
+    return {
+        'propietario_id': propietario_id, 'version': version,
+        'categorias': categorias, 'subcategorias': subcategorias, 'ausentes': set(),
+    }
+
+def vigente(propietario_id=None):
+    """Árbol vigente del hogar, para resolver muchas filas con una sola comprobación de versión.
+
+    Con una caché compartida cada comprobación es una consulta de red: quien
+    serializa una lista obtiene el árbol una vez y lo pasa a categoria() y
+    subcategoria().
+    """
+    version = version_actual(propietario_id)
+    arbol = _arboles.get(propietario_id)
+    if arbol is not None and arbol['version'] == version:
+        return arbol
+    if connection.in_atomic_block:
+        return _cargar(propietario_id, version)
+    with _bloqueo:
+        arbol = _arboles.get(propietario_id)
+        if arbol is None or arbol['version'] != version:
+            arbol = _arboles[propietario_id] = _cargar(propietario_id, version)
+        _arboles.move_to_end(propietario_id)
+        while len(_arboles) > MAXIMO_HOGARES:
+            _arboles.popitem(last=False)
+    return arbol
+
+def _buscar(tipo, pk, propietario_id, arbol):
+    arbol = arbol or vigente(propietario_id)
+    nodo = arbol[tipo].get(pk)
+    if nodo is not None or pk is None or (tipo, pk) in arbol['ausentes']:
+        return nodo
+    # Creada en esta transacción (aún sin invalidar) o de otro hogar
+    if tipo == 'categorias':
+        fila = CategoriaFinanciera.objects.filter(pk=pk, propietario_id=arbol['propietario_id']).values_list(
+            *Categoria._fields
+        ).first()
+        nodo = Categoria(*fila) if fila else None
+    else:
+        fila = SubcategoriaFinanciera.objects.filter(
+            pk=pk, categoria__propietario_id=arbol['propietario_id']
+        ).values_list(*Subcategoria._fields).first()
+        nodo = Subcategoria(*fila) if fila else None
+    if nodo is None and not connection.in_atomic_block:
+        arbol['ausentes'].add((tipo, pk))
+    return nodo
+
+def categoria(pk, propietario_id=None, arbol=None):
+    """Categoría del hogar con ese id (o None); ``arbol`` es el devuelto por vigente()"""
+    return _buscar('categorias', pk, propietario_id, arbol)
+
+def subcategoria(pk, propietario_id=None, arbol=None):
+    """Subcategoría del hogar con ese id (o None); ``arbol`` es el devuelto por vigente()"""
+    return _buscar('subcategorias', pk, propietario_id, arbol)
+
+def nombres_categorias(propietario_id=None):
+    """{id: nombre} de las categorías del hogar"""
+    return {pk: nodo.nombre for pk, nodo in vigente(propietario_id)['categorias'].items()}
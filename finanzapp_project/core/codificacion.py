@@ -0,0 +1,110 @@
+"""JSON de la API: renderer y parser con Decimal, fechas y horas exactos.
+
+El renderer usa orjson si está instalado (opcional) y, si no, el json de la
+biblioteca estándar con el codificador de DRF. Los Decimal que llegan sin
+convertir a la respuesta (reportes, dashboard, estados de cuenta) nunca pasan
+por float; según FINANZAPP_JSON_DECIMALES se escriben como
+
+- 'numero' (por defecto): número JSON con todos sus dígitos (1234.50).
+  Requiere orjson >= 3.9 (orjson.Fragment); sin él se escriben como texto.
+- 'texto': cadena, como los DecimalField de DRF ("1234.50")
+
+Los DecimalField de los serializers siguen COERCE_DECIMAL_TO_STRING de DRF:
+con False entregan Decimal y el renderer los escribe como se indicó arriba.
+
+El parser lee los números con decimales como Decimal: los montos enviados
+por los clientes llegan sin el redondeo binario de float.
+"""
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import encoders
+from rest_framework.utils.json import strict_constant
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def decimales_como_numero():
+    """Decimal como número JSON exacto: solo con orjson.Fragment (orjson >= 3.9)"""
+    return (
+        getattr(settings, 'FINANZAPP_JSON_DECIMALES', 'numero') == 'numero'
+        and orjson is not None and hasattr(orjson, 'Fragment')
+    )
+
+def texto_decimal(valor):
+    """Dígitos exactos del Decimal, sin notación exponencial"""
+    if not valor.is_finite():
+        raise ValueError(f"{valor} no es un valor JSON válido")
+    return format(valor, 'f')
+
+# ===== BIBLIOTECA ESTÁNDAR =====
+
+class CodificadorJSON(encoders.JSONEncoder):
+    """Codificador de DRF con los Decimal exactos como texto (json no escribe un número sin pasar por float)"""
+    
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return texto_decimal(o)
+        return super().default(o)
+
+# ===== ORJSON =====
+
+_codificador_drf = encoders.JSONEncoder()
+
+def _por_defecto(o):
+    if isinstance(o, Decimal):
+        if decimales_como_numero():
+            return orjson.Fragment(texto_decimal(o))
+        return texto_decimal(o)
+    # Textos perezosos, timedelta, QuerySet, objetos con tolist()...
+    return _codificador_drf.default(o)
+
+class RenderizadorJSON(renderers.JSONRenderer):
+    """JSONRenderer de DRF sobre orjson cuando está disponible"""
+    encoder_class = CodificadorJSON
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        opciones = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            opciones |= orjson.OPT_INDENT_2
+        contenido = orjson.dumps(data, default=_por_defecto, option=opciones)
+        # Como DRF: U+2028 y U+2029 escapados para poder incrustar la respuesta en JavaScript
+        return contenido.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+# ===== FUERA DE DRF =====
+# Vistas asíncronas y eventos SSE: el mismo JSON que las respuestas de DRF
+
+def dumps(datos):
+    return RenderizadorJSON().render(datos).decode()
+
+class RespuestaJSON(HttpResponse):
+    """JsonResponse escrita con RenderizadorJSON"""
+    
+    def __init__(self, datos, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(RenderizadorJSON().render(datos), **kwargs)
+
+# ===== PARSER =====
+
+class ParserJSON(parsers.JSONParser):
+    """JSONParser de DRF que lee los números con decimales como Decimal"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            return json.loads(
+                stream.read().decode(encoding),
+                parse_float=Decimal,
+                parse_constant=strict_constant if self.strict else None,
+            )
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,212 @@
+"""Conciliación de extractos bancarios contra movimientos y pagos registrados.
+
+Los registros del periodo del extracto se leen una sola vez (una consulta por
+modelo) y se indexan en memoria:
+
+- un índice hash por referencia normalizada
+  (referencia / numero_transaccion / comprobante), y
+- un índice por monto en centavos con las fechas ordenadas, donde la ventana
+  fecha ± tolerancia se ubica con bisect.
+
+Cada línea del extracto se resuelve con búsquedas en esos índices, no contra
+todos los registros: el costo total es casi lineal en líneas + registros.
+Convención de signos: positivo = entrada de dinero, negativo = salida.
+"""
+import csv
+import io
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from .huellas import normalizar_referencia
+from .models import MiPago, MovimientoFinanciero, PagoDeuda
+
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+
+def _decimal(valor):
+    """Monto como Decimal; acepta coma decimal y separadores de miles (1.234,50 / 1,234.50 / 4,50)"""
+    if isinstance(valor, (int, float, Decimal)):
+        return Decimal(str(valor))
+    texto = str(valor).strip().replace(' ', '').replace('$', '')
+    if ',' in texto and '.' in texto:
+        # El último separador es el decimal
+        miles = '.' if texto.rfind(',') > texto.rfind('.') else ','
+        texto = texto.replace(miles, '')
+    elif texto.count('.') > 1 or (',' in texto and (texto.count(',') > 1 or len(texto.rsplit(',', 1)[1]) > 2)):
+        # Solo separadores de miles: 1.234.567 / 1,234
+        texto = texto.replace('.', '').replace(',', '')
+    try:
+        numero = Decimal(texto.replace(',', '.'))
+    except InvalidOperation:
+        numero = None
+    if numero is None or not numero.is_finite():
+        raise ValueError(f"Monto no reconocido: {valor}")
+    return numero
+
+def a_centavos(valor):
+    return int((_decimal(valor) * 100).to_integral_value())
+
+def _monto(centavos):
+    return str((Decimal(centavos) / 100).quantize(Decimal('0.01')))
+
+def _fecha(valor):
+    if isinstance(valor, date):
+        return valor
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(str(valor).strip(), formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Fecha no reconocida: {valor}")
+
+# ===== LECTURA DEL EXTRACTO =====
+
+def leer_extracto(texto):
+    """Líneas de un CSV con columnas fecha, monto y opcionalmente referencia y descripcion.
+
+    Acepta ``,`` o ``;`` como separador. Devuelve (líneas, errores).
+    """
+    muestra = texto[:4096]
+    dialecto = csv.Sniffer().sniff(muestra, delimiters=',;') if muestra.strip() else csv.excel
+    lineas, errores = [], []
+    for numero, fila in enumerate(csv.DictReader(io.StringIO(texto), dialect=dialecto), start=2):
+        fila = {(clave or '').strip().lower(): (valor or '').strip() for clave, valor in fila.items()}
+        try:
+            lineas.append(linea_extracto(fila))
+        except ValueError as e:
+            errores.append({'fila': numero, 'error': str(e)})
+    return lineas, errores
+
+def linea_extracto(datos):
+    """Normaliza una línea {fecha, monto, referencia?, descripcion?}; ValueError con un mensaje legible si no se puede"""
+    if not isinstance(datos, dict):
+        raise ValueError("La línea debe ser un objeto con fecha y monto")
+    faltantes = [campo for campo in ('fecha', 'monto') if datos.get(campo) in (None, '')]
+    if faltantes:
+        raise ValueError(f"Falta {' y '.join(faltantes)}")
+    return {
+        'fecha': _fecha(datos['fecha']),
+        'centavos': a_centavos(datos['monto']),
+        'referencia': normalizar_referencia(datos.get('referencia')),
+        'descripcion': datos.get('descripcion', ''),
+    }
+
+# ===== REGISTROS DEL PERIODO =====
+
+def _registros(usuario, desde, hasta):
+    """(modelo, id, fecha, centavos con signo, referencias) de movimientos y pagos del periodo"""
+    registros = []
+    movimientos = MovimientoFinanciero.objects.de(usuario).filter(fecha__gte=desde, fecha__lte=hasta)
+    for pk, fecha, tipo, monto, referencia, comprobante in movimientos.values_list(
+        'pk', 'fecha', 'tipo', 'monto', 'referencia', 'comprobante'
+    ).order_by().iterator(chunk_size=5000):
+        signo = 1 if tipo == 'INGRESO' else -1
+        registros.append(('movimiento', pk, fecha, signo * a_centavos(monto), (referencia, comprobante)))
+    
+    filtro = {'mi_deuda__propietario': usuario} if usuario.is_authenticated else {'mi_deuda__propietario__isnull': True}
+    for pk, fecha, monto, transaccion, comprobante in MiPago.objects.filter(
+        fecha_pago__gte=desde, fecha_pago__lte=hasta, **filtro
+    ).values_list('pk', 'fecha_pago', 'monto_pago', 'numero_transaccion', 'comprobante').order_by().iterator(chunk_size=5000):
+        registros.append(('mi_pago', pk, fecha, -a_centavos(monto), (transaccion, comprobante)))
+    
+    filtro = {'deuda__propietario': usuario} if usuario.is_authenticated else {'deuda__propietario__isnull': True}
+    for pk, fecha, monto, comprobante in PagoDeuda.objects.filter(
+        fecha_pago__gte=desde, fecha_pago__lte=hasta, **filtro
+    ).values_list('pk', 'fecha_pago', 'monto_pago', 'comprobante').order_by().iterator(chunk_size=5000):
+        registros.append(('pago_deuda', pk, fecha, a_centavos(monto), (comprobante,)))
+    return registros
+
+class Indices:
+    """Índice hash por referencia e índice monto → fechas ordenadas"""
+
+    def __init__(self, registros):
+        self.registros = registros
+        self.usados = set()
+        self.por_referencia = defaultdict(list)
+        por_monto = defaultdict(list)
+        for posicion, (_, _, fecha, centavos, referencias) in enumerate(registros):
+            for referencia in {normalizar_referencia(valor) for valor in referencias} - {''}:
+                self.por_referencia[referencia].append(posicion)
+            por_monto[centavos].append((fecha.toordinal(), posicion))
+        self.por_monto = {}
+        for centavos, entradas in por_monto.items():
+            entradas.sort()
+            self.por_monto[centavos] = ([ordinal for ordinal, _ in entradas], [posicion for _, posicion in entradas])
+    
+    def por_monto_y_fecha(self, centavos, fecha, tolerancia):
+        """Registros libres con ese monto y fecha dentro de ± tolerancia días"""
+        if centavos not in self.por_monto:
+            return []
+        ordinales, posiciones = self.por_monto[centavos]
+        dia = fecha.toordinal()
+        inicio = bisect_left(ordinales, dia - tolerancia)
+        fin = bisect_right(ordinales, dia + tolerancia)
+        return [posicion for posicion in posiciones[inicio:fin] if posicion not in self.usados]
+    
+    def por_referencia_y_monto(self, referencia, centavos, fecha, tolerancia):
+        return [
+            posicion for posicion in self.por_referencia.get(referencia, ())
+            if posicion not in self.usados
+            and self.registros[posicion][3] == centavos
+            and abs((self.registros[posicion][2] - fecha).days) <= tolerancia
+        ]
+
+# ===== CONCILIACIÓN =====
+
+def conciliar(usuario, lineas, tolerancia_dias=3):
+    """Concilia las líneas del extracto con los registros del usuario.
+
+    Primero por referencia (con el mismo monto y dentro de la tolerancia) y
+    luego por monto y fecha. Si quedan varios candidatos con la misma
+    distancia en días, la línea se informa como ambigua.
+    """
+    resultado = {'conciliadas': [], 'ambiguas': [], 'sin_conciliar': [], 'sin_extracto': []}
+    if not lineas:
+        return resultado
+    desde = min(linea['fecha'] for linea in lineas) - timedelta(days=tolerancia_dias)
+    hasta = max(linea['fecha'] for linea in lineas) + timedelta(days=tolerancia_dias)
+    indices = Indices(_registros(usuario, desde, hasta))
+    registros = indices.registros
+    
+    def describir(posicion):
+        modelo, pk, fecha, centavos, _ = registros[posicion]
+        return {'modelo': modelo, 'id': pk, 'fecha': fecha.isoformat(), 'monto': _monto(centavos)}
+    
+    # Las líneas con referencia se resuelven antes para que no les quiten su registro por monto y fecha
+    orden = sorted(range(len(lineas)), key=lambda i: not lineas[i]['referencia'])
+    for i in orden:
+        linea = lineas[i]
+        criterio = 'referencia'
+        candidatos = []
+        if linea['referencia']:
+            candidatos = indices.por_referencia_y_monto(linea['referencia'], linea['centavos'], linea['fecha'], tolerancia_dias)
+        if not candidatos:
+            criterio = 'monto_fecha'
+            candidatos = indices.por_monto_y_fecha(linea['centavos'], linea['fecha'], tolerancia_dias)
+        if len(candidatos) > 1:
+            # Se prefiere el registro más cercano en fecha si es el único a esa distancia
+            distancias = [abs((registros[posicion][2] - linea['fecha']).days) for posicion in candidatos]
+            cercanos = [posicion for posicion, distancia in zip(candidatos, distancias) if distancia == min(distancias)]
+            if len(cercanos) == 1:
+                candidatos = cercanos
+        
+        resumen = {'linea': i, 'fecha': linea['fecha'].isoformat(), 'monto': _monto(linea['centavos']),
+                   'referencia': linea['referencia'], 'descripcion': linea['descripcion']}
+        if not candidatos:
+            resultado['sin_conciliar'].append(resumen)
+        elif len(candidatos) > 1:
+            resultado['ambiguas'].append({**resumen, 'candidatos': [describir(posicion) for posicion in candidatos]})
+        else:
+            indices.usados.add(candidatos[0])
+            resultado['conciliadas'].append({**resumen, 'criterio': criterio, 'registro': describir(candidatos[0])})
+    
+    # Registros del periodo del extracto que ninguna línea respaldó
+    periodo = (desde + timedelta(days=tolerancia_dias), hasta - timedelta(days=tolerancia_dias))
+    resultado['sin_extracto'] = [
+        describir(posicion) for posicion, registro in enumerate(registros)
+        if posicion not in indices.usados and periodo[0] <= registro[2] <= periodo[1]
+    ]
+    for lista in ('conciliadas', 'ambiguas', 'sin_conciliar'):
+        resultado[lista].sort(key=lambda item: item['linea'])
+    return resultado
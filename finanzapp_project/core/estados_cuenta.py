@@ -0,0 +1,361 @@
+"""Estados de cuenta: movimientos con saldo corrido y documentos mensuales por deudor.
+
+Los movimientos de una cuenta (préstamos y pagos de un deudor, o una deuda
+propia y sus pagos) se leen en una sola consulta SQL: la unión de las tablas
+activas y de archivo, con el saldo acumulado calculado por la base de datos
+con una función de ventana, y la página pedida recortada con LIMIT/OFFSET.
+
+Los documentos mensuales son HTML listo para imprimir o convertir a PDF. La
+generación va por lotes de deudores. Los datos de cada lote se leen con
+un número fijo de consultas (deudores, deudas, cuotas, y pagos anteriores y
+del mes en las tablas activa y de archivo) y se reducen a diccionarios de
+textos ya formateados. El render de la plantilla, que es lo que consume CPU,
+se reparte en un pool de procesos mientras el proceso principal lee el
+lote siguiente.
+"""
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+import django
+from django.db import connection
+from django.db.models import Q, Sum
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import (
+    CausacionInteres, CuotaDiferida, Deuda, Deudor, MiDeuda, MiPago, MiPagoArchivo, PagoDeuda, PagoDeudaArchivo
+)
+
+MESES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto',
+         'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+LOTE = 200
+PAGINA = 100
+PAGINA_MAXIMA = 1000
+CENTAVO = Decimal('0.01')
+
+def _moneda(valor):
+    return f"${valor:,.2f}"
+
+def _fecha(valor):
+    return valor.strftime('%d/%m/%Y') if valor else ''
+
+def periodo(año, mes):
+    """Primer día del mes y primer día del mes siguiente"""
+    inicio = date(año, mes, 1)
+    return inicio, date(año + 1, 1, 1) if mes == 12 else date(año, mes + 1, 1)
+
+def nombre_archivo(deudor_id, año, mes, extension='html'):
+    return f'estado-{año}-{mes:02d}-deudor-{deudor_id}.{extension}'
+
+# ===== MOVIMIENTOS CON SALDO CORRIDO =====
+
+def _tabla(modelo):
+    return connection.ops.quote_name(modelo._meta.db_table)
+
+def _decimal(valor):
+    # SQLite devuelve las sumas como float: se redondean al centavo
+    return Decimal(str(valor)).quantize(CENTAVO) if valor is not None else None
+
+def _a_fecha(valor):
+    return valor if isinstance(valor, date) else date.fromisoformat(str(valor)[:10])
+
+def _lineas(partes, desde, hasta, limite, desplazamiento):
+    """Página de la unión de ``partes`` [(sql, params)] con saldo corrido.
+
+    Cada parte selecciona fecha, orden, id, tipo, deuda_id, concepto,
+    referencia, cargo, abono y archivado. El saldo corrido se calcula sobre
+    toda la historia (la ventana interna) y luego se filtra el rango: así
+    la primera línea del rango ya trae el saldo de todo lo anterior. El total
+    de líneas y los saldos inicial y final del rango salen de sumas sobre la
+    historia en la misma consulta, sin depender de la página: también valen
+    pasada la última página o con un rango sin movimientos.
+    """
+    union = '\n            UNION ALL\n'.join(sql for sql, _ in partes)
+    parametros = [parametro for _, lista in partes for parametro in lista]
+    condiciones, valores = [], []
+    if desde is not None:
+        condiciones.append('fecha >= %s')
+        valores.append(desde)
+    if hasta is not None:
+        condiciones.append('fecha <= %s')
+        valores.append(hasta)
+    donde = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+    antes = 'WHERE fecha < %s' if desde is not None else 'WHERE 1 = 0'
+    hasta_final = 'WHERE fecha <= %s' if hasta is not None else ''
+    sql = f"""
+        WITH lineas AS (
+{union}
+        ), corridas AS (
+            SELECT lineas.*, SUM(cargo - abono) OVER (
+                ORDER BY fecha, orden, id ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+            ) AS saldo
+            FROM lineas
+        ), resumen AS (
+            SELECT (SELECT COUNT(*) FROM lineas {donde}) AS total,
+                   (SELECT COALESCE(SUM(cargo - abono), 0) FROM lineas {antes}) AS saldo_inicial,
+                   (SELECT COALESCE(SUM(cargo - abono), 0) FROM lineas {hasta_final}) AS saldo_final
+        ), pagina AS (
+            SELECT fecha, orden, tipo, id, deuda_id, concepto, referencia, cargo, abono, archivado, saldo
+            FROM corridas
+            {donde}
+            ORDER BY fecha, orden, id
+            LIMIT %s OFFSET %s
+        )
+        SELECT resumen.total, resumen.saldo_inicial, resumen.saldo_final,
+               pagina.fecha, pagina.tipo, pagina.id, pagina.deuda_id, pagina.concepto, pagina.referencia,
+               pagina.cargo, pagina.abono, pagina.archivado, pagina.saldo
+        FROM resumen LEFT JOIN pagina ON 1 = 1
+        ORDER BY pagina.fecha, pagina.orden, pagina.id
+    """
+    # En el orden de los %s: total, saldo inicial, saldo final y página
+    parametros += valores + [valor for valor in (desde, hasta) if valor is not None] + valores
+    parametros += [limite, desplazamiento]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        filas = cursor.fetchall()
+    
+    total, saldo_inicial, saldo_final = filas[0][:3]
+    resultado = {
+        'total': total, 'saldo_inicial': _decimal(saldo_inicial), 'saldo_final': _decimal(saldo_final), 'lineas': []
+    }
+    for _, _, _, fecha, tipo, pk, deuda_id, concepto, referencia, cargo, abono, archivado, saldo in filas:
+        if fecha is None:
+            # Página vacía: la única fila es la del resumen
+            continue
+        resultado['lineas'].append({
+            'fecha': _a_fecha(fecha),
+            'tipo': tipo,
+            'id': pk,
+            'deuda': deuda_id,
+            'concepto': concepto,
+            'referencia': referencia,
+            'cargo': _decimal(cargo),
+            'abono': _decimal(abono),
+            'saldo': _decimal(saldo),
+            'archivado': bool(archivado),
+        })
+    return resultado
+
+def lineas_deudor(deudor_id, desde=None, hasta=None, limite=PAGINA, desplazamiento=0):
+    """Préstamos e intereses causados (cargo) y pagos recibidos (abono), activos y archivados, de un deudor"""
+    deuda = _tabla(Deuda)
+    partes = [(f"""
+            SELECT fecha_prestamo AS fecha, 0 AS orden, id, 'PRESTAMO' AS tipo, id AS deuda_id, concepto,
+                   '' AS referencia, monto_original AS cargo, 0 AS abono, 0 AS archivado
+            FROM {deuda} WHERE deudor_id = %s""", [deudor_id])]
+    for modelo, archivado in ((PagoDeuda, 0), (PagoDeudaArchivo, 1)):
+        partes.append((f"""
+            SELECT p.fecha_pago, 1, p.id, 'PAGO', p.deuda_id, d.concepto, p.comprobante, 0, p.monto_pago, {archivado}
+            FROM {_tabla(modelo)} p INNER JOIN {deuda} d ON d.id = p.deuda_id WHERE d.deudor_id = %s""", [deudor_id]))
+    partes.append((f"""
+            SELECT c.fecha, 2, c.id, 'INTERES', c.deuda_id, d.concepto, '', c.monto, 0, 0
+            FROM {_tabla(CausacionInteres)} c INNER JOIN {deuda} d ON d.id = c.deuda_id WHERE d.deudor_id = %s""",
+                   [deudor_id]))
+    return _lineas(partes, desde, hasta, limite, desplazamiento)
+
+def lineas_mi_deuda(mi_deuda_id, desde=None, hasta=None, limite=PAGINA, desplazamiento=0):
+    """Monto contratado e intereses causados (cargo) y pagos a capital e intereses (abono) de una deuda propia"""
+    partes = [(f"""
+            SELECT fecha_contrato AS fecha, 0 AS orden, id, 'CONTRATO' AS tipo, id AS deuda_id, concepto,
+                   numero_cuenta AS referencia, monto_original AS cargo, 0 AS abono, 0 AS archivado
+            FROM {_tabla(MiDeuda)} WHERE id = %s""", [mi_deuda_id])]
+    for modelo, archivado in ((MiPago, 0), (MiPagoArchivo, 1)):
+        partes.append((f"""
+            SELECT fecha_pago, 1, id, 'PAGO', mi_deuda_id, metodo_pago,
+                   CASE WHEN numero_transaccion <> '' THEN numero_transaccion ELSE comprobante END, 0,
+                   monto_capital + monto_interes, {archivado}
+            FROM {_tabla(modelo)} WHERE mi_deuda_id = %s""", [mi_deuda_id]))
+    partes.append((f"""
+            SELECT fecha, 2, id, 'INTERES', mi_deuda_id, 'Interés causado', '', monto, 0, 0
+            FROM {_tabla(CausacionInteres)} WHERE mi_deuda_id = %s""", [mi_deuda_id]))
+    return _lineas(partes, desde, hasta, limite, desplazamiento)
+
+# ===== DATOS DE UN LOTE =====
+
+def datos_lote(deudor_ids, año, mes):
+    """Contexto de plantilla de cada deudor del lote: [(deudor_id, contexto)]"""
+    inicio, fin = periodo(año, mes)
+    deudores = Deudor.objects.in_bulk(deudor_ids)
+    deudas = list(Deuda.objects.filter(deudor_id__in=deudor_ids, fecha_prestamo__lt=fin).order_by(
+        'fecha_prestamo', 'pk'
+    ))
+    deuda_ids = [deuda.pk for deuda in deudas]
+    
+    pagado_antes = defaultdict(Decimal)
+    pagos_mes = defaultdict(list)
+    for modelo in (PagoDeuda, PagoDeudaArchivo):
+        for deuda_id, total in modelo.objects.filter(deuda_id__in=deuda_ids, fecha_pago__lt=inicio).values(
+            'deuda_id'
+        ).annotate(total=Sum('monto_pago')).order_by().values_list('deuda_id', 'total'):
+            pagado_antes[deuda_id] += total
+        for pago in modelo.objects.filter(deuda_id__in=deuda_ids, fecha_pago__gte=inicio, fecha_pago__lt=fin).order_by(
+            'fecha_pago', 'pk'
+        ).values_list('deuda_id', 'fecha_pago', 'monto_pago', 'metodo_pago', 'comprobante'):
+            pagos_mes[pago[0]].append(pago[1:])
+    
+    interes_antes = defaultdict(Decimal)
+    interes_mes = defaultdict(Decimal)
+    for deuda_id, antes, del_mes in CausacionInteres.objects.filter(deuda_id__in=deuda_ids, fecha__lt=fin).values(
+        'deuda_id'
+    ).annotate(
+        antes=Sum('monto', filter=Q(fecha__lt=inicio)), del_mes=Sum('monto', filter=Q(fecha__gte=inicio))
+    ).order_by().values_list('deuda_id', 'antes', 'del_mes'):
+        interes_antes[deuda_id] = antes or Decimal('0')
+        interes_mes[deuda_id] = del_mes or Decimal('0')
+    
+    cuotas = defaultdict(list)
+    for cuota in CuotaDiferida.objects.filter(deuda_id__in=deuda_ids).order_by('deuda_id', 'numero_cuota').values_list(
+        'deuda_id', 'numero_cuota', 'monto_cuota', 'fecha_vencimiento', 'pagada', 'fecha_pago'
+    ):
+        cuotas[cuota[0]].append(cuota[1:])
+    
+    por_deudor = defaultdict(list)
+    for deuda in deudas:
+        por_deudor[deuda.deudor_id].append(deuda)
+    
+    generado = _fecha(timezone.now().date())
+    resultado = []
+    for deudor_id in deudor_ids:
+        deudor = deudores.get(deudor_id)
+        if deudor is None:
+            continue
+        totales = defaultdict(Decimal)
+        filas = []
+        for deuda in por_deudor[deudor_id]:
+            pagos = sorted(pagos_mes[deuda.pk])
+            pagado = sum((pago[1] for pago in pagos), Decimal('0'))
+            intereses = interes_mes[deuda.pk]
+            nueva = deuda.fecha_prestamo >= inicio
+            saldo_inicial = Decimal('0') if nueva else (
+                deuda.monto_original + interes_antes[deuda.pk] - pagado_antes[deuda.pk]
+            )
+            if not nueva and saldo_inicial <= 0 and not pagos and not intereses:
+                # Saldada antes del periodo y sin movimientos en él
+                continue
+            saldo_final = saldo_inicial + (deuda.monto_original if nueva else 0) + intereses - pagado
+            totales['saldo_inicial'] += saldo_inicial
+            totales['prestado'] += deuda.monto_original if nueva else 0
+            totales['intereses'] += intereses
+            totales['pagado'] += pagado
+            totales['saldo_final'] += saldo_final
+            filas.append({
+                'concepto': deuda.concepto,
+                'fecha_prestamo': _fecha(deuda.fecha_prestamo),
+                'fecha_vencimiento': _fecha(deuda.fecha_vencimiento),
+                'vencida': saldo_final > 0 and deuda.fecha_vencimiento < fin,
+                'tipo_pago': deuda.get_tipo_pago_display(),
+                'tasa_interes': deuda.tasa_interes,
+                'periodo_tasa': deuda.get_periodo_tasa_display().lower(),
+                'monto_original': _moneda(deuda.monto_original),
+                'saldo_inicial': _moneda(saldo_inicial),
+                'intereses': _moneda(intereses),
+                'saldo_final': _moneda(saldo_final),
+                'pagos': [
+                    {'fecha': _fecha(fecha), 'monto': _moneda(monto), 'metodo': metodo, 'comprobante': comprobante}
+                    for fecha, monto, metodo, comprobante in pagos
+                ],
+                'cuotas': [_cuota(cuota, fin) for cuota in cuotas[deuda.pk]],
+            })
+        resultado.append((deudor_id, {
+            'deudor': {
+                'nombre': deudor.nombre,
+                'documento': deudor.documento,
+                'telefono': deudor.telefono,
+                'email': deudor.email,
+                'direccion': deudor.direccion,
+            },
+            'periodo': f'{MESES[mes - 1]} {año}',
+            'desde': _fecha(inicio),
+            'hasta': _fecha(fin - timedelta(days=1)),
+            'generado': generado,
+            'deudas': filas,
+            'totales': {
+                clave: _moneda(totales[clave]) for clave in ('saldo_inicial', 'prestado', 'intereses', 'pagado', 'saldo_final')
+            },
+        }))
+    return resultado
+
+def _cuota(cuota, fin):
+    numero, monto, vencimiento, pagada, fecha_pago = cuota
+    if pagada and (fecha_pago is None or fecha_pago < fin):
+        estado, clase = f'Pagada {_fecha(fecha_pago)}'.strip(), 'pagada'
+    elif vencimiento < fin:
+        estado, clase = 'Vencida', 'vencida'
+    else:
+        estado, clase = 'Por vencer', ''
+    return {'numero': numero, 'monto': _moneda(monto), 'vencimiento': _fecha(vencimiento), 'estado': estado, 'clase': clase}
+
+# ===== RENDER =====
+
+def escribir(contexto, ruta, pdf=False):
+    """Renderiza un estado de cuenta y lo escribe en ruta (y ruta .pdf con WeasyPrint)"""
+    html = render_to_string('core/estado_cuenta.html', contexto)
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        archivo.write(html)
+    if pdf:
+        from weasyprint import HTML
+        HTML(string=html).write_pdf(os.path.splitext(ruta)[0] + '.pdf')
+    return ruta
+
+def generar(año, mes, destino, usuario=None, deudor_ids=None, procesos=None, lote=LOTE, pdf=False, informar=None):
+    """Genera los estados de cuenta de los deudores activos en ``destino``; devuelve las rutas.
+
+    ``usuario`` None genera los de todos los hogares. Con ``procesos`` 1 el
+    render se hace en este proceso; por defecto (y como máximo) usa un proceso
+    por núcleo.
+    ``informar(hechos, total)`` se llama al terminar cada lote.
+    """
+    deudores = Deudor.objects.filter(activo=True)
+    if usuario is not None:
+        deudores = deudores.de(usuario)
+    if deudor_ids is not None:
+        deudores = deudores.filter(pk__in=deudor_ids)
+    ids = list(deudores.order_by('pk').values_list('pk', flat=True))
+    os.makedirs(destino, exist_ok=True)
+    # Nunca más procesos que núcleos
+    procesos = min(procesos or os.cpu_count() or 1, os.cpu_count() or 1)
+    
+    def lotes():
+        for posicion in range(0, len(ids), lote):
+            yield posicion + lote, datos_lote(ids[posicion:posicion + lote], año, mes)
+    
+    rutas = []
+    if procesos == 1:
+        for hechos, contextos in lotes():
+            rutas.extend(escribir(contexto, os.path.join(destino, nombre_archivo(pk, año, mes)), pdf)
+                         for pk, contexto in contextos)
+            if informar:
+                informar(min(hechos, len(ids)), len(ids))
+        return rutas
+    
+    # Procesos con spawn (no heredan las conexiones a la base de datos); django.setup
+    # corre antes de recibir la primera tarea, que importa este módulo y sus modelos
+    with ProcessPoolExecutor(
+        max_workers=procesos,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup,
+    ) as pool:
+        pendientes = []
+        for hechos, contextos in lotes():
+            # Mientras el pool renderiza este lote se consulta el siguiente
+            pendientes.append((hechos, [
+                pool.submit(escribir, contexto, os.path.join(destino, nombre_archivo(pk, año, mes)), pdf)
+                for pk, contexto in contextos
+            ]))
+            while pendientes and all(futuro.done() for futuro in pendientes[0][1]):
+                rutas.extend(_recoger(pendientes.pop(0), len(ids), informar))
+        while pendientes:
+            rutas.extend(_recoger(pendientes.pop(0), len(ids), informar))
+    return rutas
+
+def _recoger(pendiente, total, informar):
+    hechos, futuros = pendiente
+    rutas = [futuro.result() for futuro in futuros]
+    if informar:
+        informar(min(hechos, total), total)
+    return rutas
@@ -0,0 +1,118 @@
+"""Eventos de cambio por hogar para los tableros conectados (Server-Sent Events).
+
+Las señales publican un evento en el canal del hogar al confirmarse una
+escritura de movimientos, deudas o pagos. Cada conexión SSE se suscribe a su
+canal y, tras un evento, espera una ventana corta y descarta los que llegan
+mientras tanto: una ráfaga de escrituras produce un solo recálculo.
+
+El broker se elige con ``FINANZAPP_BROKER_EVENTOS`` (ruta de una clase). Debe
+ofrecer ``publicar(canal, evento)``, invocable desde cualquier hilo, y
+``suscribir(canal)``, llamado desde el bucle asíncrono, que devuelve un objeto
+con ``async recibir(timeout)`` (el evento o None) y ``cerrar()``. El broker en
+memoria solo reparte eventos dentro del mismo proceso; con varios procesos se
+sustituye por uno sobre Redis, PostgreSQL LISTEN/NOTIFY, etc.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+_broker = None
+_bloqueo = threading.Lock()
+
+def canal_hogar(propietario_id):
+    return f'hogar:{propietario_id}'
+
+def broker():
+    """Instancia única del broker configurado"""
+    global _broker
+    if _broker is None:
+        with _bloqueo:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'FINANZAPP_BROKER_EVENTOS', 'core.eventos.BrokerMemoria'))()
+    return _broker
+
+def notificar(propietario_id, evento='cambio'):
+    broker().publicar(canal_hogar(propietario_id), evento)
+
+# ===== BROKER EN MEMORIA =====
+
+class Suscripcion:
+    """Aviso pendiente de un suscriptor, ligado al bucle asíncrono que lo creó.
+
+    Quien recibe un aviso recalcula todo el estado del hogar, así que los
+    eventos que llegan mientras hay uno pendiente se funden con él (queda el
+    último): un suscriptor atrasado nunca acumula más de un aviso.
+    """
+    
+    def __init__(self, broker, canal):
+        self.broker = broker
+        self.canal = canal
+        self.bucle = asyncio.get_running_loop()
+        self.pendiente = None
+        self.aviso = asyncio.Event()
+    
+    def entregar(self, evento):
+        # Desde cualquier hilo: el aviso solo se toca dentro de su bucle
+        self.bucle.call_soon_threadsafe(self._poner, evento)
+    
+    def _poner(self, evento):
+        self.pendiente = evento
+        self.aviso.set()
+    
+    async def recibir(self, timeout=None):
+        try:
+            await asyncio.wait_for(self.aviso.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        evento, self.pendiente = self.pendiente, None
+        self.aviso.clear()
+        return evento
+    
+    def cerrar(self):
+        self.broker.quitar(self)
+
+class BrokerMemoria:
+    """Reparte los eventos entre los suscriptores del mismo proceso"""
+
+    def __init__(self):
+        self._bloqueo = threading.Lock()
+        self._suscriptores = defaultdict(set)
+    
+    def publicar(self, canal, evento):
+        with self._bloqueo:
+            suscriptores = list(self._suscriptores.get(canal, ()))
+        for suscripcion in suscriptores:
+            try:
+                suscripcion.entregar(evento)
+            except RuntimeError:
+                # Su bucle ya terminó
+                self.quitar(suscripcion)
+    
+    def suscribir(self, canal):
+        suscripcion = Suscripcion(self, canal)
+        with self._bloqueo:
+            self._suscriptores[canal].add(suscripcion)
+        return suscripcion
+    
+    def quitar(self, suscripcion):
+        with self._bloqueo:
+            suscriptores = self._suscriptores.get(suscripcion.canal)
+            if suscriptores is not None:
+                suscriptores.discard(suscripcion)
+                if not suscriptores:
+                    del self._suscriptores[suscripcion.canal]
+
+async def agrupar(suscripcion, ventana):
+    """Tras un evento, consume los que lleguen durante la ventana; devuelve cuántos fueron"""
+    bucle = asyncio.get_running_loop()
+    limite = bucle.time() + ventana
+    agrupados = 0
+    while True:
+        restante = limite - bucle.time()
+        if restante <= 0 or await suscripcion.recibir(restante) is None:
+            break
+        agrupados += 1
+    return agrupados
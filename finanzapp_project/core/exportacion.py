@@ -0,0 +1,229 @@
+"""Exportación columnar del historial para análisis (NumPy ``.npz`` o Parquet).
+
+Cada tabla se lee con consultas por lotes (``iterator(chunk_size=...)``), sin
+instanciar modelos, y se convierte lote a lote en columnas NumPy:
+
+- montos en centavos enteros (int64), sin pérdida de precisión,
+- fechas como datetime64[D] (NaT si no hay fecha),
+- ids como int64 (-1 si es nulo),
+- textos repetidos (tipo, estado, categoría...) codificados como diccionario:
+  un arreglo de códigos int32 más la lista de valores distintos.
+
+En el ``.npz`` la columna ``tabla.columna`` de un texto guarda los códigos y
+``tabla.columna.valores`` los valores; se carga sin pickle::
+    
+    datos = np.load('finanzas.npz')
+    categorias = datos['movimientos.categoria.valores'][datos['movimientos.categoria']]
+
+Parquet requiere pyarrow (opcional); allí los textos son columnas dictionary.
+"""
+from collections import namedtuple
+from itertools import islice
+
+import numpy as np
+
+from .models import (
+    CategoriaFinanciera, SubcategoriaFinanciera, MovimientoFinanciero, MovimientoFinancieroArchivo, Deuda,
+    PagoDeuda, PagoDeudaArchivo, MiDeuda, MiPago, MiPagoArchivo
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+LOTE = 5000
+
+# tipo: 'id' | 'centavos' | 'fecha' | 'texto' | 'bool'; traducir: callable(usuario) que devuelve {valor: texto}
+Columna = namedtuple('Columna', 'nombre campo tipo traducir', defaults=(None,))
+# modelos: (activo, archivo o None); propietario: ruta del campo de hogar
+Tabla = namedtuple('Tabla', 'modelos propietario columnas')
+
+def _nombres(modelo, propietario):
+    """Traducción id → nombre de las filas de ``modelo`` del hogar exportado (de todos con usuario None)"""
+    def traducir(usuario):
+        return dict(modelo.objects.filter(**_filtro(propietario, usuario)).order_by().values_list('id', 'nombre'))
+    return traducir
+
+TABLAS = {
+    'movimientos': Tabla((MovimientoFinanciero, MovimientoFinancieroArchivo), 'propietario', [
+        Columna('id', 'id', 'id'),
+        Columna('propietario', 'propietario_id', 'id'),
+        Columna('fecha', 'fecha', 'fecha'),
+        Columna('tipo', 'tipo', 'texto'),
+        Columna('categoria_id', 'categoria_id', 'id'),
+        Columna('categoria', 'categoria_id', 'texto', _nombres(CategoriaFinanciera, 'propietario')),
+        Columna('subcategoria_id', 'subcategoria_id', 'id'),
+        Columna('subcategoria', 'subcategoria_id', 'texto', _nombres(SubcategoriaFinanciera, 'categoria__propietario')),
+        Columna('monto_centavos', 'monto', 'centavos'),
+        Columna('metodo_pago', 'metodo_pago', 'texto'),
+        Columna('es_recurrente', 'es_recurrente', 'bool'),
+        Columna('frecuencia', 'frecuencia', 'texto'),
+    ]),
+    'deudas': Tabla((Deuda, None), 'propietario', [
+        Columna('id', 'id', 'id'),
+        Columna('propietario', 'propietario_id', 'id'),
+        Columna('deudor_id', 'deudor_id', 'id'),
+        Columna('monto_original_centavos', 'monto_original', 'centavos'),
+        Columna('monto_pendiente_centavos', 'monto_pendiente', 'centavos'),
+        Columna('interes_causado_centavos', 'interes_causado', 'centavos'),
+        Columna('interes_pagado_centavos', 'interes_pagado', 'centavos'),
+        Columna('fecha_prestamo', 'fecha_prestamo', 'fecha'),
+        Columna('fecha_vencimiento', 'fecha_vencimiento', 'fecha'),
+        Columna('tipo_pago', 'tipo_pago', 'texto'),
+        Columna('estado', 'estado', 'texto'),
+    ]),
+    'pagos_deuda': Tabla((PagoDeuda, PagoDeudaArchivo), 'deuda__propietario', [
+        Columna('id', 'id', 'id'),
+        Columna('deuda_id', 'deuda_id', 'id'),
+        Columna('fecha_pago', 'fecha_pago', 'fecha'),
+        Columna('monto_centavos', 'monto_pago', 'centavos'),
+        Columna('metodo_pago', 'metodo_pago', 'texto'),
+    ]),
+    'mis_deudas': Tabla((MiDeuda, None), 'propietario', [
+        Columna('id', 'id', 'id'),
+        Columna('propietario', 'propietario_id', 'id'),
+        Columna('acreedor_id', 'acreedor_id', 'id'),
+        Columna('tipo_deuda', 'tipo_deuda', 'texto'),
+        Columna('monto_original_centavos', 'monto_original', 'centavos'),
+        Columna('saldo_pendiente_centavos', 'saldo_pendiente', 'centavos'),
+        Columna('interes_causado_centavos', 'interes_causado', 'centavos'),
+        Columna('interes_pagado_centavos', 'interes_pagado', 'centavos'),
+        Columna('cuota_mensual_centavos', 'cuota_mensual', 'centavos'),
+        Columna('fecha_contrato', 'fecha_contrato', 'fecha'),
+        Columna('fecha_vencimiento', 'fecha_vencimiento', 'fecha'),
+        Columna('prioridad', 'prioridad', 'texto'),
+        Columna('estado', 'estado', 'texto'),
+    ]),
+    'mis_pagos': Tabla((MiPago, MiPagoArchivo), 'mi_deuda__propietario', [
+        Columna('id', 'id', 'id'),
+        Columna('mi_deuda_id', 'mi_deuda_id', 'id'),
+        Columna('fecha_pago', 'fecha_pago', 'fecha'),
+        Columna('monto_centavos', 'monto_pago', 'centavos'),
+        Columna('capital_centavos', 'monto_capital', 'centavos'),
+        Columna('interes_centavos', 'monto_interes', 'centavos'),
+        Columna('metodo_pago', 'metodo_pago', 'texto'),
+    ]),
+}
+
+class Diccionario:
+    """Codificación texto → código int32 que crece a medida que llegan los lotes"""
+
+    def __init__(self, traducir=None, usuario=None):
+        self.codigos = {}
+        self.traduccion = traducir(usuario) if traducir else None
+    
+    def codificar(self, valores):
+        if self.traduccion is not None:
+            valores = (self.traduccion.get(valor, '') if valor is not None else '' for valor in valores)
+        codigos = self.codigos
+        return np.fromiter(
+            (codigos.setdefault(valor or '', len(codigos)) for valor in valores),
+            dtype=np.int32
+        )
+    
+    @property
+    def valores(self):
+        return np.array(list(self.codigos), dtype=str)
+
+def _convertir(tipo, valores):
+    if tipo == 'id':
+        return np.fromiter((-1 if valor is None else valor for valor in valores), dtype=np.int64, count=len(valores))
+    if tipo == 'centavos':
+        return np.fromiter(
+            (0 if valor is None else int(valor.scaleb(2)) for valor in valores), dtype=np.int64, count=len(valores)
+        )
+    if tipo == 'fecha':
+        return np.array(valores, dtype='datetime64[D]')
+    if tipo == 'bool':
+        return np.fromiter(valores, dtype=bool, count=len(valores))
+    raise ValueError(f"Tipo de columna desconocido: {tipo}")
+
+def _filtro(propietario, usuario):
+    if usuario is None:
+        return {}
+    if usuario.is_authenticated:
+        return {propietario: usuario}
+    return {f'{propietario}__isnull': True}
+
+def columnas(nombre, usuario=None, lote=LOTE):
+    """Columnas de una tabla: {columna: ndarray}; los textos como (códigos, valores).
+
+    ``usuario`` None exporta todos los hogares. Las tablas con archivo incluyen
+    sus filas archivadas y una columna booleana ``archivado``.
+    """
+    tabla = TABLAS[nombre]
+    campos = [columna.campo for columna in tabla.columnas]
+    diccionarios = {
+        columna.nombre: Diccionario(columna.traducir, usuario)
+        for columna in tabla.columnas if columna.tipo == 'texto'
+    }
+    partes = {columna.nombre: [] for columna in tabla.columnas}
+    archivado = []
+    for modelo, es_archivo in ((tabla.modelos[0], False), (tabla.modelos[1], True)):
+        if modelo is None:
+            continue
+        filas = modelo.objects.filter(**_filtro(tabla.propietario, usuario)).order_by().values_list(*campos).iterator(chunk_size=lote)
+        while True:
+            bloque = list(islice(filas, lote))
+            if not bloque:
+                break
+            for posicion, valores in enumerate(zip(*bloque)):
+                columna = tabla.columnas[posicion]
+                if columna.tipo == 'texto':
+                    partes[columna.nombre].append(diccionarios[columna.nombre].codificar(valores))
+                else:
+                    partes[columna.nombre].append(_convertir(columna.tipo, valores))
+            archivado.append(np.full(len(bloque), es_archivo))
+    
+    resultado = {}
+    for columna in tabla.columnas:
+        if not partes[columna.nombre]:
+            partes[columna.nombre].append(
+                np.empty(0, dtype=np.int32) if columna.tipo == 'texto' else _convertir(columna.tipo, [])
+            )
+        datos = np.concatenate(partes[columna.nombre])
+        resultado[columna.nombre] = (datos, diccionarios[columna.nombre].valores) if columna.tipo == 'texto' else datos
+    if tabla.modelos[1] is not None:
+        resultado['archivado'] = np.concatenate(archivado) if archivado else np.empty(0, dtype=bool)
+    return resultado
+
+# ===== FORMATOS DE SALIDA =====
+
+def escribir_npz(destino, usuario=None, tablas=None, lote=LOTE, informar=None):
+    """Escribe las tablas en un .npz comprimido (ruta o archivo abierto); devuelve filas por tabla.
+
+    ``informar(posición, tabla)`` se llama antes de leer cada tabla.
+    """
+    arreglos = {}
+    filas = {}
+    for posicion, nombre in enumerate(tablas or TABLAS):
+        if informar:
+            informar(posicion, nombre)
+        for columna, datos in columnas(nombre, usuario, lote).items():
+            if isinstance(datos, tuple):
+                arreglos[f'{nombre}.{columna}'], arreglos[f'{nombre}.{columna}.valores'] = datos
+                datos = datos[0]
+            else:
+                arreglos[f'{nombre}.{columna}'] = datos
+            filas[nombre] = len(datos)
+    np.savez_compressed(destino, **arreglos)
+    return filas
+
+def parquet_disponible():
+    return pq is not None
+
+def escribir_parquet(destino, nombre, usuario=None, lote=LOTE):
+    """Escribe una tabla en Parquet (ruta o archivo abierto); devuelve el número de filas"""
+    if pq is None:
+        raise RuntimeError("La exportación a Parquet requiere pyarrow")
+    arrays = {}
+    for columna, datos in columnas(nombre, usuario, lote).items():
+        if isinstance(datos, tuple):
+            arrays[columna] = pa.DictionaryArray.from_arrays(datos[0], pa.array(datos[1], type=pa.string()))
+        else:
+            arrays[columna] = pa.array(datos)
+    tabla = pa.table(arrays)
+    pq.write_table(tabla, destino)
+    return tabla.num_rows
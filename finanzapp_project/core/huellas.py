@@ -0,0 +1,50 @@
+"""Huella de un movimiento o pago: identifica el mismo registro aunque llegue dos veces.
+
+Se calcula con los datos que trae un extracto bancario (fecha, monto, cuenta o
+deuda, referencia y descripción), normalizados para que las diferencias de
+mayúsculas, tildes, espacios o ceros a la izquierda no cambien el resultado.
+La columna ``huella`` tiene un índice único: un duplicado se rechaza al
+escribirlo, sin buscar coincidencias después.
+
+Solo llevan huella los registros con referencia (referencia, número de
+transacción o comprobante), es decir, los que vienen de un banco o extracto.
+Dos registros manuales idénticos (dos cafés del mismo precio el mismo día)
+son legítimos: sin referencia la huella es None y no se comparan.
+"""
+import hashlib
+import re
+import unicodedata
+from decimal import Decimal
+
+def normalizar_texto(valor):
+    """Mayúsculas, sin tildes ni signos y con los espacios colapsados"""
+    texto = unicodedata.normalize('NFKD', valor or '').encode('ascii', 'ignore').decode()
+    return ' '.join(re.sub(r'[^0-9A-Z]+', ' ', texto.upper()).split())
+
+def normalizar_referencia(valor):
+    """Solo letras y dígitos, sin ceros a la izquierda"""
+    return normalizar_texto(valor).replace(' ', '').lstrip('0')
+
+def _centavos(monto):
+    return int((Decimal(str(monto)) * 100).to_integral_value())
+
+def calcular(*partes):
+    return hashlib.sha256('|'.join(str(parte) for parte in partes).encode()).hexdigest()
+
+def huella_movimiento(propietario_id, fecha, tipo, monto, referencia, descripcion):
+    referencia = normalizar_referencia(referencia)
+    if not referencia:
+        return None
+    return calcular(
+        'movimiento', propietario_id, fecha, tipo, _centavos(monto),
+        referencia, normalizar_texto(descripcion)
+    )
+
+def huella_mi_pago(mi_deuda_id, fecha_pago, monto_pago, numero_transaccion, comprobante, observaciones):
+    referencia = normalizar_referencia(numero_transaccion or comprobante)
+    if not referencia:
+        return None
+    return calcular(
+        'mi_pago', mi_deuda_id, fecha_pago, _centavos(monto_pago),
+        referencia, normalizar_texto(observaciones)
+    )
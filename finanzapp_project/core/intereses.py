@@ -0,0 +1,150 @@
+"""Causación diaria de intereses de las deudas por cobrar (Deuda) y propias (MiDeuda).
+
+Cada día se causa, para toda deuda abierta con tasa, el interés simple del
+día sobre su saldo pendiente:
+
+- Deuda: ``tasa_interes`` mensual o anual según ``periodo_tasa``; si es mensual, interés del día = saldo × tasa × 12 / 365
+- MiDeuda: ``tasa_interes`` anual, interés del día = saldo × tasa / 365
+
+Solo se causa el día en curso: el saldo pendiente es el de hoy y no se
+reconstruye a otra fecha, así que causar un día pasado (o futuro) con él
+daría un interés equivocado si hubo pagos entre tanto.
+
+El cálculo de todas las deudas es vectorial y en centavos enteros (saldo y
+tasa escalados a enteros y redondeo al centavo con aritmética entera), de
+modo que el Decimal que se persiste es exacto. Las causaciones se escriben
+con bulk_create y ``interes_causado`` se actualiza con un solo UPDATE por
+modelo. Una fecha ya causada no se vuelve a causar (restricción única por
+deuda y fecha), así que repetir el comando es inocuo.
+
+El saldo pendiente sigue siendo solo capital (la base del interés simple); lo
+que se debe además es ``interes_causado - interes_pagado``, que los saldos,
+reportes y estados de cuenta suman al capital (ver ``models.total_pendiente``).
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import sincronizacion, versiones
+from .models import ESTADOS_ABIERTOS, CausacionInteres, Deuda, MiDeuda
+
+# campo: FK de CausacionInteres; periodo: campo con el periodo de la tasa (None: anual)
+Fuente = namedtuple('Fuente', 'modelo campo saldo inicio periodo')
+
+FUENTES = (
+    Fuente(Deuda, 'deuda', 'monto_pendiente', 'fecha_prestamo', 'periodo_tasa'),
+    Fuente(MiDeuda, 'mi_deuda', 'saldo_pendiente', 'fecha_contrato', None),
+)
+
+# Periodos de la tasa por año
+PERIODOS = {'MENSUAL': 12, 'ANUAL': 1}
+
+DIAS_AÑO = 365
+# Saldo en centavos × tasa en centésimas de punto: se divide por 100 (porcentaje) × 100 (centésimas) × días
+DIVISOR = 100 * 100 * DIAS_AÑO
+
+def _centavos(valores, escala):
+    return [int(valor * escala) for valor in valores]
+
+def interes_diario(saldos_centavos, tasas_centesimas, periodos):
+    """Interés del día en centavos (redondeo al centavo más cercano, mitades hacia arriba).
+
+    ``periodos`` es un entero para todas las deudas o uno por deuda.
+    """
+    saldos = np.asarray(saldos_centavos, dtype=np.int64)
+    tasas = np.asarray(tasas_centesimas, dtype=np.int64)
+    periodos = np.broadcast_to(np.asarray(periodos, dtype=np.int64), saldos.shape)
+    if len(saldos) and int(saldos.max()) * int(tasas.max()) * int(periodos.max()) >= 2 ** 62:
+        # Fuera del rango de int64: enteros de Python, igual de exactos
+        saldos = np.asarray(saldos_centavos, dtype=object)
+        tasas = np.asarray(tasas_centesimas, dtype=object)
+        periodos = periodos.astype(object)
+    return (saldos * tasas * periodos + DIVISOR // 2) // DIVISOR
+
+def causar(fecha=None, usuario=None):
+    """Causa los intereses de hoy; devuelve {modelo: (deudas, interés total)}.
+
+    ``fecha``, si se da, debe ser hoy (ValueError si no): quien programa la
+    causación de un día falla en lugar de causarlo con el saldo de otro.
+    ``usuario`` None causa los de todos los hogares.
+    """
+    hoy = timezone.now().date()
+    fecha = fecha or hoy
+    if fecha != hoy:
+        raise ValueError(f'Solo se puede causar el día en curso ({hoy.isoformat()}): el saldo base es el de hoy')
+    resultado = {}
+    for fuente in FUENTES:
+        deudas = fuente.modelo.objects.filter(
+            estado__in=ESTADOS_ABIERTOS,
+            tasa_interes__gt=0,
+            **{f'{fuente.saldo}__gt': 0, f'{fuente.inicio}__lt': fecha}
+        ).exclude(causaciones__fecha=fecha)
+        if usuario is not None:
+            deudas = deudas.de(usuario)
+        filas = list(deudas.order_by().values_list(
+            'pk', 'propietario_id', fuente.saldo, 'tasa_interes', *([fuente.periodo] if fuente.periodo else [])
+        ))
+        if not filas:
+            resultado[fuente.campo] = (0, Decimal('0.00'))
+            continue
+        
+        pks, propietarios, saldos, tasas, *periodo = zip(*filas)
+        periodos = [PERIODOS[valor] for valor in periodo[0]] if periodo else PERIODOS['ANUAL']
+        intereses = interes_diario(_centavos(saldos, 100), _centavos(tasas, 100), periodos)
+        causaciones = [
+            CausacionInteres(**{
+                fuente.campo + '_id': pk,
+                'propietario_id': propietario_id,
+                'fecha': fecha,
+                'saldo_base': saldo,
+                'tasa_interes': tasa,
+                'monto': Decimal(int(centavos)).scaleb(-2),
+            })
+            for pk, propietario_id, saldo, tasa, centavos in zip(pks, propietarios, saldos, tasas, intereses)
+            # Saldos tan pequeños que el interés del día redondea a cero no dejan registro
+            if centavos > 0
+        ]
+        
+        with transaction.atomic():
+            CausacionInteres.objects.bulk_create(causaciones, batch_size=1000)
+            _sumar_causaciones(fuente, fecha, [getattr(causacion, fuente.campo + '_id') for causacion in causaciones])
+            sincronizacion.registrar_ids(
+                fuente.modelo,
+                [(getattr(causacion, fuente.campo + '_id'), causacion.propietario_id) for causacion in causaciones],
+                'U',
+            )
+            _invalidar_reportes({causacion.propietario_id for causacion in causaciones})
+        resultado[fuente.campo] = (len(causaciones), sum((causacion.monto for causacion in causaciones), Decimal('0.00')))
+    return resultado
+
+def _invalidar_reportes(propietarios):
+    # Los reportes cacheados (cartera, métricas) incluyen el interés pendiente
+    for propietario_id in propietarios:
+        transaction.on_commit(lambda propietario_id=propietario_id: versiones.invalidar('reportes', propietario_id))
+
+def _sumar_causaciones(fuente, fecha, pks):
+    # Un UPDATE por lote: interes_causado += causación de la fecha (sin leer ni escribir el resto de campos)
+    del_dia = CausacionInteres.objects.filter(**{fuente.campo: OuterRef('pk')}, fecha=fecha).values('monto')
+    for inicio in range(0, len(pks), 1000):
+        fuente.modelo.objects.filter(pk__in=pks[inicio:inicio + 1000]).update(
+            interes_causado=F('interes_causado') + Subquery(del_dia)
+        )
+
+def recalcular(usuario=None):
+    """Reconstruye ``interes_causado`` como la suma de las causaciones (tras borrar o corregir alguna)"""
+    for fuente in FUENTES:
+        total = CausacionInteres.objects.filter(**{fuente.campo: OuterRef('pk')}).order_by().values(
+            fuente.campo
+        ).annotate(total=Sum('monto')).values('total')
+        deudas = fuente.modelo.objects.all()
+        if usuario is not None:
+            deudas = deudas.de(usuario)
+        deudas.update(interes_causado=Coalesce(
+            Subquery(total), Value(Decimal('0.00')), output_field=DecimalField(max_digits=15, decimal_places=2)
+        ))
+        _invalidar_reportes(set(deudas.order_by().values_list('propietario_id', flat=True).distinct()))
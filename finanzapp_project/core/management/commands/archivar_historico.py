@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.archivo import archivar, fecha_corte, horizonte_dias
+
+class Command(BaseCommand):
+    help = ('Mueve movimientos, pagos de deudas y mis pagos anteriores al horizonte configurado '
+            '(ARCHIVO_HORIZONTE_DIAS) a sus tablas de archivo')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--horizonte-dias', type=int, default=None,
+                            help=f'Antigüedad mínima en días (por defecto {horizonte_dias()})')
+        parser.add_argument('--lote', type=int, default=5000)
+    
+    def handle(self, *args, **options):
+        dias = options['horizonte_dias']
+        self.stdout.write(f"Archivando registros anteriores a {fecha_corte(dias)}...")
+        movidos = archivar(
+            dias=dias,
+            lote=options['lote'],
+            informar=lambda modelo, total: self.stdout.write(f"  {modelo._meta.verbose_name_plural}: {total}"),
+        )
+        for nombre, total in movidos.items():
+            self.stdout.write(self.style.SUCCESS(f"{nombre}: {total} archivados"))
@@ -0,0 +1,148 @@
+import json
+import math
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, reverse
+from django.utils import timezone
+
+from core import api_urls
+from core.models import MovimientoFinanciero
+
+def percentil(valores, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not valores:
+        return None
+    indice = max(math.ceil(p / 100 * len(valores)) - 1, 0)
+    return valores[indice]
+
+def recorrer_patrones(patrones):
+    for patron in patrones:
+        if isinstance(patron, URLResolver):
+            yield from recorrer_patrones(patron.url_patterns)
+        elif isinstance(patron, URLPattern) and patron.name:
+            yield patron
+
+def rutas_api(usuario):
+    """Rutas GET de api_urls con sus argumentos; las de detalle usan el primer registro visible para el usuario"""
+    vistas = set()
+    for patron in recorrer_patrones(api_urls.urlpatterns):
+        grupos = patron.pattern.regex.groupindex
+        if 'format' in grupos or patron.name in vistas:
+            continue
+        vistas.add(patron.name)
+        kwargs = {}
+        if 'pk' in grupos:
+            vista = getattr(patron.callback, 'cls', None)
+            queryset = getattr(vista, 'queryset', None)
+            pk = queryset.de(usuario).values_list('pk', flat=True).first() if queryset is not None else None
+            if pk is None:
+                continue
+            kwargs['pk'] = pk
+        yield patron.name, reverse(patron.name, kwargs=kwargs)
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def propietario_principal():
+    """Usuario dueño de más movimientos (el de los datos sintéticos), o None si todos son sin propietario"""
+    fila = MovimientoFinanciero.objects.filter(propietario__isnull=False).values('propietario').annotate(
+        total=Count('pk')
+    ).order_by('-total').first()
+    return get_user_model().objects.get(pk=fila['propietario']) if fila else None
+
+class Command(BaseCommand):
+    help = 'Mide latencia (p50/p95/p99), número de consultas y memoria pico de cada ruta de la API'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--calentamiento', type=int, default=2, help='Peticiones descartadas antes de medir')
+        parser.add_argument('--ruta', action='append', default=[],
+                            help='Limita la medición a las rutas cuyo nombre contenga este texto (repetible)')
+        parser.add_argument('--host', default='localhost', help='Valor del encabezado Host (debe estar en ALLOWED_HOSTS)')
+        parser.add_argument('--usuario', help='Usuario con el que se autentican las peticiones '
+                                              '(por defecto el dueño de más movimientos)')
+        parser.add_argument('--salida', help='Archivo JSON de resultados; por defecto se imprime en la salida estándar')
+    
+    def handle(self, *args, **options):
+        if options['usuario']:
+            try:
+                usuario = get_user_model().objects.get(username=options['usuario'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No existe el usuario {options['usuario']}")
+        else:
+            usuario = propietario_principal()
+        cliente = Client(HTTP_HOST=options['host'])
+        if usuario is not None:
+            # Las vistas solo muestran los datos del hogar del usuario autenticado
+            cliente.force_login(usuario)
+        self.stderr.write(f"Usuario: {usuario.get_username() if usuario else 'anónimo (datos sin propietario)'}")
+        resultados = {}
+        for nombre, url in rutas_api(usuario):
+            if options['ruta'] and not any(filtro in nombre for filtro in options['ruta']):
+                continue
+            self.stderr.write(f"Midiendo {nombre} ({url})...")
+            resultados[nombre] = self.medir(cliente, url, options['repeticiones'], options['calentamiento'])
+        
+        informe = {
+            'commit': commit_actual(),
+            'fecha': timezone.now().isoformat(),
+            'base_de_datos': connection.vendor,
+            'repeticiones': options['repeticiones'],
+            'usuario': usuario.get_username() if usuario else None,
+            'rutas': resultados,
+        }
+        contenido = json.dumps(informe, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(contenido)
+            self.stderr.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+        else:
+            self.stdout.write(contenido)
+    
+    def medir(self, cliente, url, repeticiones, calentamiento):
+        for _ in range(calentamiento):
+            cliente.get(url)
+        
+        # Latencia sin instrumentación para no distorsionar los tiempos
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            respuesta = cliente.get(url)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        tiempos.sort()
+        
+        # Una petición adicional instrumentada para consultas y memoria
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as consultas:
+                respuesta = cliente.get(url)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        
+        return {
+            'url': url,
+            'status': respuesta.status_code,
+            'bytes': len(respuesta.content),
+            'p50_ms': round(percentil(tiempos, 50), 3),
+            'p95_ms': round(percentil(tiempos, 95), 3),
+            'p99_ms': round(percentil(tiempos, 99), 3),
+            'media_ms': round(statistics.fmean(tiempos), 3),
+            'max_ms': round(tiempos[-1], 3),
+            'consultas': len(consultas),
+            'memoria_pico_kb': round(pico / 1024, 1),
+        }
@@ -0,0 +1,72 @@
+import io
+import json
+import statistics
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import codificacion
+from core.models import MovimientoFinanciero
+from core.serializers import MovimientoFinancieroSerializer
+
+class Command(BaseCommand):
+    help = ('Compara el tiempo de render y de parseo JSON de una lista de movimientos: JSONRenderer/JSONParser '
+            'de DRF frente a los de core.codificacion (con orjson si está instalado y con la biblioteca estándar)')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=10000, help='Movimientos de la lista')
+        parser.add_argument('--repeticiones', type=int, default=10)
+    
+    def handle(self, *args, **options):
+        movimientos = list(MovimientoFinanciero.objects.order_by('-fecha', '-id')[:options['filas']])
+        if not movimientos:
+            raise CommandError("No hay movimientos: genere datos con generar_datos_sinteticos")
+        datos = MovimientoFinancieroSerializer(movimientos, many=True).data
+        # Además de los datos del serializer, los Decimal crudos de los reportes y el dashboard
+        montos = [{'fecha': movimiento.fecha, 'monto': movimiento.monto} for movimiento in movimientos]
+        self.stdout.write(f"{len(movimientos)} movimientos, {options['repeticiones']} repeticiones (mediana en ms)")
+        
+        renderizadores = [
+            ('DRF JSONRenderer', JSONRenderer()),
+            ('RenderizadorJSON', codificacion.RenderizadorJSON()),
+        ]
+        if codificacion.orjson is not None:
+            renderizadores.append(('RenderizadorJSON sin orjson', codificacion.RenderizadorJSON()))
+        
+        referencia = None
+        for nombre, renderizador in renderizadores:
+            with mock.patch.object(codificacion, 'orjson', None) if 'sin orjson' in nombre else _nada():
+                contenido, tiempo = self.medir(lambda: renderizador.render(datos), options['repeticiones'])
+                if nombre != 'DRF JSONRenderer':
+                    # Los Decimal crudos no tienen equivalente en DRF (los escribe como float)
+                    _, tiempo_montos = self.medir(lambda: renderizador.render(montos), options['repeticiones'])
+                    self.stdout.write(f"  render {nombre}: {tiempo:.2f} (Decimal crudos: {tiempo_montos:.2f})")
+                else:
+                    self.stdout.write(f"  render {nombre}: {tiempo:.2f}")
+            if referencia is None:
+                referencia = json.loads(contenido)
+            elif json.loads(contenido) != referencia:
+                raise CommandError(f"{nombre} no produce el mismo JSON que DRF")
+        
+        cuerpo = JSONRenderer().render(datos)
+        for nombre, parser in (('DRF JSONParser', JSONParser()), ('ParserJSON', codificacion.ParserJSON())):
+            _, tiempo = self.medir(lambda: parser.parse(io.BytesIO(cuerpo)), options['repeticiones'])
+            self.stdout.write(f"  parseo {nombre}: {tiempo:.2f}")
+    
+    def medir(self, funcion, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return resultado, statistics.median(tiempos)
+
+class _nada:
+    def __enter__(self):
+        return None
+    
+    def __exit__(self, *args):
+        return False
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import intereses
+
+class Command(BaseCommand):
+    help = ('Causa el interés diario de las deudas abiertas con tasa (por cobrar y propias). '
+            'Es idempotente por fecha: pensado para correr una vez al día')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', default=None,
+                            help='Fecha a causar, AAAA-MM-DD; debe ser hoy (el saldo base es el actual)')
+        parser.add_argument('--propietario', type=int, default=None,
+                            help='Id del usuario propietario (por defecto todos los hogares)')
+        parser.add_argument('--recalcular', action='store_true',
+                            help='Reconstruir el interés causado de cada deuda desde sus causaciones')
+    
+    def handle(self, *args, **options):
+        try:
+            fecha = datetime.strptime(options['fecha'], '%Y-%m-%d').date() if options['fecha'] else None
+        except ValueError:
+            raise CommandError("La fecha debe tener el formato AAAA-MM-DD")
+        
+        usuario = None
+        if options['propietario'] is not None:
+            try:
+                usuario = get_user_model().objects.get(pk=options['propietario'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No existe el usuario {options['propietario']}")
+        
+        if options['recalcular']:
+            intereses.recalcular(usuario)
+            self.stdout.write(self.style.SUCCESS("Interés causado reconstruido desde las causaciones"))
+            return
+        
+        try:
+            causados = intereses.causar(fecha, usuario)
+        except ValueError as e:
+            raise CommandError(str(e))
+        for campo, (deudas, total) in causados.items():
+            self.stdout.write(f"  {campo}: {deudas} deudas, ${total:,.2f}")
+        self.stdout.write(self.style.SUCCESS("Intereses causados"))
@@ -0,0 +1,39 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+
+from core.conciliacion import conciliar, leer_extracto
+
+class Command(BaseCommand):
+    help = ('Concilia un extracto bancario (CSV con fecha, monto, referencia, descripcion) contra '
+            'movimientos, mis pagos y pagos de deudas')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del CSV del extracto')
+        parser.add_argument('--propietario', type=int, default=None,
+                            help='Id del usuario propietario (por defecto los registros sin propietario)')
+        parser.add_argument('--tolerancia-dias', type=int, default=3)
+        parser.add_argument('--salida', default=None, help='Archivo JSON con el detalle del resultado')
+    
+    def handle(self, *args, **options):
+        usuario = AnonymousUser()
+        if options['propietario'] is not None:
+            try:
+                usuario = get_user_model().objects.get(pk=options['propietario'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No existe el usuario {options['propietario']}")
+        
+        with open(options['archivo'], encoding='utf-8-sig') as archivo:
+            lineas, errores = leer_extracto(archivo.read())
+        for error in errores:
+            self.stderr.write(f"Fila {error['fila']}: {error['error']}")
+        
+        resultado = conciliar(usuario, lineas, options['tolerancia_dias'])
+        for clave in ('conciliadas', 'ambiguas', 'sin_conciliar', 'sin_extracto'):
+            self.stdout.write(f"{clave}: {len(resultado[clave])}")
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as salida:
+                json.dump(resultado, salida, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Detalle escrito en {options['salida']}"))
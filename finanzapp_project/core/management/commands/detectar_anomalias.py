@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core.anomalias import actualizar_lineas_base
+
+class Command(BaseCommand):
+    help = ('Actualiza las líneas base de gasto con los movimientos nuevos desde la última ejecución '
+            'y registra alertas para transacciones y meses atípicos')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--propietario', type=int, default=None,
+                            help='Id del usuario propietario (por defecto todos los hogares)')
+        parser.add_argument('--reiniciar', action='store_true',
+                            help='Descarta las líneas base y las recalcula con todo el historial')
+    
+    def handle(self, *args, **options):
+        lineas, alertas = actualizar_lineas_base(
+            propietario_id=options['propietario'],
+            todos=options['propietario'] is None,
+            reiniciar=options['reiniciar'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Líneas base actualizadas: {lineas}. Alertas nuevas: {alertas}"))
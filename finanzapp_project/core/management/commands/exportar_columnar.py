@@ -0,0 +1,47 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import exportacion
+
+class Command(BaseCommand):
+    help = ('Exporta movimientos, deudas y pagos (incluido el histórico archivado) en formato '
+            'columnar: un .npz de NumPy o un archivo Parquet por tabla')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('destino', help='Archivo .npz, o directorio para los archivos Parquet')
+        parser.add_argument('--formato', choices=['npz', 'parquet'], default='npz')
+        parser.add_argument('--propietario', type=int, default=None,
+                            help='Id del usuario propietario (por defecto todos los hogares)')
+        parser.add_argument('--tablas', default='', help=f"Lista separada por comas: {', '.join(exportacion.TABLAS)}")
+        parser.add_argument('--lote', type=int, default=exportacion.LOTE, help='Filas por lote de lectura')
+    
+    def handle(self, *args, **options):
+        usuario = None
+        if options['propietario'] is not None:
+            try:
+                usuario = get_user_model().objects.get(pk=options['propietario'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No existe el usuario {options['propietario']}")
+        
+        tablas = [tabla for tabla in options['tablas'].split(',') if tabla] or list(exportacion.TABLAS)
+        desconocidas = set(tablas) - set(exportacion.TABLAS)
+        if desconocidas:
+            raise CommandError(f"Tablas desconocidas: {', '.join(sorted(desconocidas))}")
+        
+        if options['formato'] == 'npz':
+            filas = exportacion.escribir_npz(options['destino'], usuario, tablas, options['lote'])
+        else:
+            if not exportacion.parquet_disponible():
+                raise CommandError("La exportación a Parquet requiere pyarrow")
+            os.makedirs(options['destino'], exist_ok=True)
+            filas = {
+                tabla: exportacion.escribir_parquet(
+                    os.path.join(options['destino'], f'{tabla}.parquet'), tabla, usuario, options['lote']
+                ) for tabla in tablas
+            }
+        
+        for tabla, cantidad in filas.items():
+            self.stdout.write(f"  {tabla}: {cantidad} filas")
+        self.stdout.write(self.style.SUCCESS(f"Exportación escrita en {options['destino']}"))
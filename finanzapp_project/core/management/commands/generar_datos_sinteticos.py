@@ -0,0 +1,329 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import (
+    Deudor, Deuda, PagoDeuda, CuotaDiferida,
+    Acreedor, MiDeuda, MiPago,
+    CategoriaFinanciera, SubcategoriaFinanciera, MovimientoFinanciero,
+)
+
+# Árbol de categorías usado para los movimientos: (nombre, tipo, naturaleza, subcategorías, monto típico)
+ARBOL_CATEGORIAS = [
+    ('Salario', 'INGRESO', 'FIJO', ['Nómina', 'Prima', 'Bonificación'], 3500000),
+    ('Honorarios', 'INGRESO', 'VARIABLE', ['Consultoría', 'Clases'], 900000),
+    ('Arriendos', 'INGRESO', 'FIJO', ['Apartamento', 'Local'], 1200000),
+    ('Inversiones', 'INGRESO', 'VARIABLE', ['Dividendos', 'Intereses CDT'], 250000),
+    ('Vivienda', 'EGRESO', 'FIJO', ['Arriendo', 'Administración', 'Predial'], 1400000),
+    ('Servicios', 'EGRESO', 'FIJO', ['Agua', 'Luz', 'Gas', 'Internet', 'Celular'], 120000),
+    ('Alimentación', 'EGRESO', 'VARIABLE', ['Mercado', 'Restaurantes', 'Domicilios'], 85000),
+    ('Transporte', 'EGRESO', 'VARIABLE', ['Gasolina', 'Taxi', 'Transporte público', 'Peajes'], 40000),
+    ('Salud', 'EGRESO', 'VARIABLE', ['Medicina prepagada', 'Droguería', 'Consultas'], 150000),
+    ('Educación', 'EGRESO', 'FIJO', ['Colegio', 'Universidad', 'Cursos'], 600000),
+    ('Entretenimiento', 'EGRESO', 'VARIABLE', ['Cine', 'Suscripciones', 'Viajes'], 70000),
+    ('Ropa', 'EGRESO', 'VARIABLE', ['Vestuario', 'Calzado'], 180000),
+]
+
+NOMBRES = ['Ana', 'Carlos', 'Luisa', 'Andrés', 'María', 'Jorge', 'Paula', 'Felipe', 'Camila', 'Diego',
+           'Valentina', 'Santiago', 'Laura', 'Julián', 'Daniela', 'Mateo', 'Sofía', 'Sebastián']
+APELLIDOS = ['García', 'Rodríguez', 'Martínez', 'López', 'González', 'Pérez', 'Sánchez', 'Ramírez',
+             'Torres', 'Díaz', 'Vargas', 'Castro', 'Rojas', 'Moreno', 'Herrera', 'Gómez']
+BANCOS = ['Bancolombia', 'Davivienda', 'Banco de Bogotá', 'BBVA', 'Banco Popular', 'Scotiabank Colpatria',
+          'Banco de Occidente', 'Banco AV Villas', 'Nu Colombia', 'Falabella']
+
+class Command(BaseCommand):
+    help = 'Genera datos sintéticos en volumen (deudores, deudas, mis deudas y movimientos) para pruebas de carga'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--deudores', type=int, default=50000)
+        parser.add_argument('--deudas', type=int, default=500000)
+        parser.add_argument('--acreedores', type=int, default=200)
+        parser.add_argument('--mis-deudas', type=int, default=5000)
+        parser.add_argument('--movimientos', type=int, default=5000000)
+        parser.add_argument('--años', type=int, default=5, help='Años de historia hacia atrás desde hoy')
+        parser.add_argument('--escala', type=float, default=1.0,
+                            help='Multiplica todos los volúmenes (p. ej. 0.01 para una corrida rápida)')
+        parser.add_argument('--lote', type=int, default=5000, help='Tamaño de lote para bulk_create')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--propietario', help='Usuario dueño de los datos generados (por defecto sin propietario)')
+    
+    def handle(self, *args, **options):
+        self.propietario = None
+        if options['propietario']:
+            try:
+                self.propietario = get_user_model().objects.get(username=options['propietario'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No existe el usuario {options['propietario']}")
+        self.rnd = random.Random(options['semilla'])
+        self.lote = options['lote']
+        self.hoy = timezone.now().date()
+        self.dias_historia = 365 * options['años']
+        escala = options['escala']
+        
+        def volumen(clave):
+            return max(int(options[clave] * escala), 0)
+        
+        deudores = self.generar_deudores(volumen('deudores'))
+        self.generar_deudas(deudores, volumen('deudas'))
+        acreedores = self.generar_acreedores(volumen('acreedores'))
+        self.generar_mis_deudas(acreedores, volumen('mis_deudas'))
+        self.generar_movimientos(volumen('movimientos'))
+        self.stdout.write(self.style.SUCCESS('Datos sintéticos generados'))
+    
+    # ===== UTILIDADES =====
+    
+    def fecha_aleatoria(self, dias_atras=None):
+        return self.hoy - timedelta(days=self.rnd.randint(0, dias_atras or self.dias_historia))
+    
+    def monto(self, tipico):
+        """Monto con distribución log-normal alrededor del valor típico, redondeado a centavos"""
+        valor = self.rnd.lognormvariate(0, 0.6) * tipico
+        return Decimal(valor).quantize(Decimal('0.01'))
+    
+    def nombre_persona(self):
+        return f"{self.rnd.choice(NOMBRES)} {self.rnd.choice(APELLIDOS)} {self.rnd.choice(APELLIDOS)}"
+    
+    def insertar(self, modelo, objetos):
+        with transaction.atomic():
+            return modelo.objects.bulk_create(objetos, batch_size=self.lote)
+    
+    def progreso(self, etiqueta, hechos, total):
+        self.stdout.write(f"  {etiqueta}: {hechos}/{total}")
+    
+    # ===== LO QUE ME DEBEN =====
+    
+    def generar_deudores(self, total):
+        self.stdout.write(f"Generando {total} deudores...")
+        inicio = Deudor.objects.filter(propietario=self.propietario).count()
+        ids = []
+        for desde in range(0, total, self.lote):
+            objetos = [
+                Deudor(
+                    propietario=self.propietario,
+                    nombre=self.nombre_persona(),
+                    documento=f"SIN{inicio + i:010d}",
+                    telefono=f"3{self.rnd.randint(100000000, 199999999)}",
+                    activo=self.rnd.random() > 0.1,
+                )
+                for i in range(desde, min(desde + self.lote, total))
+            ]
+            ids.extend(d.pk for d in self.insertar(Deudor, objetos))
+            self.progreso('deudores', len(ids), total)
+        return ids
+    
+    def generar_deudas(self, deudores, total):
+        if not deudores:
+            return
+        self.stdout.write(f"Generando {total} deudas con pagos y cuotas...")
+        for desde in range(0, total, self.lote):
+            deudas, pagos_por_deuda, cuotas_por_deuda = [], [], []
+            for _ in range(min(self.lote, total - desde)):
+                fecha_prestamo = self.fecha_aleatoria()
+                original = self.monto(800000)
+                diferida = self.rnd.random() < 0.3
+                meses = self.rnd.randint(3, 24) if diferida else None
+                vencimiento = fecha_prestamo + timedelta(days=30 * (meses or self.rnd.randint(1, 6)))
+                
+                pagos = []
+                pagado = Decimal('0.00')
+                for _ in range(self.rnd.randint(0, 4)):
+                    abono = min((original * Decimal(self.rnd.uniform(0.05, 0.4))).quantize(Decimal('0.01')), original - pagado)
+                    if abono <= 0:
+                        break
+                    pagado += abono
+                    pagos.append(PagoDeuda(
+                        monto_pago=abono,
+                        fecha_pago=min(fecha_prestamo + timedelta(days=self.rnd.randint(1, 400)), self.hoy),
+                        metodo_pago=self.rnd.choice(['EFECTIVO', 'TRANSFERENCIA', 'CHEQUE', 'OTRO']),
+                        comprobante=f"C{self.rnd.randint(0, 10**9):09d}",
+                    ))
+                pendiente = original - pagado
+                if pendiente == 0:
+                    estado = 'PAGADA'
+                elif vencimiento < self.hoy:
+                    estado = 'VENCIDA'
+                else:
+                    estado = 'PARCIAL' if pagado else 'PENDIENTE'
+                
+                cuotas = []
+                if diferida:
+                    valor_cuota = (original / meses).quantize(Decimal('0.01'))
+                    cuotas_pagadas = int(pagado / valor_cuota) if valor_cuota else 0
+                    for numero in range(1, meses + 1):
+                        fecha_cuota = fecha_prestamo + timedelta(days=30 * numero)
+                        cuotas.append(CuotaDiferida(
+                            numero_cuota=numero,
+                            monto_cuota=valor_cuota,
+                            fecha_vencimiento=fecha_cuota,
+                            pagada=numero <= cuotas_pagadas,
+                            fecha_pago=fecha_cuota if numero <= cuotas_pagadas else None,
+                        ))
+                
+                deudas.append(Deuda(
+                    propietario=self.propietario,
+                    deudor_id=self.rnd.choice(deudores),
+                    concepto=self.rnd.choice(['Préstamo personal', 'Venta a crédito', 'Adelanto', 'Préstamo familiar']),
+                    monto_original=original,
+                    monto_pendiente=pendiente,
+                    fecha_prestamo=fecha_prestamo,
+                    fecha_vencimiento=vencimiento,
+                    tipo_pago='DIFERIDA' if diferida else 'UNICA',
+                    meses_diferido=meses,
+                    tasa_interes=Decimal(self.rnd.choice([0, 0, 1.5, 2, 2.5])),
+                    estado=estado,
+                ))
+                pagos_por_deuda.append(pagos)
+                cuotas_por_deuda.append(cuotas)
+            
+            with transaction.atomic():
+                Deuda.objects.bulk_create(deudas, batch_size=self.lote)
+                pagos, cuotas = [], []
+                for deuda, pagos_deuda, cuotas_deuda in zip(deudas, pagos_por_deuda, cuotas_por_deuda):
+                    for pago in pagos_deuda:
+                        pago.deuda_id = deuda.pk
+                        pagos.append(pago)
+                    for cuota in cuotas_deuda:
+                        cuota.deuda_id = deuda.pk
+                        cuotas.append(cuota)
+                PagoDeuda.objects.bulk_create(pagos, batch_size=self.lote)
+                CuotaDiferida.objects.bulk_create(cuotas, batch_size=self.lote)
+            self.progreso('deudas', desde + len(deudas), total)
+    
+    # ===== LO QUE DEBO =====
+    
+    def generar_acreedores(self, total):
+        self.stdout.write(f"Generando {total} acreedores...")
+        objetos = []
+        for i in range(total):
+            if i < len(BANCOS):
+                objetos.append(Acreedor(propietario=self.propietario, nombre=BANCOS[i], tipo='BANCO',
+                                         documento=f"NIT{i:09d}"))
+            else:
+                objetos.append(Acreedor(
+                    propietario=self.propietario,
+                    nombre=self.nombre_persona(),
+                    tipo=self.rnd.choice(['PERSONA', 'EMPRESA', 'OTRO']),
+                ))
+        return [a.pk for a in self.insertar(Acreedor, objetos)]
+    
+    def generar_mis_deudas(self, acreedores, total):
+        if not acreedores:
+            return
+        self.stdout.write(f"Generando {total} deudas propias con su historial de pagos...")
+        tipos = [clave for clave, _ in MiDeuda.TIPO_CHOICES]
+        metodos = ['TRANSFERENCIA', 'DEBITO_AUTOMATICO', 'PSE', 'EFECTIVO']
+        for desde in range(0, total, self.lote):
+            deudas, pagos_por_deuda = [], []
+            for _ in range(min(self.lote, total - desde)):
+                contrato = self.fecha_aleatoria()
+                plazo = self.rnd.choice([6, 12, 24, 36, 48, 60])
+                original = self.monto(5000000)
+                tasa = Decimal(self.rnd.choice(['0', '12.5', '18.9', '24.5', '28.0']))
+                cuota = (original / plazo).quantize(Decimal('0.01'))
+                
+                pagos = []
+                capital_pagado = Decimal('0.00')
+                meses_transcurridos = min(plazo, (self.hoy - contrato).days // 30)
+                for numero in range(1, meses_transcurridos + 1):
+                    capital = min(cuota, original - capital_pagado)
+                    if capital <= 0:
+                        break
+                    interes = ((original - capital_pagado) * tasa / 100 / 12).quantize(Decimal('0.01'))
+                    capital_pagado += capital
+                    pagos.append(MiPago(
+                        monto_pago=capital + interes,
+                        monto_capital=capital,
+                        monto_interes=interes,
+                        fecha_pago=contrato + timedelta(days=30 * numero),
+                        metodo_pago=self.rnd.choice(metodos),
+                        numero_transaccion=f"T{self.rnd.randint(0, 10**12):012d}",
+                    ))
+                saldo = original - capital_pagado
+                vencimiento = contrato + timedelta(days=30 * plazo)
+                if saldo <= 0:
+                    estado = 'PAGADA'
+                elif vencimiento < self.hoy:
+                    estado = 'VENCIDA'
+                else:
+                    estado = 'PARCIAL' if capital_pagado else 'PENDIENTE'
+                
+                deudas.append(MiDeuda(
+                    propietario=self.propietario,
+                    acreedor_id=self.rnd.choice(acreedores),
+                    numero_cuenta=f"{self.rnd.randint(10**9, 10**10 - 1)}",
+                    tipo_deuda=self.rnd.choice(tipos),
+                    concepto='Crédito sintético',
+                    monto_original=original,
+                    saldo_pendiente=saldo,
+                    tasa_interes=tasa,
+                    interes_pagado=sum((pago.monto_interes for pago in pagos), Decimal('0.00')),
+                    fecha_contrato=contrato,
+                    fecha_vencimiento=vencimiento,
+                    cuota_mensual=cuota,
+                    plazo_meses=plazo,
+                    prioridad=self.rnd.choice(['ALTA', 'MEDIA', 'BAJA']),
+                    estado=estado,
+                ))
+                pagos_por_deuda.append(pagos)
+            
+            with transaction.atomic():
+                MiDeuda.objects.bulk_create(deudas, batch_size=self.lote)
+                pagos = []
+                for deuda, pagos_deuda in zip(deudas, pagos_por_deuda):
+                    for pago in pagos_deuda:
+                        pago.mi_deuda_id = deuda.pk
+                        pagos.append(pago)
+                MiPago.objects.bulk_create(pagos, batch_size=self.lote)
+            self.progreso('mis deudas', desde + len(deudas), total)
+    
+    # ===== INGRESOS Y EGRESOS =====
+    
+    def arbol_categorias(self):
+        """Crea (si no existen) las categorías y subcategorías y devuelve las hojas para generar movimientos"""
+        hojas = []
+        for nombre, tipo, naturaleza, subcategorias, tipico in ARBOL_CATEGORIAS:
+            categoria, _ = CategoriaFinanciera.objects.get_or_create(
+                propietario=self.propietario, nombre=nombre, tipo=tipo, naturaleza=naturaleza
+            )
+            for nombre_sub in subcategorias:
+                subcategoria, _ = SubcategoriaFinanciera.objects.get_or_create(categoria=categoria, nombre=nombre_sub)
+                hojas.append((categoria.pk, subcategoria.pk, tipo, tipico, nombre_sub))
+        return hojas
+    
+    def generar_movimientos(self, total):
+        if not total:
+            return
+        self.stdout.write(f"Generando {total} movimientos...")
+        hojas = self.arbol_categorias()
+        ingresos = [h for h in hojas if h[2] == 'INGRESO']
+        egresos = [h for h in hojas if h[2] == 'EGRESO']
+        metodos = [clave for clave, _ in MovimientoFinanciero.METODO_PAGO_CHOICES]
+        for desde in range(0, total, self.lote):
+            objetos = []
+            for _ in range(min(self.lote, total - desde)):
+                # Aproximadamente 1 de cada 6 movimientos es un ingreso
+                categoria_id, subcategoria_id, tipo, tipico, nombre = self.rnd.choice(
+                    ingresos if self.rnd.random() < 0.17 else egresos
+                )
+                objetos.append(MovimientoFinanciero(
+                    propietario=self.propietario,
+                    tipo=tipo,
+                    categoria_id=categoria_id,
+                    subcategoria_id=subcategoria_id,
+                    descripcion=nombre,
+                    monto=self.monto(tipico),
+                    fecha=self.fecha_aleatoria(),
+                    metodo_pago=self.rnd.choice(metodos),
+                    referencia=f"R{self.rnd.randint(0, 10**12):012d}",
+                ))
+            self.insertar(MovimientoFinanciero, objetos)
+            self.progreso('movimientos', desde + len(objetos), total)
+        
+        # bulk_create no dispara las señales que mantienen los saldos diarios
+        call_command('reconstruir_saldos', stdout=self.stdout)
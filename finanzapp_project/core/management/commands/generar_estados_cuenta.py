@@ -0,0 +1,51 @@
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import estados_cuenta
+
+class Command(BaseCommand):
+    help = ('Genera los estados de cuenta mensuales de los deudores activos (HTML para imprimir, '
+            'opcionalmente también PDF), renderizando en varios procesos')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('destino', help='Directorio donde se escriben los estados de cuenta')
+        parser.add_argument('--año', type=int, default=None, help='Año del periodo (por defecto el mes anterior)')
+        parser.add_argument('--mes', type=int, default=None, help='Mes del periodo, 1-12 (por defecto el mes anterior)')
+        parser.add_argument('--propietario', type=int, default=None,
+                            help='Id del usuario propietario (por defecto todos los hogares)')
+        parser.add_argument('--deudores', default='', help='Ids de deudores separados por comas')
+        parser.add_argument('--procesos', type=int, default=None, help='Procesos de render (por defecto uno por núcleo)')
+        parser.add_argument('--lote', type=int, default=estados_cuenta.LOTE, help='Deudores por lote de lectura')
+        parser.add_argument('--pdf', action='store_true', help='Escribir también el PDF (requiere WeasyPrint)')
+    
+    def handle(self, *args, **options):
+        hoy = date.today().replace(day=1)
+        anterior = date(hoy.year - 1, 12, 1) if hoy.month == 1 else date(hoy.year, hoy.month - 1, 1)
+        año = options['año'] or anterior.year
+        mes = options['mes'] or anterior.month
+        if not 1 <= mes <= 12:
+            raise CommandError("El mes debe estar entre 1 y 12")
+        
+        usuario = None
+        if options['propietario'] is not None:
+            try:
+                usuario = get_user_model().objects.get(pk=options['propietario'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No existe el usuario {options['propietario']}")
+        
+        if options['pdf']:
+            try:
+                import weasyprint  # noqa: F401
+            except ImportError:
+                raise CommandError("La salida en PDF requiere WeasyPrint")
+        
+        deudor_ids = [int(pk) for pk in options['deudores'].split(',') if pk] or None
+        rutas = estados_cuenta.generar(
+            año, mes, options['destino'], usuario, deudor_ids, options['procesos'], options['lote'], options['pdf'],
+            informar=lambda hechos, total: self.stdout.write(f"  {hechos}/{total} deudores"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(rutas)} estados de cuenta de {año}-{mes:02d} escritos en {options['destino']}"
+        ))
@@ -0,0 +1,83 @@
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import trabajos
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = ('Ejecuta los trabajos encolados (core.trabajos) en un pool de hilos. Se pueden lanzar '
+            'varias instancias: cada trabajo lo toma un solo trabajador')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=2, help='Trabajos simultáneos en este proceso')
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--tareas', default='', help='Solo estas tareas (separadas por comas)')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesa lo pendiente y termina (útil en cron o pruebas)')
+    
+    def handle(self, *args, **options):
+        nombre = f'{socket.gethostname()}:{os.getpid()}'
+        tareas = [tarea for tarea in options['tareas'].split(',') if tarea] or None
+        hilos = max(1, options['hilos'])
+        en_curso = {}
+        detener = threading.Event()
+        
+        def latir():
+            # Hilo aparte: los trabajos largos siguen marcados como vivos aunque no informen avance
+            while not detener.wait(30):
+                close_old_connections()
+                trabajos.latir(list(en_curso.values()))
+        
+        def procesar(trabajo):
+            close_old_connections()
+            try:
+                return trabajos.ejecutar(trabajo)
+            finally:
+                close_old_connections()
+        
+        rescatados = trabajos.rescatar_abandonados()
+        if rescatados:
+            self.stdout.write(f"Trabajos abandonados devueltos a la cola o fallidos: {rescatados}")
+        threading.Thread(target=latir, daemon=True).start()
+        self.stdout.write(f"Trabajador {nombre} con {hilos} hilos")
+        
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            try:
+                while True:
+                    while len(en_curso) < hilos:
+                        trabajo = trabajos.tomar(nombre, tareas)
+                        if trabajo is None:
+                            break
+                        self.stdout.write(f"  → {trabajo}")
+                        en_curso[pool.submit(procesar, trabajo)] = trabajo.pk
+                    
+                    if not en_curso:
+                        if options['una_vez']:
+                            break
+                        time.sleep(options['intervalo'])
+                        trabajos.rescatar_abandonados()
+                        continue
+                    
+                    terminados, _ = wait(list(en_curso), timeout=options['intervalo'], return_when=FIRST_COMPLETED)
+                    for futuro in terminados:
+                        pk = en_curso.pop(futuro)
+                        try:
+                            estado = 'completado' if futuro.result() else 'con error'
+                        except Exception:
+                            # Sin registrar (p. ej. la base no respondió): sin latido, rescatar_abandonados lo recupera
+                            logger.exception("Trabajo %s interrumpido sin registrar su estado", pk)
+                            estado = 'interrumpido'
+                        self.stdout.write(f"  ← trabajo #{pk} {estado}")
+            except KeyboardInterrupt:
+                self.stdout.write("Deteniendo: se esperan los trabajos en curso")
+            finally:
+                detener.set()
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from core.saldos import reconstruir_saldos
+
+class Command(BaseCommand):
+    help = 'Regenera la tabla de saldos diarios a partir de todos los movimientos financieros'
+    
+    def handle(self, *args, **options):
+        dias = reconstruir_saldos()
+        self.stdout.write(self.style.SUCCESS(f"Saldos diarios reconstruidos: {dias} días"))
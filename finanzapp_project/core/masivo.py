@@ -0,0 +1,239 @@
+import copy
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import IntegrityError, transaction
+from django.db.models import ProtectedError
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.routers import DefaultRouter, Route
+
+from .signals import cambios_masivos, senales_suspendidas
+
+class RouterMasivo(DefaultRouter):
+    """Router que además expone PATCH y DELETE sobre la ruta de lista (operaciones en lote)"""
+    
+    routes = [
+        Route(
+            url=ruta.url,
+            mapping={**ruta.mapping, 'patch': 'actualizar_lote', 'delete': 'eliminar_lote'},
+            name=ruta.name,
+            detail=ruta.detail,
+            initkwargs=ruta.initkwargs,
+        ) if isinstance(ruta, Route) and ruta.name == '{basename}-list' else ruta
+        for ruta in DefaultRouter.routes
+    ]
+
+def _errores_por_indice(errores):
+    # ListSerializer.errors es una lista o, según la versión de DRF, un dict {índice: errores}
+    pares = errores.items() if isinstance(errores, dict) else enumerate(errores)
+    return [
+        {'indice': indice, 'errores': error}
+        for indice, error in pares if error
+    ]
+
+def _ids(valores):
+    """Convierte los ids del lote a enteros; devuelve (ids, respuesta de error o None)"""
+    try:
+        return [int(valor) for valor in valores], None
+    except (TypeError, ValueError):
+        return None, Response({'error': 'Los ids deben ser números enteros'}, status=status.HTTP_400_BAD_REQUEST)
+
+def _conflicto(error):
+    mensaje = 'El registro ya existe (duplicado)' if 'huella' in str(error) else str(error)
+    return Response({'error': mensaje}, status=status.HTTP_409_CONFLICT)
+
+class OperacionesMasivasMixin:
+    """Creación, actualización y borrado de varios registros en una sola petición.
+    
+    - POST con una lista: valida todos los elementos y los crea con bulk_create.
+      Si el modelo tiene ``huella``, los elementos con referencia ya registrados
+      (o repetidos en el mismo lote) se omiten: en su posición se devuelve el registro
+      existente y sus índices van en la cabecera ``X-Duplicados-Omitidos``.
+    - PATCH sobre la lista: cada elemento lleva su ``id``; se aplica con bulk_update.
+    - DELETE sobre la lista: ``{"ids": [...]}`` o una lista de ids.
+    
+    Todo o nada: si algún elemento es inválido no se escribe ninguno y la
+    respuesta (400) indica el índice y los errores de cada elemento.
+    """
+    
+    def _lote(self, datos):
+        maximo = getattr(settings, 'API_LOTE_MAXIMO', 1000)
+        if not isinstance(datos, list) or not datos:
+            return None, Response({'error': 'Se esperaba una lista no vacía'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(datos) > maximo:
+            return None, Response({'error': f'El lote supera el máximo de {maximo} elementos'},
+                                  status=status.HTTP_400_BAD_REQUEST)
+        return datos, None
+    
+    def _preparar(self, instancia):
+        """Aplica las reglas de save() del modelo; devuelve el error o None"""
+        preparar = getattr(instancia, 'preparar_guardado', None)
+        if preparar is None:
+            return None
+        try:
+            preparar()
+        except ValueError as e:
+            return {'non_field_errors': [str(e)]}
+        return None
+    
+    def _valores(self, instancia):
+        return {campo.name: getattr(instancia, campo.attname) for campo in instancia._meta.concrete_fields}
+    
+    def _sin_conflicto(self, escribir, *args, **kwargs):
+        """Escritura individual: una violación de unicidad (p. ej. un duplicado) responde 409"""
+        try:
+            with transaction.atomic():
+                return escribir(*args, **kwargs)
+        except IntegrityError as e:
+            return _conflicto(e)
+    
+    def _omitir_duplicados(self, modelo, instancias):
+        """Separa las instancias cuya huella ya existe en la base o aparece antes en el lote.
+        
+        Las que no tienen huella (sin referencia: registros manuales) siempre son nuevas.
+        Devuelve (nuevas, {índice: instancia existente o primera del lote}).
+        """
+        try:
+            modelo._meta.get_field('huella')
+        except FieldDoesNotExist:
+            return instancias, {}
+        vistas = modelo.objects.in_bulk(
+            [instancia.huella for instancia in instancias if instancia.huella], field_name='huella'
+        )
+        nuevas, omitidas = [], {}
+        for indice, instancia in enumerate(instancias):
+            if instancia.huella is None:
+                nuevas.append(instancia)
+            elif instancia.huella in vistas:
+                omitidas[indice] = vistas[instancia.huella]
+            else:
+                vistas[instancia.huella] = instancia
+                nuevas.append(instancia)
+        return nuevas, omitidas
+    
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return self._sin_conflicto(super().create, request, *args, **kwargs)
+        datos, error = self._lote(request.data)
+        if error:
+            return error
+        
+        serializer = self.get_serializer(data=datos, many=True)
+        if not serializer.is_valid():
+            return Response({'errores': _errores_por_indice(serializer.errors)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        modelo = self.get_queryset().model
+        instancias = [modelo(**valores) for valores in serializer.validated_data]
+        errores = [self._preparar(instancia) for instancia in instancias]
+        if any(errores):
+            return Response({'errores': _errores_por_indice(errores)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        nuevas, omitidas = self._omitir_duplicados(modelo, instancias)
+        try:
+            with transaction.atomic():
+                creados = modelo.objects.bulk_create(nuevas)
+                if creados:
+                    cambios_masivos.send(sender=modelo, creados=creados)
+        except IntegrityError as e:
+            return _conflicto(e)
+        
+        # La respuesta conserva el orden del lote: cada posición omitida lleva el registro que ya existía
+        resultado = [omitidas.get(indice, instancia) for indice, instancia in enumerate(instancias)]
+        respuesta = Response(
+            self.get_serializer(resultado, many=True).data,
+            status=status.HTTP_201_CREATED if creados else status.HTTP_200_OK
+        )
+        if omitidas:
+            respuesta['X-Duplicados-Omitidos'] = ','.join(str(indice) for indice in omitidas)
+        return respuesta
+    
+    def update(self, request, *args, **kwargs):
+        return self._sin_conflicto(super().update, request, *args, **kwargs)
+    
+    def actualizar_lote(self, request, *args, **kwargs):
+        datos, error = self._lote(request.data)
+        if error:
+            return error
+        
+        ids, error = _ids(
+            elemento['id'] for elemento in datos if isinstance(elemento, dict) and elemento.get('id') is not None
+        )
+        if error:
+            return error
+        existentes = self.get_queryset().in_bulk(ids)
+        errores = []
+        actualizados = []
+        campos_por_instancia = []
+        for elemento in datos:
+            pk = elemento.get('id') if isinstance(elemento, dict) else None
+            instancia = existentes.get(int(pk)) if pk is not None else None
+            if instancia is None:
+                errores.append({'id': ['No existe o no pertenece al usuario']})
+                continue
+            serializer = self.get_serializer(instancia, data=elemento, partial=True)
+            if not serializer.is_valid():
+                errores.append(serializer.errors)
+                continue
+            anterior = copy.copy(instancia)
+            for campo, valor in serializer.validated_data.items():
+                setattr(instancia, campo, valor)
+            antes = self._valores(instancia)
+            errores.append(self._preparar(instancia))
+            # Solo los campos de la petición y los que preparar_guardado() cambió (p. ej. el estado):
+            # los demás pueden estar actualizándose a la vez con F() (monto_actual, interes_causado...)
+            campos_por_instancia.append(set(serializer.validated_data) | {
+                campo for campo, valor in self._valores(instancia).items() if antes[campo] != valor
+            })
+            actualizados.append((anterior, instancia))
+        if any(errores):
+            return Response({'errores': _errores_por_indice(errores)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # bulk_update no pasa por save(): los campos auto_now se asignan aquí
+        modelo = self.get_queryset().model
+        ahora = timezone.now()
+        automaticos = [campo for campo in modelo._meta.concrete_fields if getattr(campo, 'auto_now', False)]
+        concretos = {campo.name for campo in modelo._meta.concrete_fields if not campo.primary_key}
+        grupos = defaultdict(list)
+        for (_, instancia), campos in zip(actualizados, campos_por_instancia):
+            for campo in automaticos:
+                setattr(instancia, campo.attname, ahora)
+            campos = (campos | {campo.name for campo in automaticos}) & concretos
+            if campos:
+                grupos[frozenset(campos)].append(instancia)
+        
+        instancias = [instancia for _, instancia in actualizados]
+        try:
+            with transaction.atomic():
+                # Un bulk_update por combinación de campos, para no escribir los que un elemento no cambió
+                for campos, grupo in grupos.items():
+                    modelo.objects.bulk_update(grupo, sorted(campos), batch_size=500)
+                cambios_masivos.send(sender=modelo, actualizados=actualizados)
+        except IntegrityError as e:
+            return _conflicto(e)
+        return Response(self.get_serializer(instancias, many=True).data)
+    
+    def eliminar_lote(self, request, *args, **kwargs):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else request.data
+        ids, error = self._lote(ids)
+        if error:
+            return error
+        ids, error = _ids(ids)
+        if error:
+            return error
+        
+        eliminados = list(self.get_queryset().filter(pk__in=ids))
+        if not eliminados:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        modelo = self.get_queryset().model
+        try:
+            with transaction.atomic():
+                # Los receptores por fila se sustituyen por una sola señal del lote
+                with senales_suspendidas():
+                    modelo.objects.filter(pk__in=[instancia.pk for instancia in eliminados]).delete()
+                cambios_masivos.send(sender=modelo, eliminados=eliminados)
+        except ProtectedError as e:
+            return Response({'error': str(e.args[0])}, status=status.HTTP_409_CONFLICT)
+        return Response({'eliminados': len(eliminados)})
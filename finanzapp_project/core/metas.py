@@ -0,0 +1,137 @@
+"""Metas financieras vinculadas a una categoría (o subcategoría).
+
+Los movimientos de la categoría desde la fecha de inicio de la meta son sus
+aportes. Las señales los suman (o restan) por mes en AporteMeta y en
+``monto_actual`` con expresiones F(), de modo que el listado de metas muestra
+el avance sin volver a agregar el historial.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from . import sincronizacion
+from .models import AporteMeta, MetaFinanciera, MovimientoFinanciero, MovimientoFinancieroArchivo
+
+def _indice_mes(fecha):
+    return fecha.year * 12 + fecha.month - 1
+
+def metas_vinculadas(propietario_id, categoria_id, subcategoria_id, fecha):
+    """Metas que reciben como aporte un movimiento con esos datos"""
+    return MetaFinanciera.objects.filter(
+        propietario_id=propietario_id,
+        categoria_id=categoria_id,
+        fecha_inicio__lte=fecha
+    ).filter(Q(subcategoria__isnull=True) | Q(subcategoria_id=subcategoria_id))
+
+def aplicar_aportes(deltas):
+    """Suma los deltas {(propietario_id, categoria_id, subcategoria_id, fecha): monto} a las metas vinculadas"""
+    ahora = timezone.now()
+    with transaction.atomic():
+        for (propietario_id, categoria_id, subcategoria_id, fecha), monto in deltas.items():
+            if not monto:
+                continue
+            mes = fecha.replace(day=1)
+            for meta_id in metas_vinculadas(propietario_id, categoria_id, subcategoria_id, fecha).values_list('pk', flat=True):
+                AporteMeta.objects.get_or_create(meta_id=meta_id, mes=mes)
+                AporteMeta.objects.filter(meta_id=meta_id, mes=mes).update(monto=F('monto') + monto)
+                MetaFinanciera.objects.filter(pk=meta_id).update(
+                    monto_actual=F('monto_actual') + monto,
+                    fecha_actualizacion=ahora
+                )
+                sincronizacion.registrar_ids(MetaFinanciera, [(meta_id, propietario_id)], 'U')
+
+def recalcular(meta):
+    """Reconstruye aportes y monto_actual desde el historial (al vincular la meta o cambiar el vínculo)"""
+    if not meta.vinculada:
+        desvincular(meta)
+        return
+    with transaction.atomic():
+        AporteMeta.objects.filter(meta=meta).delete()
+        filtros = {
+            'propietario_id': meta.propietario_id,
+            'categoria_id': meta.categoria_id,
+            'fecha__gte': meta.fecha_inicio,
+        }
+        if meta.subcategoria_id:
+            filtros['subcategoria_id'] = meta.subcategoria_id
+        por_mes = defaultdict(Decimal)
+        for modelo in (MovimientoFinanciero, MovimientoFinancieroArchivo):
+            filas = modelo.objects.filter(**filtros).annotate(mes=TruncMonth('fecha')).values('mes').annotate(
+                total=Sum('monto')
+            ).order_by()
+            for fila in filas:
+                por_mes[fila['mes']] += fila['total']
+        AporteMeta.objects.bulk_create([
+            AporteMeta(meta=meta, mes=mes, monto=total) for mes, total in por_mes.items()
+        ])
+        meta.monto_actual = sum(por_mes.values(), Decimal('0.00'))
+        MetaFinanciera.objects.filter(pk=meta.pk).update(monto_actual=meta.monto_actual)
+
+def desvincular(meta, monto_editado=False):
+    """Quita los aportes de una meta que dejó de estar vinculada.
+
+    monto_actual queda con el total aportado hasta ahora, leído de la base y no
+    de la instancia (que puede no incluir aportes recientes), salvo que el
+    mismo guardado lo haya editado. Desde entonces se actualiza a mano.
+    """
+    with transaction.atomic():
+        aportes = AporteMeta.objects.filter(meta=meta)
+        if not monto_editado:
+            meta.monto_actual = aportes.aggregate(total=Sum('monto'))['total'] or Decimal('0.00')
+            MetaFinanciera.objects.filter(pk=meta.pk).update(monto_actual=meta.monto_actual)
+        aportes.delete()
+
+def proyecciones(metas):
+    """Fecha estimada de cumplimiento de cada meta vinculada: {meta_id: fecha o None}.
+
+    Ajusta una recta al avance acumulado por mes de cada meta (mínimos
+    cuadrados). Las sumas de todas las metas se obtienen a la vez con
+    bincount, sin un ajuste por meta.
+    """
+    metas = [meta for meta in metas if meta.vinculada]
+    resultado = {meta.pk: None for meta in metas}
+    filas = list(AporteMeta.objects.filter(meta__in=[meta.pk for meta in metas]).order_by('meta_id', 'mes').values_list(
+        'meta_id', 'mes', 'monto'
+    ))
+    if not filas:
+        return resultado
+    
+    posicion = {meta.pk: i for i, meta in enumerate(metas)}
+    grupos = len(metas)
+    g = np.fromiter((posicion[fila[0]] for fila in filas), dtype=np.int64, count=len(filas))
+    x = np.fromiter((_indice_mes(fila[1]) for fila in filas), dtype=float, count=len(filas))
+    aporte = np.fromiter((float(fila[2]) for fila in filas), dtype=float, count=len(filas))
+    origen = x.min()
+    x -= origen
+    
+    # Avance acumulado dentro de cada meta (las filas vienen ordenadas por meta y mes)
+    acumulado = np.cumsum(aporte)
+    inicios = np.r_[0, np.flatnonzero(np.diff(g)) + 1]
+    base = np.zeros(grupos)
+    base[g[inicios]] = acumulado[inicios] - aporte[inicios]
+    y = acumulado - base[g]
+    
+    n = np.bincount(g, minlength=grupos).astype(float)
+    sx = np.bincount(g, weights=x, minlength=grupos)
+    sy = np.bincount(g, weights=y, minlength=grupos)
+    sxy = np.bincount(g, weights=x * y, minlength=grupos)
+    sxx = np.bincount(g, weights=x * x, minlength=grupos)
+    denominador = n * sxx - sx ** 2
+    valida = (n >= 2) & (denominador > 0)
+    pendiente = np.divide(n * sxy - sx * sy, denominador, out=np.zeros(grupos), where=valida)
+    intercepto = np.divide(sy - pendiente * sx, n, out=np.zeros(grupos), where=n > 0)
+    
+    for meta in metas:
+        i = posicion[meta.pk]
+        if meta.monto_actual >= meta.monto_objetivo or not valida[i] or pendiente[i] <= 0:
+            continue
+        mes = int(np.ceil((float(meta.monto_objetivo) - intercepto[i]) / pendiente[i] + origen))
+        if mes // 12 <= date.max.year:
+            resultado[meta.pk] = date(mes // 12, mes % 12 + 1, 1)
+    return resultado
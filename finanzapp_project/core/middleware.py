@@ -0,0 +1,252 @@
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from django.utils.text import slugify
+
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .models import PerfilPeticion
+from .perfilador import aperfilar, perfilar
+
+logger = logging.getLogger('core.instrumentacion')
+
+class RegistroConsultas:
+    """execute_wrapper que acumula número, tiempo y repeticiones de las consultas SQL"""
+    
+    def __init__(self):
+        self.total = 0
+        self.tiempo = 0.0
+        self.por_sentencia = Counter()
+        self.por_sentencia_y_parametros = Counter()
+    
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo += time.perf_counter() - inicio
+            self.total += 1
+            self.por_sentencia[sql] += 1
+            self.por_sentencia_y_parametros[(sql, repr(params))] += 1
+    
+    @property
+    def duplicadas(self):
+        """Consultas idénticas (misma sentencia y parámetros) ejecutadas más de una vez"""
+        return sum(n - 1 for n in self.por_sentencia_y_parametros.values() if n > 1)
+    
+    def sentencia_mas_repetida(self):
+        if not self.por_sentencia:
+            return None, 0
+        return self.por_sentencia.most_common(1)[0]
+
+class InstrumentacionSQLMiddleware:
+    """Mide consultas, tiempo de base de datos y de renderizado de cada petición.
+
+    Publica los valores en los encabezados Server-Timing y X-Query-Count y
+    registra en el logger ``core.instrumentacion`` las peticiones lentas o con
+    sospecha de N+1 (misma sentencia repetida muchas veces con distintos
+    parámetros). Los umbrales se configuran con INSTRUMENTACION_LENTO_MS e
+    INSTRUMENTACION_N_MAS_1.
+
+    Solo ve las consultas hechas en el hilo de la petición: las vistas
+    asíncronas que reparten consultas entre hilos reportan únicamente las suyas.
+    Bajo ASGI el hilo de la petición es el de sync_to_async(thread_sensitive=True),
+    y ahí se instala el registro. Las respuestas en streaming generan (y
+    consultan) su cuerpo después de salir del middleware: no se miden.
+    """
+    
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.umbral_lento_ms = getattr(settings, 'INSTRUMENTACION_LENTO_MS', 500)
+        self.umbral_n_mas_1 = getattr(settings, 'INSTRUMENTACION_N_MAS_1', 10)
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        registro, pila, inicio = self.iniciar(request)
+        with pila:
+            response = self.get_response(request)
+        return self.terminar(request, response, registro, inicio)
+    
+    async def __acall__(self, request):
+        registro, pila, inicio = await sync_to_async(self.iniciar)(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(pila.close)()
+        return self.terminar(request, response, registro, inicio)
+    
+    def iniciar(self, request):
+        registro = RegistroConsultas()
+        request._tiempo_render = 0.0
+        pila = ExitStack()
+        for conexion in connections.all():
+            pila.enter_context(conexion.execute_wrapper(registro))
+        return registro, pila, time.perf_counter()
+    
+    def terminar(self, request, response, registro, inicio):
+        if response.streaming:
+            return response
+        total = time.perf_counter() - inicio
+        
+        db_ms = registro.tiempo * 1000
+        render_ms = request._tiempo_render * 1000
+        total_ms = total * 1000
+        app_ms = max(total_ms - db_ms - render_ms, 0)
+        
+        response['X-Query-Count'] = str(registro.total)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={db_ms:.1f};desc="{registro.total} consultas, {registro.duplicadas} duplicadas"',
+            f'render;dur={render_ms:.1f};desc="serializacion"',
+            f'app;dur={app_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+        
+        self.registrar(request, response, registro, total_ms, db_ms)
+        return response
+    
+    def process_template_response(self, request, response):
+        # Las respuestas de DRF se renderizan (serialización JSON) después de
+        # este punto; el callback marca el final del renderizado.
+        inicio = time.perf_counter()
+        
+        def fin_render(respuesta):
+            request._tiempo_render = time.perf_counter() - inicio
+        
+        response.add_post_render_callback(fin_render)
+        return response
+    
+    def registrar(self, request, response, registro, total_ms, db_ms):
+        sentencia, repeticiones = registro.sentencia_mas_repetida()
+        if total_ms >= self.umbral_lento_ms:
+            logger.warning(
+                "Petición lenta: %s %s -> %s en %.1f ms (%d consultas, %.1f ms en BD)",
+                request.method, request.path, response.status_code, total_ms, registro.total, db_ms,
+            )
+        if repeticiones >= self.umbral_n_mas_1:
+            logger.warning(
+                "Posible N+1: %s %s ejecutó %d veces la sentencia: %s",
+                request.method, request.path, repeticiones, sentencia,
+            )
+
+class PerfiladorMiddleware:
+    """Perfila una petición puntual cuando un usuario staff lo solicita.
+
+    Se activa con el encabezado ``X-Perfilar`` o el parámetro ``?_perfilar=``
+    (valor ``cprofile`` o ``muestreo``) y solo si PERFILADOR_HABILITADO es
+    verdadero. El usuario se resuelve con la sesión y, si no es staff, con
+    los autenticadores de DRF (clientes de la API con Basic u otro esquema).
+    Guarda el .prof y las pilas colapsadas en PERFILADOR_DIR y deja el
+    registro en PerfilPeticion para consultarlo desde el admin. Debe ir
+    después de AuthenticationMiddleware.
+    
+    Bajo ASGI se perfila el hilo del bucle de eventos mientras se espera la
+    respuesta: incluye lo que el bucle atienda de otras peticiones en ese
+    lapso y no las consultas que corren en hilos de sync_to_async.
+    """
+    
+    MODOS = {'1': 'CPROFILE', 'cprofile': 'CPROFILE', 'muestreo': 'MUESTREO'}
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.habilitado = getattr(settings, 'PERFILADOR_HABILITADO', False)
+        self.directorio = getattr(settings, 'PERFILADOR_DIR', settings.BASE_DIR / 'perfiles')
+        self.intervalo = getattr(settings, 'PERFILADOR_INTERVALO_MS', 5) / 1000
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        modo = self.modo_solicitado(request)
+        usuario = self.staff(request) if modo else None
+        if usuario is None:
+            return self.get_response(request)
+        
+        response, duracion, muestreador, perfil = perfilar(
+            lambda: self.get_response(request),
+            con_cprofile=(modo == 'CPROFILE'),
+            intervalo=self.intervalo,
+        )
+        return self.terminar(request, usuario, response, modo, duracion, muestreador, perfil)
+    
+    async def __acall__(self, request):
+        modo = self.modo_solicitado(request)
+        usuario = await sync_to_async(self.staff)(request) if modo else None
+        if usuario is None:
+            return await self.get_response(request)
+        
+        response, duracion, muestreador, perfil = await aperfilar(
+            lambda: self.get_response(request),
+            con_cprofile=(modo == 'CPROFILE'),
+            intervalo=self.intervalo,
+        )
+        return await sync_to_async(self.terminar)(request, usuario, response, modo, duracion, muestreador, perfil)
+    
+    def modo_solicitado(self, request):
+        if not self.habilitado:
+            return None
+        valor = request.headers.get('X-Perfilar') or request.GET.get('_perfilar')
+        if not valor or valor.lower() not in self.MODOS:
+            return None
+        return self.MODOS[valor.lower()]
+    
+    def staff(self, request):
+        """Usuario staff que pide el perfil (sesión o autenticadores de DRF), o None"""
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return user
+        autenticadores = [clase() for clase in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+        try:
+            user = Request(request, authenticators=autenticadores).user
+        except APIException:
+            return None
+        return user if user.is_staff else None
+    
+    def terminar(self, request, usuario, response, modo, duracion, muestreador, perfil):
+        registro = self.guardar(request, usuario, response, modo, duracion, muestreador, perfil)
+        response['X-Perfil-Id'] = str(registro.pk)
+        return response
+    
+    def guardar(self, request, usuario, response, modo, duracion, muestreador, perfil):
+        os.makedirs(self.directorio, exist_ok=True)
+        base = f"{timezone.now():%Y%m%d-%H%M%S-%f}-{slugify(request.path)[:80] or 'raiz'}"
+        
+        archivo_pilas = f"{base}.collapsed"
+        with open(os.path.join(self.directorio, archivo_pilas), 'w', encoding='utf-8') as archivo:
+            archivo.write(muestreador.colapsado())
+        
+        archivo_perfil = ''
+        if perfil is not None:
+            archivo_perfil = f"{base}.prof"
+            perfil.dump_stats(os.path.join(self.directorio, archivo_perfil))
+        
+        return PerfilPeticion.objects.create(
+            metodo=request.method,
+            ruta=request.get_full_path()[:500],
+            usuario=usuario,
+            modo=modo,
+            status=response.status_code,
+            duracion_ms=round(duracion * 1000, 2),
+            muestras=muestreador.total,
+            archivo_perfil=archivo_perfil,
+            archivo_pilas=archivo_pilas,
+        )
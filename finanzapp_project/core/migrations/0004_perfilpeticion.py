@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_metafinanciera_categoriafinanciera_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerfilPeticion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metodo', models.CharField(max_length=10, verbose_name='Método HTTP')),
+                ('ruta', models.CharField(max_length=500, verbose_name='Ruta')),
+                ('modo', models.CharField(choices=[('CPROFILE', 'cProfile + muestreo'), ('MUESTREO', 'Solo muestreo')], default='CPROFILE', max_length=10, verbose_name='Modo')),
+                ('status', models.PositiveIntegerField(verbose_name='Código de respuesta')),
+                ('duracion_ms', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Duración (ms)')),
+                ('muestras', models.PositiveIntegerField(default=0, verbose_name='Muestras de pila')),
+                ('archivo_perfil', models.CharField(blank=True, max_length=255, verbose_name='Archivo cProfile (.prof)')),
+                ('archivo_pilas', models.CharField(max_length=255, verbose_name='Archivo de pilas colapsadas')),
+                ('fecha', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='perfiles_peticion', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'Perfil de Petición',
+                'verbose_name_plural': 'Perfiles de Peticiones',
+                'ordering': ['-fecha'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_perfilpeticion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True, verbose_name='Fecha')),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Ingresos del día')),
+                ('egresos', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Egresos del día')),
+                ('saldo_acumulado', models.DecimalField(decimal_places=2, default=0, max_digits=17, verbose_name='Saldo acumulado')),
+            ],
+            options={
+                'verbose_name': 'Saldo Diario',
+                'verbose_name_plural': 'Saldos Diarios',
+                'ordering': ['fecha'],
+            },
+        ),
+    ]
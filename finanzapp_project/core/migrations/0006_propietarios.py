@@ -0,0 +1,130 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_saldodiario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='movimientofinanciero',
+            name='core_movimi_fecha_b015fa_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='movimientofinanciero',
+            name='core_movimi_tipo_1ce419_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='movimientofinanciero',
+            name='core_movimi_categor_471ecd_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='categoriafinanciera',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='acreedor',
+            name='propietario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Propietario'),
+        ),
+        migrations.AddField(
+            model_name='categoriafinanciera',
+            name='propietario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Propietario'),
+        ),
+        migrations.AddField(
+            model_name='deuda',
+            name='propietario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Propietario'),
+        ),
+        migrations.AddField(
+            model_name='deudor',
+            name='propietario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Propietario'),
+        ),
+        migrations.AddField(
+            model_name='metafinanciera',
+            name='propietario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Propietario'),
+        ),
+        migrations.AddField(
+            model_name='mideuda',
+            name='propietario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Propietario'),
+        ),
+        migrations.AddField(
+            model_name='movimientofinanciero',
+            name='propietario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Propietario'),
+        ),
+        migrations.AddField(
+            model_name='saldodiario',
+            name='propietario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Propietario'),
+        ),
+        migrations.AlterField(
+            model_name='deudor',
+            name='documento',
+            field=models.CharField(max_length=50, verbose_name='Documento de identidad'),
+        ),
+        migrations.AlterField(
+            model_name='saldodiario',
+            name='fecha',
+            field=models.DateField(verbose_name='Fecha'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='categoriafinanciera',
+            unique_together={('propietario', 'nombre', 'tipo', 'naturaleza')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='saldodiario',
+            unique_together={('propietario', 'fecha')},
+        ),
+        migrations.AddIndex(
+            model_name='acreedor',
+            index=models.Index(fields=['propietario', 'activo', 'nombre'], name='core_acreed_propiet_e38c94_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='categoriafinanciera',
+            index=models.Index(fields=['propietario', 'activo'], name='core_catego_propiet_2b7751_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deuda',
+            index=models.Index(fields=['propietario', 'estado', 'fecha_vencimiento'], name='core_deuda_propiet_bc14a3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deudor',
+            index=models.Index(fields=['propietario', 'activo', 'nombre'], name='core_deudor_propiet_0c1345_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='metafinanciera',
+            index=models.Index(fields=['propietario', 'estado'], name='core_metafi_propiet_b88e10_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mideuda',
+            index=models.Index(fields=['propietario', 'estado', 'fecha_vencimiento'], name='core_mideud_propiet_1a1543_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientofinanciero',
+            index=models.Index(fields=['propietario', 'fecha'], name='core_movimi_propiet_2ba74c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientofinanciero',
+            index=models.Index(fields=['propietario', 'tipo', 'fecha'], name='core_movimi_propiet_16f402_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientofinanciero',
+            index=models.Index(fields=['propietario', 'categoria', 'fecha'], name='core_movimi_propiet_bd3281_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='deudor',
+            constraint=models.UniqueConstraint(fields=('propietario', 'documento'), name='deudor_documento_por_propietario'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_propietarios'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MiPagoArchivo',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('monto_pago', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Monto del pago')),
+                ('monto_capital', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Monto aplicado a capital')),
+                ('monto_interes', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Monto aplicado a intereses')),
+                ('fecha_pago', models.DateField(verbose_name='Fecha del pago')),
+                ('metodo_pago', models.CharField(max_length=50, verbose_name='Método de pago')),
+                ('numero_transaccion', models.CharField(blank=True, max_length=100, verbose_name='Número de transacción')),
+                ('comprobante', models.CharField(blank=True, max_length=100, verbose_name='Número de comprobante')),
+                ('observaciones', models.TextField(blank=True, verbose_name='Observaciones')),
+                ('fecha_registro', models.DateTimeField()),
+                ('fecha_archivo', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de archivo')),
+                ('mi_deuda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mis_pagos_archivados', to='core.mideuda')),
+            ],
+            options={
+                'verbose_name': 'Mi Pago Archivado',
+                'verbose_name_plural': 'Mis Pagos Archivados',
+                'ordering': ['-fecha_pago'],
+                'indexes': [models.Index(fields=['mi_deuda', 'fecha_pago'], name='core_mipago_mi_deud_ffe572_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoFinancieroArchivo',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('INGRESO', 'Ingreso'), ('EGRESO', 'Egreso')], max_length=10, verbose_name='Tipo')),
+                ('descripcion', models.CharField(max_length=200, verbose_name='Descripción')),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=15, verbose_name='Monto')),
+                ('fecha', models.DateField(verbose_name='Fecha del movimiento')),
+                ('es_recurrente', models.BooleanField(default=False, verbose_name='Es recurrente')),
+                ('frecuencia', models.CharField(blank=True, choices=[('UNICO', 'Único'), ('DIARIO', 'Diario'), ('SEMANAL', 'Semanal'), ('QUINCENAL', 'Quincenal'), ('MENSUAL', 'Mensual'), ('BIMESTRAL', 'Bimestral'), ('TRIMESTRAL', 'Trimestral'), ('SEMESTRAL', 'Semestral'), ('ANUAL', 'Anual')], max_length=12, verbose_name='Frecuencia')),
+                ('fecha_fin_recurrencia', models.DateField(blank=True, null=True, verbose_name='Fecha fin recurrencia')),
+                ('metodo_pago', models.CharField(choices=[('EFECTIVO', 'Efectivo'), ('TRANSFERENCIA', 'Transferencia'), ('TARJETA_DEBITO', 'Tarjeta Débito'), ('TARJETA_CREDITO', 'Tarjeta Crédito'), ('CHEQUE', 'Cheque'), ('PSE', 'PSE'), ('OTRO', 'Otro')], default='EFECTIVO', max_length=20, verbose_name='Método de pago')),
+                ('referencia', models.CharField(blank=True, max_length=100, verbose_name='Referencia/Número de transacción')),
+                ('notas', models.TextField(blank=True, verbose_name='Notas adicionales')),
+                ('comprobante', models.CharField(blank=True, max_length=100, verbose_name='Número de comprobante')),
+                ('fecha_creacion', models.DateTimeField()),
+                ('fecha_actualizacion', models.DateTimeField()),
+                ('fecha_archivo', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de archivo')),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_archivados', to='core.categoriafinanciera')),
+                ('propietario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Propietario')),
+                ('subcategoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_archivados', to='core.subcategoriafinanciera')),
+            ],
+            options={
+                'verbose_name': 'Movimiento Financiero Archivado',
+                'verbose_name_plural': 'Movimientos Financieros Archivados',
+                'ordering': ['-fecha', '-fecha_creacion'],
+                'indexes': [models.Index(fields=['propietario', 'fecha'], name='core_movimi_propiet_342087_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PagoDeudaArchivo',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('monto_pago', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Monto del pago')),
+                ('fecha_pago', models.DateField(verbose_name='Fecha del pago')),
+                ('metodo_pago', models.CharField(max_length=50, verbose_name='Método de pago')),
+                ('comprobante', models.CharField(blank=True, max_length=100, verbose_name='Número de comprobante')),
+                ('observaciones', models.TextField(blank=True, verbose_name='Observaciones del pago')),
+                ('fecha_registro', models.DateTimeField()),
+                ('fecha_archivo', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de archivo')),
+                ('deuda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pagos_archivados', to='core.deuda')),
+            ],
+            options={
+                'verbose_name': 'Pago de Deuda Archivado',
+                'verbose_name_plural': 'Pagos de Deudas Archivados',
+                'ordering': ['-fecha_pago'],
+                'indexes': [models.Index(fields=['deuda', 'fecha_pago'], name='core_pagode_deuda_i_fbcb8a_idx')],
+            },
+        ),
+    ]
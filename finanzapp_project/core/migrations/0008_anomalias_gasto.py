@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_historico_archivado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertaGasto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('TRANSACCION', 'Transacción atípica'), ('MENSUAL', 'Total mensual atípico')], max_length=12, verbose_name='Tipo')),
+                ('fecha', models.DateField(verbose_name='Fecha (o primer día del mes)')),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=15, verbose_name='Monto')),
+                ('esperado', models.FloatField(verbose_name='Valor esperado (mediana)')),
+                ('puntaje', models.FloatField(verbose_name='Puntaje z robusto')),
+                ('revisada', models.BooleanField(default=False, verbose_name='Revisada')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas', to='core.categoriafinanciera')),
+                ('movimiento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alertas', to='core.movimientofinanciero')),
+                ('propietario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Propietario')),
+                ('subcategoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='alertas', to='core.subcategoriafinanciera')),
+            ],
+            options={
+                'verbose_name': 'Alerta de Gasto',
+                'verbose_name_plural': 'Alertas de Gasto',
+                'ordering': ['-fecha', '-puntaje'],
+                'indexes': [models.Index(fields=['propietario', 'revisada', 'fecha'], name='core_alerta_propiet_474e1e_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LineaBaseGasto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ambito', models.CharField(choices=[('TRANSACCION', 'Por transacción'), ('MENSUAL', 'Total mensual')], max_length=12, verbose_name='Ámbito')),
+                ('dia_semana', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Día de la semana (0=lunes)')),
+                ('n', models.PositiveIntegerField(default=0, verbose_name='Observaciones')),
+                ('media', models.FloatField(default=0, verbose_name='Media')),
+                ('m2', models.FloatField(default=0, verbose_name='Suma de cuadrados de las desviaciones')),
+                ('mediana', models.FloatField(default=0, verbose_name='Mediana (ventana)')),
+                ('mad', models.FloatField(default=0, verbose_name='Desviación absoluta mediana (ventana)')),
+                ('marca', models.BigIntegerField(default=0, help_text='Último movimiento (TRANSACCION) o mes (año*12+mes-1, MENSUAL) incorporado')),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas_base', to='core.categoriafinanciera')),
+                ('propietario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Propietario')),
+                ('subcategoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lineas_base', to='core.subcategoriafinanciera')),
+            ],
+            options={
+                'verbose_name': 'Línea Base de Gasto',
+                'verbose_name_plural': 'Líneas Base de Gasto',
+                'unique_together': {('propietario', 'categoria', 'subcategoria', 'ambito', 'dia_semana')},
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_anomalias_gasto'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AporteMeta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(verbose_name='Mes (primer día)')),
+                ('monto', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Monto aportado')),
+            ],
+            options={
+                'verbose_name': 'Aporte a Meta',
+                'verbose_name_plural': 'Aportes a Metas',
+                'ordering': ['meta', 'mes'],
+            },
+        ),
+        migrations.AddField(
+            model_name='metafinanciera',
+            name='categoria',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='metas', to='core.categoriafinanciera', verbose_name='Categoría de aportes'),
+        ),
+        migrations.AddField(
+            model_name='metafinanciera',
+            name='subcategoria',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='metas', to='core.subcategoriafinanciera', verbose_name='Subcategoría de aportes'),
+        ),
+        migrations.AddIndex(
+            model_name='metafinanciera',
+            index=models.Index(fields=['propietario', 'categoria'], name='core_metafi_propiet_232f5a_idx'),
+        ),
+        migrations.AddField(
+            model_name='aportemeta',
+            name='meta',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aportes', to='core.metafinanciera'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='aportemeta',
+            unique_together={('meta', 'mes')},
+        ),
+    ]
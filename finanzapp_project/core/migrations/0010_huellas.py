@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:40
+
+from django.db import migrations, models
+
+from core.huellas import huella_mi_pago, huella_movimiento
+
+
+def _rellenar(modelo, campos, calcular):
+    """Calcula la huella de los registros existentes; los duplicados quedan sin huella"""
+    vistas = set()
+    pendientes = []
+    for fila in modelo.objects.order_by('pk').values('pk', *campos).iterator(chunk_size=5000):
+        huella = calcular(*(fila[campo] for campo in campos))
+        if huella in vistas:
+            continue
+        vistas.add(huella)
+        pendientes.append(modelo(pk=fila['pk'], huella=huella))
+        if len(pendientes) >= 5000:
+            modelo.objects.bulk_update(pendientes, ['huella'])
+            pendientes = []
+    modelo.objects.bulk_update(pendientes, ['huella'])
+
+
+def rellenar_huellas(apps, schema_editor):
+    _rellenar(
+        apps.get_model('core', 'MovimientoFinanciero'),
+        ['propietario_id', 'fecha', 'tipo', 'monto', 'referencia', 'comprobante', 'descripcion'],
+        lambda propietario_id, fecha, tipo, monto, referencia, comprobante, descripcion: huella_movimiento(
+            propietario_id, fecha, tipo, monto, referencia or comprobante, descripcion
+        ),
+    )
+    _rellenar(
+        apps.get_model('core', 'MiPago'),
+        ['mi_deuda_id', 'fecha_pago', 'monto_pago', 'numero_transaccion', 'comprobante', 'observaciones'],
+        huella_mi_pago,
+    )
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('core', '0009_metas_vinculadas'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='mipago',
+            name='huella',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='movimientofinanciero',
+            name='huella',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(rellenar_huellas, migrations.RunPython.noop),
+    ]
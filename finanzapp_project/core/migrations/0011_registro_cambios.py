@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_huellas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroCambio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recurso', models.CharField(max_length=30, verbose_name='Recurso de la API')),
+                ('objeto_id', models.BigIntegerField(verbose_name='Id del registro')),
+                ('operacion', models.CharField(choices=[('C', 'Creación'), ('U', 'Actualización'), ('D', 'Eliminación')], max_length=1, verbose_name='Operación')),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('propietario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Propietario')),
+            ],
+            options={
+                'verbose_name': 'Registro de Cambio',
+                'verbose_name_plural': 'Registro de Cambios',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['propietario', 'id'], name='core_regist_propiet_b6cf76_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_trabajos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deuda',
+            name='interes_causado',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Interés causado'),
+        ),
+        migrations.AddField(
+            model_name='mideuda',
+            name='interes_causado',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=15, verbose_name='Interés causado'),
+        ),
+        migrations.AlterField(
+            model_name='deuda',
+            name='tasa_interes',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='Tasa de interés mensual (%)'),
+        ),
+        migrations.CreateModel(
+            name='CausacionInteres',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha de causación')),
+                ('saldo_base', models.DecimalField(decimal_places=2, max_digits=15, verbose_name='Saldo base')),
+                ('tasa_interes', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Tasa de interés (%)')),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Interés del día')),
+                ('deuda', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='causaciones', to='core.deuda')),
+                ('mi_deuda', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='causaciones', to='core.mideuda')),
+                ('propietario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Propietario')),
+            ],
+            options={
+                'verbose_name': 'Causación de Interés',
+                'verbose_name_plural': 'Causaciones de Intereses',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['propietario', 'fecha'], name='core_causac_propiet_dbbdd2_idx')],
+                'constraints': [models.UniqueConstraint(fields=('deuda', 'fecha'), name='causacion_deuda_por_fecha'), models.UniqueConstraint(fields=('mi_deuda', 'fecha'), name='causacion_mi_deuda_por_fecha'), models.CheckConstraint(condition=models.Q(('deuda__isnull', True), ('mi_deuda__isnull', True), _connector='XOR'), name='causacion_de_una_deuda')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_causacion_intereses'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='categoriafinanciera',
+            constraint=models.UniqueConstraint(condition=models.Q(('propietario__isnull', True)), fields=('nombre', 'tipo', 'naturaleza'), name='categoria_nombre_sin_propietario'),
+        ),
+        migrations.AddConstraint(
+            model_name='deudor',
+            constraint=models.UniqueConstraint(condition=models.Q(('propietario__isnull', True)), fields=('documento',), name='deudor_documento_sin_propietario'),
+        ),
+        migrations.AddConstraint(
+            model_name='saldodiario',
+            constraint=models.UniqueConstraint(condition=models.Q(('propietario__isnull', True)), fields=('fecha',), name='saldo_diario_fecha_sin_propietario'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:17
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_unicidad_sin_propietario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='lineabasegasto',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='lineabasegasto',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('propietario', 0), models.F('categoria'), django.db.models.functions.comparison.Coalesce('subcategoria', 0), models.F('ambito'), django.db.models.functions.comparison.Coalesce('dia_semana', -1), name='linea_base_unica'),
+        ),
+    ]
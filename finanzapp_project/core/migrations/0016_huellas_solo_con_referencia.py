@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-19 20:05
+
+from django.db import migrations
+
+
+def quitar_huellas_manuales(apps, schema_editor):
+    """Los registros sin referencia (manuales) dejan de llevar huella"""
+    apps.get_model('core', 'MovimientoFinanciero').objects.filter(
+        referencia='', comprobante=''
+    ).exclude(huella=None).update(huella=None)
+    apps.get_model('core', 'MiPago').objects.filter(
+        numero_transaccion='', comprobante=''
+    ).exclude(huella=None).update(huella=None)
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('core', '0015_linea_base_unica'),
+    ]
+    
+    operations = [
+        migrations.RunPython(quitar_huellas_manuales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:25
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def rellenar_interes_pagado(apps, schema_editor):
+    """interes_pagado de cada MiDeuda: suma de monto_interes de sus pagos activos y archivados"""
+    MiDeuda = apps.get_model('core', 'MiDeuda')
+    total = Value(Decimal('0.00'))
+    for nombre in ('MiPago', 'MiPagoArchivo'):
+        suma = apps.get_model('core', nombre).objects.filter(mi_deuda=OuterRef('pk')).order_by().values(
+            'mi_deuda'
+        ).annotate(total=Sum('monto_interes')).values('total')
+        total = total + Coalesce(Subquery(suma), Value(Decimal('0.00')))
+    MiDeuda.objects.update(interes_pagado=models.ExpressionWrapper(
+        total, output_field=DecimalField(max_digits=15, decimal_places=2)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_huellas_solo_con_referencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deuda',
+            name='interes_pagado',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Interés cobrado'),
+        ),
+        migrations.AddField(
+            model_name='mideuda',
+            name='interes_pagado',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=15, verbose_name='Interés pagado'),
+        ),
+        migrations.RunPython(rellenar_interes_pagado, migrations.RunPython.noop),
+    ]
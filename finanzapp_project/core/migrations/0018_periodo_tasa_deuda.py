@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """El periodo de la tasa de Deuda pasa a ser un campo propio.
+
+    Antes de 0013 la tasa de Deuda no tenía periodo ("Tasa de interés (%)") y
+    no se usaba en ningún cálculo; 0013 la rotuló como mensual y desde entonces
+    la causación diaria la trata así. Las filas existentes quedan en MENSUAL
+    para no cambiar los intereses ya causados. Una tasa registrada antes de
+    0013 pensando en una tasa anual debe corregirse a mano a ANUAL; sus
+    causaciones anteriores no se recalculan.
+    """
+
+    dependencies = [
+        ('core', '0017_intereses_pagados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deuda',
+            name='periodo_tasa',
+            field=models.CharField(choices=[('MENSUAL', 'Mensual'), ('ANUAL', 'Anual')], default='MENSUAL', max_length=10, verbose_name='Periodo de la tasa'),
+        ),
+        migrations.AlterField(
+            model_name='deuda',
+            name='tasa_interes',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='Tasa de interés (%)'),
+        ),
+    ]
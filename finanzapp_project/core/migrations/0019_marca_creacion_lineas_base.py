@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:50
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+
+def marca_por_creacion(apps, schema_editor):
+    """Traduce la marca por id de las líneas TRANSACCION a una marca de creación.
+
+    Lo pendiente de cada hogar empieza en el primer egreso con id mayor a la
+    marca; si no hay, justo después del último incorporado. Un egreso
+    incorporado creado después de uno pendiente se volvería a contar: con las
+    ejecuciones periódicas del detector el caso no se da en la práctica.
+    """
+    LineaBaseGasto = apps.get_model('core', 'LineaBaseGasto')
+    MovimientoFinanciero = apps.get_model('core', 'MovimientoFinanciero')
+    transacciones = LineaBaseGasto.objects.filter(ambito='TRANSACCION')
+    for propietario_id, marca in transacciones.order_by().values('propietario_id').annotate(
+        marca=Max('marca')
+    ).values_list('propietario_id', 'marca'):
+        egresos = MovimientoFinanciero.objects.filter(propietario_id=propietario_id, tipo='EGRESO')
+        inicio = egresos.filter(pk__gt=marca).aggregate(inicio=Min('fecha_creacion'))['inicio']
+        if inicio is None:
+            ultimo = egresos.filter(pk__lte=marca).aggregate(ultimo=Max('fecha_creacion'))['ultimo']
+            inicio = ultimo + timedelta(microseconds=1) if ultimo else None
+        transacciones.filter(propietario_id=propietario_id).update(marca_creacion=inicio, marca=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_periodo_tasa_deuda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lineabasegasto',
+            name='marca_creacion',
+            field=models.DateTimeField(blank=True, help_text='Incorporados los movimientos creados antes de este instante (TRANSACCION)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='lineabasegasto',
+            name='marca',
+            field=models.BigIntegerField(default=0, help_text='Último mes (año*12+mes-1) incorporado (MENSUAL)'),
+        ),
+        migrations.RunPython(marca_por_creacion, migrations.RunPython.noop),
+    ]
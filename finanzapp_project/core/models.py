@@ -1,10 +1,74 @@
-from django.db import models
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 from decimal import Decimal
 
-class Deudor(models.Model):
+from .huellas import huella_mi_pago, huella_movimiento
+
+# ===== PROPIEDAD DE LOS DATOS (HOGARES) =====
+
+class PropietarioQuerySet(models.QuerySet):
+    """QuerySet con el filtro por hogar usado en API y dashboards"""
+    campo_propietario = 'propietario'
+    
+    def de(self, usuario):
+        """Registros del usuario; los anónimos ven los registros sin propietario"""
+        if usuario is not None and usuario.is_authenticated:
+            return self.filter(**{self.campo_propietario: usuario})
+        return self.filter(**{f'{self.campo_propietario}__isnull': True})
+
+def bloquear_hogar(clave, propietario_id):
+    """Bloqueo de un hogar hasta el final de la transacción, separado por ``clave``.
+
+    En PostgreSQL es un bloqueo consultivo (también para el hogar sin
+    propietario); en otras bases, SELECT ... FOR UPDATE sobre el usuario.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s::integer, %s::integer)", [clave, propietario_id or 0])
+    elif propietario_id is not None:
+        list(get_user_model().objects.select_for_update().filter(pk=propietario_id).values_list('pk', flat=True))
+
+class ConPropietario(models.Model):
+    """Base de los modelos que pertenecen a un hogar (usuario propietario)"""
+    propietario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+                                    related_name='+', verbose_name="Propietario")
+    
+    objects = PropietarioQuerySet.as_manager()
+    
+    class Meta:
+        abstract = True
+
+# Estados de Deuda y MiDeuda con saldo todavía por pagar
+ESTADOS_ABIERTOS = ['PENDIENTE', 'VENCIDA', 'PARCIAL']
+
+def total_pendiente(saldo):
+    """Expresión de consulta: saldo de capital (``saldo``) más el interés causado aún sin pagar"""
+    return models.ExpressionWrapper(
+        models.F(saldo) + Greatest(
+            models.F('interes_causado') - models.F('interes_pagado'), models.Value(Decimal('0.00'))
+        ),
+        output_field=models.DecimalField(max_digits=15, decimal_places=2),
+    )
+
+class ConIntereses:
+    """Interés pendiente de Deuda y MiDeuda: lo causado menos lo pagado (el saldo es solo capital)"""
+    
+    @property
+    def interes_pendiente(self):
+        return max(self.interes_causado - self.interes_pagado, Decimal('0.00'))
+    
+    def _no_pagada_con_intereses(self):
+        # Sin capital pendiente sigue abierta mientras deba intereses causados
+        if self.estado == 'PAGADA' and self.interes_pendiente > 0:
+            self.estado = 'PARCIAL'
+
+class Deudor(ConPropietario):
     nombre = models.CharField(max_length=200, verbose_name="Nombre completo")
-    documento = models.CharField(max_length=50, unique=True, verbose_name="Documento de identidad")
+    documento = models.CharField(max_length=50, verbose_name="Documento de identidad")
     telefono = models.CharField(max_length=20, blank=True, verbose_name="Teléfono")
     email = models.EmailField(blank=True, verbose_name="Correo electrónico")
     direccion = models.TextField(blank=True, verbose_name="Dirección")
@@ -15,6 +79,15 @@ class Deudor(models.Model):
         verbose_name = "Deudor"
         verbose_name_plural = "Deudores"
         ordering = ['nombre']
+        constraints = [
+            models.UniqueConstraint(fields=['propietario', 'documento'], name='deudor_documento_por_propietario'),
+            # NULL es distinto de NULL en un índice único: el hogar sin propietario necesita su propia restricción
+            models.UniqueConstraint(fields=['documento'], condition=models.Q(propietario__isnull=True),
+                                    name='deudor_documento_sin_propietario'),
+        ]
+        indexes = [
+            models.Index(fields=['propietario', 'activo', 'nombre']),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - {self.documento}"
@@ -22,7 +95,7 @@ class Deudor(models.Model):
     @property
     def total_deuda(self):
         return self.deudas.filter(estado='PENDIENTE').aggregate(
-            total=models.Sum('monto_pendiente')
+            total=models.Sum(total_pendiente('monto_pendiente'))
         )['total'] or Decimal('0.00')
     
     @property
@@ -32,7 +105,7 @@ class Deudor(models.Model):
             fecha_vencimiento__lt=timezone.now().date()
         )
 
-class Deuda(models.Model):
+class Deuda(ConIntereses, ConPropietario):
     ESTADO_CHOICES = [
         ('PENDIENTE', 'Pendiente'),
         ('PAGADA', 'Pagada'),
@@ -45,6 +118,11 @@ class Deuda(models.Model):
         ('DIFERIDA', 'Pago Diferido'),
     ]
     
+    PERIODO_TASA_CHOICES = [
+        ('MENSUAL', 'Mensual'),
+        ('ANUAL', 'Anual'),
+    ]
+    
     deudor = models.ForeignKey(Deudor, on_delete=models.CASCADE, related_name='deudas')
     concepto = models.CharField(max_length=300, verbose_name="Concepto de la deuda")
     monto_original = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Monto original")
@@ -54,6 +132,12 @@ class Deuda(models.Model):
     tipo_pago = models.CharField(max_length=10, choices=TIPO_CHOICES, default='UNICA', verbose_name="Tipo de pago")
     meses_diferido = models.PositiveIntegerField(null=True, blank=True, verbose_name="Meses diferidos")
     tasa_interes = models.DecimalField(max_digits=5, decimal_places=2, default=0, verbose_name="Tasa de interés (%)")
+    periodo_tasa = models.CharField(max_length=10, choices=PERIODO_TASA_CHOICES, default='MENSUAL',
+                                    verbose_name="Periodo de la tasa")
+    # Suma de las causaciones diarias (ver intereses.py)
+    interes_causado = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False,
+                                          verbose_name="Interés causado")
+    interes_pagado = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Interés cobrado")
     estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='PENDIENTE')
     observaciones = models.TextField(blank=True, verbose_name="Observaciones")
     fecha_creacion = models.DateTimeField(auto_now_add=True)
@@ -63,18 +147,34 @@ class Deuda(models.Model):
         verbose_name = "Deuda"
         verbose_name_plural = "Deudas"
         ordering = ['-fecha_prestamo']
+        indexes = [
+            models.Index(fields=['propietario', 'estado', 'fecha_vencimiento']),
+        ]
     
     def __str__(self):
         return f"{self.deudor.nombre} - ${self.monto_pendiente:,.2f}"
     
     def save(self, *args, **kwargs):
+        self.preparar_guardado()
+        super().save(*args, **kwargs)
+    
+    def preparar_guardado(self):
+        """Reglas aplicadas antes de escribir (también en las operaciones masivas de la API)"""
         if not self.pk:
             self.monto_pendiente = self.monto_original
         
+        # La deuda pertenece al mismo hogar que el deudor
+        if self.propietario_id is None and self.deudor_id:
+            self.propietario_id = self.deudor.propietario_id
+        
         if self.fecha_vencimiento < timezone.now().date() and self.estado == 'PENDIENTE':
             self.estado = 'VENCIDA'
         
-        super().save(*args, **kwargs)
+        self._no_pagada_con_intereses()
+    
+    @property
+    def total_pendiente(self):
+        return self.monto_pendiente + self.interes_pendiente
     
     @property
     def dias_vencimiento(self):
@@ -123,7 +223,7 @@ class CuotaDiferida(models.Model):
 
 # ===== MODELOS PARA MIS PROPIAS DEUDAS =====
 
-class Acreedor(models.Model):
+class Acreedor(ConPropietario):
     """Entidades a las que les debo dinero (bancos, personas, empresas)"""
     TIPO_CHOICES = [
         ('BANCO', 'Banco'),
@@ -148,18 +248,21 @@ class Acreedor(models.Model):
         verbose_name = "Acreedor"
         verbose_name_plural = "Acreedores"
         ordering = ['nombre']
+        indexes = [
+            models.Index(fields=['propietario', 'activo', 'nombre']),
+        ]
     
     def __str__(self):
         return f"{self.nombre} ({self.get_tipo_display()})"
     
     @property
     def total_deuda_pendiente(self):
-        """Calcula el total que le debo a este acreedor"""
+        """Calcula el total que le debo a este acreedor (capital e intereses causados)"""
         return self.mis_deudas.filter(estado__in=['PENDIENTE', 'VENCIDA', 'PARCIAL']).aggregate(
-            total=models.Sum('saldo_pendiente')
+            total=models.Sum(total_pendiente('saldo_pendiente'))
         )['total'] or Decimal('0.00')
 
-class MiDeuda(models.Model):
+class MiDeuda(ConIntereses, ConPropietario):
     """Deudas que yo tengo con terceros"""
     ESTADO_CHOICES = [
         ('PENDIENTE', 'Pendiente'),
@@ -196,6 +299,12 @@ class MiDeuda(models.Model):
     monto_original = models.DecimalField(max_digits=15, decimal_places=2, verbose_name="Monto original")
     saldo_pendiente = models.DecimalField(max_digits=15, decimal_places=2, verbose_name="Saldo pendiente")
     tasa_interes = models.DecimalField(max_digits=5, decimal_places=2, default=0, verbose_name="Tasa de interés anual (%)")
+    # Suma de las causaciones diarias (ver intereses.py)
+    interes_causado = models.DecimalField(max_digits=15, decimal_places=2, default=0, editable=False,
+                                          verbose_name="Interés causado")
+    # Suma de monto_interes de los pagos (ver MiPago.actualizar_saldo_deuda)
+    interes_pagado = models.DecimalField(max_digits=15, decimal_places=2, default=0, editable=False,
+                                         verbose_name="Interés pagado")
     fecha_contrato = models.DateField(verbose_name="Fecha del contrato")
     fecha_vencimiento = models.DateField(verbose_name="Fecha de vencimiento")
     cuota_mensual = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name="Cuota mensual")
@@ -210,20 +319,36 @@ class MiDeuda(models.Model):
         verbose_name = "Mi Deuda"
         verbose_name_plural = "Mis Deudas"
         ordering = ['-fecha_contrato']
+        indexes = [
+            models.Index(fields=['propietario', 'estado', 'fecha_vencimiento']),
+        ]
     
     def __str__(self):
         return f"{self.acreedor.nombre} - {self.concepto} - ${self.saldo_pendiente:,.2f}"
     
     def save(self, *args, **kwargs):
+        self.preparar_guardado()
+        super().save(*args, **kwargs)
+    
+    def preparar_guardado(self):
+        """Reglas aplicadas antes de escribir (también en las operaciones masivas de la API)"""
         # Si es nueva deuda, el saldo pendiente es igual al monto original
         if not self.pk:
             self.saldo_pendiente = self.monto_original
         
+        # La deuda pertenece al mismo hogar que el acreedor
+        if self.propietario_id is None and self.acreedor_id:
+            self.propietario_id = self.acreedor.propietario_id
+        
         # Actualizar estado según fecha de vencimiento
         if self.fecha_vencimiento < timezone.now().date() and self.estado == 'PENDIENTE':
             self.estado = 'VENCIDA'
         
-        super().save(*args, **kwargs)
+        self._no_pagada_con_intereses()
+    
+    @property
+    def total_pendiente(self):
+        return self.saldo_pendiente + self.interes_pendiente
     
     @property
     def dias_hasta_vencimiento(self):
@@ -266,6 +391,8 @@ class MiPago(models.Model):
     numero_transaccion = models.CharField(max_length=100, blank=True, verbose_name="Número de transacción")
     comprobante = models.CharField(max_length=100, blank=True, verbose_name="Número de comprobante")
     observaciones = models.TextField(blank=True, verbose_name="Observaciones")
+    # Identifica el mismo pago registrado dos veces (ver huellas.py)
+    huella = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
     fecha_registro = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -277,21 +404,34 @@ class MiPago(models.Model):
         return f"Pago ${self.monto_pago:,.2f} - {self.mi_deuda.acreedor.nombre} - {self.fecha_pago}"
     
     def save(self, *args, **kwargs):
+        self.preparar_guardado()
+        super().save(*args, **kwargs)
+        # Actualizar el saldo de la deuda
+        self.actualizar_saldo_deuda()
+    
+    def preparar_guardado(self):
         # Si no se especifica distribución capital/interés, todo va a capital
         if self.monto_capital == 0 and self.monto_interes == 0:
             self.monto_capital = self.monto_pago
         
-        super().save(*args, **kwargs)
-        # Actualizar el saldo de la deuda
-        self.actualizar_saldo_deuda()
+        self.huella = huella_mi_pago(
+            self.mi_deuda_id, self.fecha_pago, self.monto_pago,
+            self.numero_transaccion, self.comprobante, self.observaciones
+        )
     
     def actualizar_saldo_deuda(self):
-        """Actualiza el saldo pendiente de la deuda"""
-        total_pagos_capital = self.mi_deuda.mis_pagos.aggregate(
-            total=models.Sum('monto_capital')
-        )['total'] or Decimal('0.00')
+        """Actualiza el saldo pendiente y el interés pagado de la deuda (incluye los pagos ya archivados)"""
+        total_pagos_capital = Decimal('0.00')
+        total_pagos_interes = Decimal('0.00')
+        for pagos in (self.mi_deuda.mis_pagos, self.mi_deuda.mis_pagos_archivados):
+            totales = pagos.aggregate(capital=models.Sum('monto_capital'), interes=models.Sum('monto_interes'))
+            total_pagos_capital += totales['capital'] or Decimal('0.00')
+            total_pagos_interes += totales['interes'] or Decimal('0.00')
         
         self.mi_deuda.saldo_pendiente = self.mi_deuda.monto_original - total_pagos_capital
+        self.mi_deuda.interes_pagado = total_pagos_interes
+        # La causación diaria lo suma con UPDATE: se lee el valor actual, no el de la instancia
+        self.mi_deuda.refresh_from_db(fields=['interes_causado'])
         
         if self.mi_deuda.saldo_pendiente <= 0:
             self.mi_deuda.estado = 'PAGADA'
@@ -299,7 +439,7 @@ class MiPago(models.Model):
         elif self.mi_deuda.saldo_pendiente < self.mi_deuda.monto_original:
             self.mi_deuda.estado = 'PARCIAL'
         
-        self.mi_deuda.save()
+        self.mi_deuda.save(update_fields=['saldo_pendiente', 'interes_pagado', 'estado', 'fecha_actualizacion'])
 
 class RecordatorioDeuda(models.Model):
     """Recordatorios para pagos de deudas"""
@@ -321,7 +461,7 @@ class RecordatorioDeuda(models.Model):
 
 # ===== SISTEMA DE INGRESOS Y EGRESOS =====
 
-class CategoriaFinanciera(models.Model):
+class CategoriaFinanciera(ConPropietario):
     """Categorías principales para ingresos y egresos"""
     TIPO_CHOICES = [
         ('INGRESO', 'Ingreso'),
@@ -344,11 +484,21 @@ class CategoriaFinanciera(models.Model):
         verbose_name = "Categoría Financiera"
         verbose_name_plural = "Categorías Financieras"
         ordering = ['tipo', 'naturaleza', 'nombre']
-        unique_together = ['nombre', 'tipo', 'naturaleza']
+        unique_together = ['propietario', 'nombre', 'tipo', 'naturaleza']
+        constraints = [
+            models.UniqueConstraint(fields=['nombre', 'tipo', 'naturaleza'], condition=models.Q(propietario__isnull=True),
+                                    name='categoria_nombre_sin_propietario'),
+        ]
+        indexes = [
+            models.Index(fields=['propietario', 'activo']),
+        ]
     
     def __str__(self):
         return f"{self.get_tipo_display()} {self.get_naturaleza_display()} - {self.nombre}"
 
+class SubcategoriaQuerySet(PropietarioQuerySet):
+    campo_propietario = 'categoria__propietario'
+
 class SubcategoriaFinanciera(models.Model):
     """Subcategorías para clasificación detallada"""
     categoria = models.ForeignKey(CategoriaFinanciera, on_delete=models.CASCADE, related_name='subcategorias')
@@ -357,6 +507,8 @@ class SubcategoriaFinanciera(models.Model):
     activo = models.BooleanField(default=True, verbose_name="Activo")
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     
+    objects = SubcategoriaQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Subcategoría Financiera"
         verbose_name_plural = "Subcategorías Financieras"
@@ -366,7 +518,7 @@ class SubcategoriaFinanciera(models.Model):
     def __str__(self):
         return f"{self.categoria.nombre} - {self.nombre}"
 
-class MovimientoFinanciero(models.Model):
+class MovimientoFinanciero(ConPropietario):
     """Registro de todos los movimientos financieros"""
     TIPO_CHOICES = [
         ('INGRESO', 'Ingreso'),
@@ -419,6 +571,8 @@ class MovimientoFinanciero(models.Model):
     # Información adicional
     notas = models.TextField(blank=True, verbose_name="Notas adicionales")
     comprobante = models.CharField(max_length=100, blank=True, verbose_name="Número de comprobante")
+    # Identifica el mismo movimiento registrado dos veces (ver huellas.py)
+    huella = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
     
     # Campos de auditoría
     fecha_creacion = models.DateTimeField(auto_now_add=True)
@@ -429,9 +583,9 @@ class MovimientoFinanciero(models.Model):
         verbose_name_plural = "Movimientos Financieros"
         ordering = ['-fecha', '-fecha_creacion']
         indexes = [
-            models.Index(fields=['fecha']),
-            models.Index(fields=['tipo']),
-            models.Index(fields=['categoria']),
+            models.Index(fields=['propietario', 'fecha']),
+            models.Index(fields=['propietario', 'tipo', 'fecha']),
+            models.Index(fields=['propietario', 'categoria', 'fecha']),
         ]
     
     def __str__(self):
@@ -439,15 +593,42 @@ class MovimientoFinanciero(models.Model):
         return f"{signo}${self.monto:,.2f} - {self.descripcion} ({self.fecha})"
     
     def save(self, *args, **kwargs):
+        self.preparar_guardado()
+        # Los receptores de post_save (saldos diarios, metas) escriben en la misma transacción
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def preparar_guardado(self):
+        """Validaciones aplicadas antes de escribir (también en las operaciones masivas de la API)"""
+        # Se consulta el árbol de categorías en memoria, no las relaciones
+        from . import catalogo
+        categoria = catalogo.categoria(self.categoria_id, self.propietario_id)
+        if categoria is None and self.propietario_id is None:
+            # Sin hogar asignado (p. ej. desde el admin): se busca en el de la categoría
+            categoria = catalogo.categoria(self.categoria_id, CategoriaFinanciera.objects.filter(
+                pk=self.categoria_id
+            ).values_list('propietario_id', flat=True).first())
+        if categoria is None:
+            raise ValueError("La categoría seleccionada no existe")
+        
         # Validar que la subcategoría pertenezca a la categoría seleccionada
-        if self.subcategoria and self.subcategoria.categoria != self.categoria:
-            raise ValueError("La subcategoría debe pertenecer a la categoría seleccionada")
+        if self.subcategoria_id:
+            subcategoria = catalogo.subcategoria(self.subcategoria_id, categoria.propietario_id)
+            if subcategoria is None or subcategoria.categoria_id != self.categoria_id:
+                raise ValueError("La subcategoría debe pertenecer a la categoría seleccionada")
         
         # Validar que tipo coincida con el tipo de categoría
-        if self.categoria.tipo != self.tipo:
+        if categoria.tipo != self.tipo:
             raise ValueError("El tipo del movimiento debe coincidir con el tipo de categoría")
         
-        super().save(*args, **kwargs)
+        # El movimiento pertenece al mismo hogar que su categoría
+        if self.propietario_id is None:
+            self.propietario_id = categoria.propietario_id
+        
+        self.huella = huella_movimiento(
+            self.propietario_id, self.fecha, self.tipo, self.monto,
+            self.referencia or self.comprobante, self.descripcion
+        )
     
     @property
     def es_ingreso(self):
@@ -457,6 +638,37 @@ class MovimientoFinanciero(models.Model):
     def es_egreso(self):
         return self.tipo == 'EGRESO'
 
+class SaldoDiario(ConPropietario):
+    """Ingresos, egresos y saldo acumulado por día.
+
+    Se mantiene de forma incremental al crear, editar o eliminar movimientos
+    (ver core.saldos) y se puede regenerar con ``manage.py reconstruir_saldos``.
+    """
+    fecha = models.DateField(verbose_name="Fecha")
+    ingresos = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name="Ingresos del día")
+    egresos = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name="Egresos del día")
+    saldo_acumulado = models.DecimalField(max_digits=17, decimal_places=2, default=0, verbose_name="Saldo acumulado")
+    
+    class Meta:
+        verbose_name = "Saldo Diario"
+        verbose_name_plural = "Saldos Diarios"
+        ordering = ['fecha']
+        unique_together = ['propietario', 'fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['fecha'], condition=models.Q(propietario__isnull=True),
+                                    name='saldo_diario_fecha_sin_propietario'),
+        ]
+    
+    def __str__(self):
+        return f"{self.fecha}: ${self.saldo_acumulado:,.2f}"
+    
+    @classmethod
+    def saldo_al(cls, fecha, propietario_id=None):
+        """Saldo acumulado del hogar al cierre de la fecha dada"""
+        return cls.objects.filter(propietario_id=propietario_id, fecha__lte=fecha).order_by('-fecha').values_list(
+            'saldo_acumulado', flat=True
+        ).first() or Decimal('0.00')
+
 class PresupuestoCategoria(models.Model):
     """Presupuesto mensual por categoría"""
     categoria = models.ForeignKey(CategoriaFinanciera, on_delete=models.CASCADE, related_name='presupuestos')
@@ -502,7 +714,7 @@ class PresupuestoCategoria(models.Model):
         else:
             return self.monto_ejecutado - self.monto_presupuestado
 
-class MetaFinanciera(models.Model):
+class MetaFinanciera(ConPropietario):
     """Metas financieras a largo plazo"""
     TIPO_CHOICES = [
         ('AHORRO', 'Ahorro'),
@@ -528,6 +740,12 @@ class MetaFinanciera(models.Model):
     fecha_inicio = models.DateField(verbose_name="Fecha de inicio")
     fecha_objetivo = models.DateField(verbose_name="Fecha objetivo")
     estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default='ACTIVA', verbose_name="Estado")
+    # Si se vincula, los movimientos de la categoría (o subcategoría) desde la
+    # fecha de inicio son los aportes y mantienen monto_actual al día
+    categoria = models.ForeignKey(CategoriaFinanciera, on_delete=models.SET_NULL, related_name='metas',
+                                  null=True, blank=True, verbose_name="Categoría de aportes")
+    subcategoria = models.ForeignKey(SubcategoriaFinanciera, on_delete=models.SET_NULL, related_name='metas',
+                                     null=True, blank=True, verbose_name="Subcategoría de aportes")
     notas = models.TextField(blank=True, verbose_name="Notas")
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
@@ -536,6 +754,10 @@ class MetaFinanciera(models.Model):
         verbose_name = "Meta Financiera"
         verbose_name_plural = "Metas Financieras"
         ordering = ['-fecha_objetivo']
+        indexes = [
+            models.Index(fields=['propietario', 'estado']),
+            models.Index(fields=['propietario', 'categoria']),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - ${self.monto_objetivo:,.2f} ({self.get_estado_display()})"
@@ -557,3 +779,338 @@ class MetaFinanciera(models.Model):
         """Días restantes para alcanzar la meta"""
         delta = self.fecha_objetivo - timezone.now().date()
         return max(delta.days, 0)
+    
+    def save(self, *args, **kwargs):
+        # Con vínculo, monto_actual lo mantienen los aportes con expresiones F(): un
+        # guardado completo de una instancia leída antes no debe sobrescribirlo
+        if self.pk and self.vinculada and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name != 'monto_actual'
+            ]
+        super().save(*args, **kwargs)
+    
+    @property
+    def vinculada(self):
+        return self.categoria_id is not None
+
+class AporteMeta(models.Model):
+    """Aportes mensuales a una meta vinculada, mantenidos por las señales de movimientos"""
+    meta = models.ForeignKey(MetaFinanciera, on_delete=models.CASCADE, related_name='aportes')
+    mes = models.DateField(verbose_name="Mes (primer día)")
+    monto = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name="Monto aportado")
+    
+    class Meta:
+        verbose_name = "Aporte a Meta"
+        verbose_name_plural = "Aportes a Metas"
+        unique_together = ['meta', 'mes']
+        ordering = ['meta', 'mes']
+    
+    def __str__(self):
+        return f"{self.meta.nombre} - {self.mes:%Y-%m}: ${self.monto:,.2f}"
+
+# ===== DETECCIÓN DE ANOMALÍAS EN GASTOS =====
+
+class LineaBaseGasto(ConPropietario):
+    """Estadísticas de referencia de los egresos de una categoría (o subcategoría).
+
+    Ámbito TRANSACCION: montos de cada movimiento, separados por día de la semana.
+    Ámbito MENSUAL: totales de los meses cerrados. Media y M2 (suma de cuadrados
+    de las desviaciones) se acumulan de forma incremental; mediana y MAD se
+    calculan sobre la ventana móvil reciente.
+    """
+    AMBITO_CHOICES = [
+        ('TRANSACCION', 'Por transacción'),
+        ('MENSUAL', 'Total mensual'),
+    ]
+    
+    categoria = models.ForeignKey(CategoriaFinanciera, on_delete=models.CASCADE, related_name='lineas_base')
+    subcategoria = models.ForeignKey(SubcategoriaFinanciera, on_delete=models.CASCADE, related_name='lineas_base',
+                                     null=True, blank=True)
+    ambito = models.CharField(max_length=12, choices=AMBITO_CHOICES, verbose_name="Ámbito")
+    dia_semana = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Día de la semana (0=lunes)")
+    n = models.PositiveIntegerField(default=0, verbose_name="Observaciones")
+    media = models.FloatField(default=0, verbose_name="Media")
+    m2 = models.FloatField(default=0, verbose_name="Suma de cuadrados de las desviaciones")
+    mediana = models.FloatField(default=0, verbose_name="Mediana (ventana)")
+    mad = models.FloatField(default=0, verbose_name="Desviación absoluta mediana (ventana)")
+    marca = models.BigIntegerField(default=0, help_text="Último mes (año*12+mes-1) incorporado (MENSUAL)")
+    marca_creacion = models.DateTimeField(null=True, blank=True,
+                                          help_text="Incorporados los movimientos creados antes de este instante (TRANSACCION)")
+    actualizado = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Línea Base de Gasto"
+        verbose_name_plural = "Líneas Base de Gasto"
+        constraints = [
+            # propietario, subcategoria y dia_semana admiten NULL, que nunca choca en un índice único
+            models.UniqueConstraint(
+                Coalesce('propietario', 0), 'categoria', Coalesce('subcategoria', 0), 'ambito', Coalesce('dia_semana', -1),
+                name='linea_base_unica'
+            ),
+        ]
+    
+    def __str__(self):
+        nombre = self.subcategoria or self.categoria
+        return f"{nombre} - {self.get_ambito_display()}: media ${self.media:,.2f} (n={self.n})"
+    
+    @property
+    def desviacion(self):
+        """Desviación estándar muestral"""
+        return (self.m2 / (self.n - 1)) ** 0.5 if self.n > 1 else 0.0
+
+class AlertaGasto(ConPropietario):
+    """Movimiento o total mensual que se sale de la línea base"""
+    TIPO_CHOICES = [
+        ('TRANSACCION', 'Transacción atípica'),
+        ('MENSUAL', 'Total mensual atípico'),
+    ]
+    
+    tipo = models.CharField(max_length=12, choices=TIPO_CHOICES, verbose_name="Tipo")
+    movimiento = models.ForeignKey(MovimientoFinanciero, on_delete=models.SET_NULL, related_name='alertas',
+                                   null=True, blank=True)
+    categoria = models.ForeignKey(CategoriaFinanciera, on_delete=models.CASCADE, related_name='alertas')
+    subcategoria = models.ForeignKey(SubcategoriaFinanciera, on_delete=models.CASCADE, related_name='alertas',
+                                     null=True, blank=True)
+    fecha = models.DateField(verbose_name="Fecha (o primer día del mes)")
+    monto = models.DecimalField(max_digits=15, decimal_places=2, verbose_name="Monto")
+    esperado = models.FloatField(verbose_name="Valor esperado (mediana)")
+    puntaje = models.FloatField(verbose_name="Puntaje z robusto")
+    revisada = models.BooleanField(default=False, verbose_name="Revisada")
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Alerta de Gasto"
+        verbose_name_plural = "Alertas de Gasto"
+        ordering = ['-fecha', '-puntaje']
+        indexes = [
+            models.Index(fields=['propietario', 'revisada', 'fecha']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} - ${self.monto:,.2f} ({self.fecha}, z={self.puntaje:.1f})"
+
+# ===== CAUSACIÓN DE INTERESES =====
+
+class CausacionInteres(ConPropietario):
+    """Interés de un día sobre el saldo de una deuda por cobrar (deuda) o propia (mi_deuda)"""
+    deuda = models.ForeignKey(Deuda, on_delete=models.CASCADE, null=True, blank=True, related_name='causaciones')
+    mi_deuda = models.ForeignKey(MiDeuda, on_delete=models.CASCADE, null=True, blank=True, related_name='causaciones')
+    fecha = models.DateField(verbose_name="Fecha de causación")
+    saldo_base = models.DecimalField(max_digits=15, decimal_places=2, verbose_name="Saldo base")
+    tasa_interes = models.DecimalField(max_digits=5, decimal_places=2, verbose_name="Tasa de interés (%)")
+    monto = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Interés del día")
+    
+    class Meta:
+        verbose_name = "Causación de Interés"
+        verbose_name_plural = "Causaciones de Intereses"
+        ordering = ['-fecha']
+        constraints = [
+            # Una causación por deuda y día: volver a causar una fecha no duplica intereses
+            models.UniqueConstraint(fields=['deuda', 'fecha'], name='causacion_deuda_por_fecha'),
+            models.UniqueConstraint(fields=['mi_deuda', 'fecha'], name='causacion_mi_deuda_por_fecha'),
+            models.CheckConstraint(
+                condition=models.Q(deuda__isnull=True) ^ models.Q(mi_deuda__isnull=True),
+                name='causacion_de_una_deuda',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['propietario', 'fecha']),
+        ]
+    
+    def __str__(self):
+        return f"{self.fecha}: ${self.monto:,.2f}"
+
+# ===== REGISTRO DE CAMBIOS (SINCRONIZACIÓN) =====
+
+class RegistroCambio(ConPropietario):
+    """Bitácora de escrituras sobre los recursos de la API, solo de agregado.
+
+    El id es la secuencia que los clientes usan como cursor de sincronización.
+    """
+    OPERACION_CHOICES = [
+        ('C', 'Creación'),
+        ('U', 'Actualización'),
+        ('D', 'Eliminación'),
+    ]
+    
+    recurso = models.CharField(max_length=30, verbose_name="Recurso de la API")
+    objeto_id = models.BigIntegerField(verbose_name="Id del registro")
+    operacion = models.CharField(max_length=1, choices=OPERACION_CHOICES, verbose_name="Operación")
+    fecha = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Registro de Cambio"
+        verbose_name_plural = "Registro de Cambios"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['propietario', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"#{self.pk} {self.get_operacion_display()} {self.recurso}/{self.objeto_id}"
+
+# ===== TRABAJOS EN SEGUNDO PLANO =====
+
+class Trabajo(ConPropietario):
+    """Tarea pesada encolada para el comando procesar_trabajos (ver core.trabajos)"""
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_CURSO', 'En curso'),
+        ('COMPLETADO', 'Completado'),
+        ('FALLIDO', 'Fallido'),
+    ]
+    
+    tarea = models.CharField(max_length=100, verbose_name="Tarea")
+    parametros = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder, verbose_name="Parámetros")
+    estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default='PENDIENTE', verbose_name="Estado")
+    progreso = models.FloatField(default=0, verbose_name="Progreso (0 a 1)")
+    mensaje = models.CharField(max_length=255, blank=True, verbose_name="Mensaje de avance")
+    resultado = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Resultado")
+    archivo = models.CharField(max_length=255, blank=True, verbose_name="Archivo de resultado")
+    error = models.TextField(blank=True, verbose_name="Último error")
+    intentos = models.PositiveIntegerField(default=0, verbose_name="Intentos")
+    max_intentos = models.PositiveIntegerField(default=3, verbose_name="Máximo de intentos")
+    disponible_desde = models.DateTimeField(default=timezone.now, verbose_name="Disponible desde")
+    trabajador = models.CharField(max_length=100, blank=True, verbose_name="Trabajador")
+    latido = models.DateTimeField(null=True, blank=True, verbose_name="Último latido del trabajador")
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Trabajo"
+        verbose_name_plural = "Trabajos"
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'disponible_desde']),
+        ]
+    
+    def __str__(self):
+        return f"{self.tarea} #{self.pk} ({self.get_estado_display()})"
+    
+    def informar(self, progreso, mensaje=''):
+        """Registra el avance (0 a 1) desde la tarea en ejecución"""
+        self.progreso = max(0.0, min(1.0, float(progreso)))
+        self.mensaje = mensaje[:255]
+        # Solo mientras siga siendo de este trabajador e intento (ver trabajos.ejecutar)
+        Trabajo.objects.filter(
+            pk=self.pk, estado='EN_CURSO', trabajador=self.trabajador, intentos=self.intentos
+        ).update(progreso=self.progreso, mensaje=self.mensaje, latido=timezone.now())
+
+# ===== HISTÓRICO ARCHIVADO =====
+# Copias de los registros antiguos que el comando archivar_historico saca de
+# las tablas activas. Conservan la clave primaria original.
+
+class MovimientoFinancieroArchivo(ConPropietario):
+    """Movimientos financieros anteriores al horizonte de archivo"""
+    id = models.BigIntegerField(primary_key=True)
+    tipo = models.CharField(max_length=10, choices=MovimientoFinanciero.TIPO_CHOICES, verbose_name="Tipo")
+    categoria = models.ForeignKey(CategoriaFinanciera, on_delete=models.PROTECT, related_name='movimientos_archivados')
+    subcategoria = models.ForeignKey(SubcategoriaFinanciera, on_delete=models.PROTECT,
+                                     related_name='movimientos_archivados', null=True, blank=True)
+    descripcion = models.CharField(max_length=200, verbose_name="Descripción")
+    monto = models.DecimalField(max_digits=15, decimal_places=2, verbose_name="Monto")
+    fecha = models.DateField(verbose_name="Fecha del movimiento")
+    es_recurrente = models.BooleanField(default=False, verbose_name="Es recurrente")
+    frecuencia = models.CharField(max_length=12, choices=MovimientoFinanciero.FRECUENCIA_CHOICES,
+                                  blank=True, verbose_name="Frecuencia")
+    fecha_fin_recurrencia = models.DateField(null=True, blank=True, verbose_name="Fecha fin recurrencia")
+    metodo_pago = models.CharField(max_length=20, choices=MovimientoFinanciero.METODO_PAGO_CHOICES,
+                                   default='EFECTIVO', verbose_name="Método de pago")
+    referencia = models.CharField(max_length=100, blank=True, verbose_name="Referencia/Número de transacción")
+    notas = models.TextField(blank=True, verbose_name="Notas adicionales")
+    comprobante = models.CharField(max_length=100, blank=True, verbose_name="Número de comprobante")
+    fecha_creacion = models.DateTimeField()
+    fecha_actualizacion = models.DateTimeField()
+    fecha_archivo = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de archivo")
+    
+    class Meta:
+        verbose_name = "Movimiento Financiero Archivado"
+        verbose_name_plural = "Movimientos Financieros Archivados"
+        ordering = ['-fecha', '-fecha_creacion']
+        indexes = [
+            models.Index(fields=['propietario', 'fecha']),
+        ]
+    
+    def __str__(self):
+        signo = "+" if self.tipo == 'INGRESO' else "-"
+        return f"{signo}${self.monto:,.2f} - {self.descripcion} ({self.fecha}) [archivado]"
+
+class PagoDeudaArchivo(models.Model):
+    """Pagos de deudas anteriores al horizonte de archivo"""
+    id = models.BigIntegerField(primary_key=True)
+    deuda = models.ForeignKey(Deuda, on_delete=models.CASCADE, related_name='pagos_archivados')
+    monto_pago = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Monto del pago")
+    fecha_pago = models.DateField(verbose_name="Fecha del pago")
+    metodo_pago = models.CharField(max_length=50, verbose_name="Método de pago")
+    comprobante = models.CharField(max_length=100, blank=True, verbose_name="Número de comprobante")
+    observaciones = models.TextField(blank=True, verbose_name="Observaciones del pago")
+    fecha_registro = models.DateTimeField()
+    fecha_archivo = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de archivo")
+    
+    class Meta:
+        verbose_name = "Pago de Deuda Archivado"
+        verbose_name_plural = "Pagos de Deudas Archivados"
+        ordering = ['-fecha_pago']
+        indexes = [
+            models.Index(fields=['deuda', 'fecha_pago']),
+        ]
+    
+    def __str__(self):
+        return f"Pago ${self.monto_pago:,.2f} - {self.fecha_pago} [archivado]"
+
+class MiPagoArchivo(models.Model):
+    """Pagos a mis deudas anteriores al horizonte de archivo"""
+    id = models.BigIntegerField(primary_key=True)
+    mi_deuda = models.ForeignKey(MiDeuda, on_delete=models.CASCADE, related_name='mis_pagos_archivados')
+    monto_pago = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Monto del pago")
+    monto_capital = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Monto aplicado a capital")
+    monto_interes = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Monto aplicado a intereses")
+    fecha_pago = models.DateField(verbose_name="Fecha del pago")
+    metodo_pago = models.CharField(max_length=50, verbose_name="Método de pago")
+    numero_transaccion = models.CharField(max_length=100, blank=True, verbose_name="Número de transacción")
+    comprobante = models.CharField(max_length=100, blank=True, verbose_name="Número de comprobante")
+    observaciones = models.TextField(blank=True, verbose_name="Observaciones")
+    fecha_registro = models.DateTimeField()
+    fecha_archivo = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de archivo")
+    
+    class Meta:
+        verbose_name = "Mi Pago Archivado"
+        verbose_name_plural = "Mis Pagos Archivados"
+        ordering = ['-fecha_pago']
+        indexes = [
+            models.Index(fields=['mi_deuda', 'fecha_pago']),
+        ]
+    
+    def __str__(self):
+        return f"Pago ${self.monto_pago:,.2f} - {self.fecha_pago} [archivado]"
+
+# ===== DIAGNÓSTICO DE RENDIMIENTO =====
+
+class PerfilPeticion(models.Model):
+    """Perfil de ejecución de una petición tomado a demanda por un usuario staff"""
+    MODO_CHOICES = [
+        ('CPROFILE', 'cProfile + muestreo'),
+        ('MUESTREO', 'Solo muestreo'),
+    ]
+    
+    metodo = models.CharField(max_length=10, verbose_name="Método HTTP")
+    ruta = models.CharField(max_length=500, verbose_name="Ruta")
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='perfiles_peticion', verbose_name="Solicitado por")
+    modo = models.CharField(max_length=10, choices=MODO_CHOICES, default='CPROFILE', verbose_name="Modo")
+    status = models.PositiveIntegerField(verbose_name="Código de respuesta")
+    duracion_ms = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Duración (ms)")
+    muestras = models.PositiveIntegerField(default=0, verbose_name="Muestras de pila")
+    archivo_perfil = models.CharField(max_length=255, blank=True, verbose_name="Archivo cProfile (.prof)")
+    archivo_pilas = models.CharField(max_length=255, verbose_name="Archivo de pilas colapsadas")
+    fecha = models.DateTimeField(auto_now_add=True, verbose_name="Fecha")
+    
+    class Meta:
+        verbose_name = "Perfil de Petición"
+        verbose_name_plural = "Perfiles de Peticiones"
+        ordering = ['-fecha']
+    
+    def __str__(self):
+        return f"{self.metodo} {self.ruta} - {self.duracion_ms} ms ({self.fecha:%Y-%m-%d %H:%M})"
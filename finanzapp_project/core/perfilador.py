@@ -0,0 +1,82 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+class MuestreadorPilas:
+    """Toma muestras periódicas de la pila de un hilo y las acumula en formato colapsado.
+
+    El resultado (una línea ``marco;marco;... cuenta`` por pila distinta) es la
+    entrada que esperan flamegraph.pl, speedscope o inferno.
+    """
+    
+    def __init__(self, hilo_id, intervalo=0.005):
+        self.hilo_id = hilo_id
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, name='muestreador-pilas', daemon=True)
+    
+    def __enter__(self):
+        self._hilo.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self._detener.set()
+        self._hilo.join()
+    
+    @property
+    def total(self):
+        return sum(self.pilas.values())
+    
+    def _muestrear(self):
+        while not self._detener.wait(self.intervalo):
+            marco = sys._current_frames().get(self.hilo_id)
+            pila = []
+            while marco is not None:
+                codigo = marco.f_code
+                pila.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+                marco = marco.f_back
+            if pila:
+                self.pilas[';'.join(reversed(pila))] += 1
+    
+    def colapsado(self):
+        return ''.join(f"{pila} {cuenta}\n" for pila, cuenta in self.pilas.most_common())
+
+def perfilar(funcion, con_cprofile=True, intervalo=0.005):
+    """Ejecuta ``funcion`` bajo el muestreador (y cProfile si se pide).
+
+    Devuelve (resultado, duración en segundos, muestreador, perfil o None).
+    """
+    perfil = cProfile.Profile() if con_cprofile else None
+    with MuestreadorPilas(threading.get_ident(), intervalo) as muestreador:
+        inicio = time.perf_counter()
+        if perfil is not None:
+            perfil.enable()
+        try:
+            resultado = funcion()
+        finally:
+            if perfil is not None:
+                perfil.disable()
+            duracion = time.perf_counter() - inicio
+    return resultado, duracion, muestreador, perfil
+
+async def aperfilar(funcion, con_cprofile=True, intervalo=0.005):
+    """Como perfilar(), para una ``funcion`` que devuelve un awaitable.
+
+    Se perfila el hilo del bucle de eventos mientras se espera el resultado.
+    """
+    perfil = cProfile.Profile() if con_cprofile else None
+    with MuestreadorPilas(threading.get_ident(), intervalo) as muestreador:
+        inicio = time.perf_counter()
+        if perfil is not None:
+            perfil.enable()
+        try:
+            resultado = await funcion()
+        finally:
+            if perfil is not None:
+                perfil.disable()
+            duracion = time.perf_counter() - inicio
+    return resultado, duracion, muestreador, perfil
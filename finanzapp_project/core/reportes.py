@@ -0,0 +1,280 @@
+"""Reportes agregados por hogar, calculados con un número fijo de consultas y cacheados.
+
+Las claves de caché incluyen la versión de los datos del hogar
+(``versiones.version('reportes', propietario_id)``), que las señales renuevan
+al escribir movimientos, presupuestos o deudas.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Prefetch, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from . import catalogo, versiones
+from .models import (
+    ESTADOS_ABIERTOS, CategoriaFinanciera, SubcategoriaFinanciera, MovimientoFinanciero,
+    MovimientoFinancieroArchivo, PresupuestoCategoria, CuotaDiferida, Deuda, Deudor, MiDeuda, SaldoDiario,
+    total_pendiente
+)
+
+CACHE_SEGUNDOS = 24 * 60 * 60
+
+def _propietario_id(usuario):
+    return usuario.pk if usuario is not None and usuario.is_authenticated else None
+
+def _clave(nombre, usuario, *partes):
+    propietario_id = _propietario_id(usuario)
+    return ':'.join(str(parte) for parte in (
+        'core:reporte', nombre, propietario_id, *partes,
+        catalogo.version_actual(propietario_id), versiones.version('reportes', propietario_id),
+    ))
+
+def _sumar_meses(fecha, meses):
+    indice = fecha.year * 12 + fecha.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+def _monto(valor):
+    # SQLite devuelve las sumas con 15 cifras significativas: se redondean al centavo
+    return valor.quantize(Decimal('0.01'))
+
+def _razon(numerador, denominador):
+    return float(numerador / denominador) if denominador else None
+
+def _tabla(modelo):
+    return connection.ops.quote_name(modelo._meta.db_table)
+
+def _cacheado(clave, calcular):
+    resultado = cache.get(clave)
+    if resultado is None:
+        resultado = calcular()
+        cache.set(clave, resultado, CACHE_SEGUNDOS)
+    return resultado
+
+# ===== ÁRBOL DE CATEGORÍAS CON TOTALES =====
+
+def arbol_categorias(usuario, año, mes):
+    """Categorías → subcategorías con total, cantidad de movimientos y presupuesto del mes"""
+    return _cacheado(
+        _clave('arbol', usuario, f'{año}-{mes:02d}'),
+        lambda: _calcular_arbol(usuario, año, mes),
+    )
+
+def _calcular_arbol(usuario, año, mes):
+    inicio = date(año, mes, 1)
+    fin = date(año + 1, 1, 1) if mes == 12 else date(año, mes + 1, 1)
+
+    # 1-2: categorías del hogar y sus subcategorías
+    categorias = CategoriaFinanciera.objects.de(usuario).filter(activo=True).prefetch_related(
+        Prefetch('subcategorias', queryset=SubcategoriaFinanciera.objects.filter(activo=True).order_by('nombre'))
+    ).order_by('tipo', 'naturaleza', 'nombre')
+
+    # 3-4: totales por (categoría, subcategoría), en la tabla activa y en el archivo
+    totales = defaultdict(lambda: [Decimal('0'), 0])
+    for modelo in (MovimientoFinanciero, MovimientoFinancieroArchivo):
+        filas = modelo.objects.de(usuario).filter(
+            fecha__gte=inicio,
+            fecha__lt=fin
+        ).values('categoria_id', 'subcategoria_id').annotate(
+            total=Sum('monto'),
+            cantidad=Count('id')
+        ).order_by()
+        for fila in filas:
+            acumulado = totales[(fila['categoria_id'], fila['subcategoria_id'])]
+            acumulado[0] += fila['total']
+            acumulado[1] += fila['cantidad']
+
+    por_categoria = defaultdict(lambda: [Decimal('0'), 0])
+    for (categoria_id, _), (total, cantidad) in totales.items():
+        por_categoria[categoria_id][0] += total
+        por_categoria[categoria_id][1] += cantidad
+
+    # 5: presupuestos del mes
+    presupuestos = dict(PresupuestoCategoria.objects.filter(
+        categoria__in=CategoriaFinanciera.objects.de(usuario),
+        año=año,
+        mes=mes
+    ).values_list('categoria_id', 'monto_presupuestado'))
+
+    nodos = []
+    for categoria in categorias:
+        total, cantidad = por_categoria[categoria.pk]
+        presupuesto = presupuestos.get(categoria.pk)
+        nodos.append({
+            'id': categoria.pk,
+            'nombre': categoria.nombre,
+            'tipo': categoria.tipo,
+            'naturaleza': categoria.naturaleza,
+            'total': _monto(total),
+            'cantidad': cantidad,
+            'presupuesto': presupuesto,
+            'subcategorias': [
+                {
+                    'id': subcategoria.pk,
+                    'nombre': subcategoria.nombre,
+                    'total': _monto(totales[(categoria.pk, subcategoria.pk)][0]),
+                    'cantidad': totales[(categoria.pk, subcategoria.pk)][1],
+                } for subcategoria in categoria.subcategorias.all()
+            ],
+        })
+    return {'año': año, 'mes': mes, 'categorias': nodos}
+
+# ===== MÉTRICAS DE SALUD FINANCIERA =====
+
+def metricas_financieras(usuario, año, mes, meses=6):
+    """Tasa de ahorro, gasto promedio, meses de cobertura y razones de deuda.
+
+    Se calculan sobre los ``meses`` meses que terminan en año/mes, a partir de
+    la serie mensual de ingresos y egresos (una consulta agrupada) y de los
+    saldos de deudas abiertas (dos agregados).
+    """
+    return _cacheado(
+        _clave('metricas', usuario, f'{año}-{mes:02d}', meses),
+        lambda: _calcular_metricas(usuario, año, mes, meses),
+    )
+
+def _calcular_metricas(usuario, año, mes, meses):
+    fin = _sumar_meses(date(año, mes, 1), 1)
+    inicio = _sumar_meses(fin, -meses)
+    
+    # 1-2: serie mensual de ingresos y egresos, en la tabla activa y en el archivo
+    serie = {_sumar_meses(inicio, i): {'INGRESO': Decimal('0'), 'EGRESO': Decimal('0')} for i in range(meses)}
+    for modelo in (MovimientoFinanciero, MovimientoFinancieroArchivo):
+        filas = modelo.objects.de(usuario).filter(
+            fecha__gte=inicio,
+            fecha__lt=fin
+        ).annotate(mes=TruncMonth('fecha')).values('mes', 'tipo').annotate(
+            total=Sum('monto')
+        ).order_by()
+        for fila in filas:
+            serie[fila['mes']][fila['tipo']] += fila['total']
+    
+    # 3-4: deudas abiertas (lo que debo y lo que me deben); 5: liquidez al cierre
+    pasivos = MiDeuda.objects.de(usuario).filter(estado__in=ESTADOS_ABIERTOS).aggregate(
+        saldo=Sum(total_pendiente('saldo_pendiente')),
+        cuotas=Sum('cuota_mensual')
+    )
+    por_cobrar = Deuda.objects.de(usuario).filter(estado__in=ESTADOS_ABIERTOS).aggregate(
+        total=Sum(total_pendiente('monto_pendiente'))
+    )['total'] or Decimal('0')
+    liquidez = SaldoDiario.saldo_al(fin - timedelta(days=1), _propietario_id(usuario))
+    
+    ingresos = sum(valores['INGRESO'] for valores in serie.values())
+    egresos = sum(valores['EGRESO'] for valores in serie.values())
+    ingreso_promedio = ingresos / meses
+    gasto_promedio = egresos / meses
+    deuda_total = pasivos['saldo'] or Decimal('0')
+    cuotas = pasivos['cuotas'] or Decimal('0')
+    
+    return {
+        'desde': inicio.isoformat(),
+        'hasta': (fin - timedelta(days=1)).isoformat(),
+        'meses': meses,
+        'serie': [
+            {
+                'mes': inicio_mes.strftime('%Y-%m'),
+                'ingresos': _monto(valores['INGRESO']),
+                'egresos': _monto(valores['EGRESO']),
+                'ahorro': _monto(valores['INGRESO'] - valores['EGRESO']),
+                'tasa_ahorro': _razon(valores['INGRESO'] - valores['EGRESO'], valores['INGRESO']),
+            } for inicio_mes, valores in serie.items()
+        ],
+        'ingreso_promedio': _monto(ingreso_promedio),
+        'gasto_promedio': _monto(gasto_promedio),
+        'tasa_ahorro': _razon(ingresos - egresos, ingresos),
+        'liquidez': liquidez,
+        # Meses que la liquidez cubre el gasto promedio
+        'meses_cobertura': _razon(liquidez, gasto_promedio) if liquidez > 0 else 0.0,
+        'deuda_total': _monto(deuda_total),
+        'cuotas_mensuales': _monto(cuotas),
+        'por_cobrar': _monto(por_cobrar),
+        # Deuda pendiente sobre ingreso anual y cuotas sobre ingreso mensual
+        'deuda_ingreso': _razon(deuda_total, ingreso_promedio * 12),
+        'servicio_deuda': _razon(cuotas, ingreso_promedio),
+    }
+
+# ===== CARTERA POR EDADES =====
+
+# Tramo → días de mora (desde, hasta) incluidos; None = sin límite
+TRAMOS = {
+    'por_vencer': (None, -1),
+    'dias_0_30': (0, 30),
+    'dias_31_60': (31, 60),
+    'dias_61_90': (61, 90),
+    'mas_90': (91, None),
+}
+
+def cartera_por_edades(usuario, fecha=None):
+    """Saldo por cobrar por tramos de días de mora al ``fecha`` (hoy por defecto), por deudor y total.
+
+    Las deudas con cuotas aportan cada cuota no pagada según su propio
+    vencimiento; las demás, su monto pendiente según el vencimiento de la
+    deuda. El interés causado sin pagar de todas va con el vencimiento de la
+    deuda. Se cachea por día (la fecha es parte de la clave).
+    """
+    fecha = fecha or timezone.now().date()
+    return _cacheado(
+        _clave('cartera', usuario, fecha.isoformat()),
+        lambda: _calcular_cartera(usuario, fecha),
+    )
+
+def _calcular_cartera(usuario, fecha):
+    # Los días de mora se comparan como fechas de corte (sin aritmética de fechas propia de cada motor)
+    casos, parametros = [], []
+    for tramo, (minimo, maximo) in TRAMOS.items():
+        condiciones = []
+        if minimo is not None:
+            condiciones.append('saldos.vence <= %s')
+            parametros.append(fecha - timedelta(days=minimo))
+        if maximo is not None:
+            condiciones.append('saldos.vence >= %s')
+            parametros.append(fecha - timedelta(days=maximo))
+        casos.append(f"SUM(CASE WHEN {' AND '.join(condiciones)} THEN saldos.monto ELSE 0 END) AS {tramo}")
+    
+    abiertos = ', '.join(['%s'] * len(ESTADOS_ABIERTOS))
+    propietario_id = _propietario_id(usuario)
+    propietario = 'd.propietario_id = %s' if propietario_id is not None else 'd.propietario_id IS NULL'
+    filtro = [propietario_id] if propietario_id is not None else []
+    sql = f"""
+        SELECT saldos.deudor_id, deudor.nombre, {', '.join(casos)}, SUM(saldos.monto) AS total
+        FROM (
+            SELECT d.deudor_id, d.monto_pendiente AS monto, d.fecha_vencimiento AS vence
+            FROM {_tabla(Deuda)} d
+            WHERE {propietario} AND d.estado IN ({abiertos}) AND d.monto_pendiente > 0
+              AND NOT EXISTS (SELECT 1 FROM {_tabla(CuotaDiferida)} c WHERE c.deuda_id = d.id)
+            UNION ALL
+            SELECT d.deudor_id, c.monto_cuota, c.fecha_vencimiento
+            FROM {_tabla(CuotaDiferida)} c INNER JOIN {_tabla(Deuda)} d ON d.id = c.deuda_id
+            WHERE {propietario} AND d.estado IN ({abiertos}) AND c.pagada = %s
+            UNION ALL
+            SELECT d.deudor_id, d.interes_causado - d.interes_pagado, d.fecha_vencimiento
+            FROM {_tabla(Deuda)} d
+            WHERE {propietario} AND d.estado IN ({abiertos}) AND d.interes_causado > d.interes_pagado
+        ) saldos
+        INNER JOIN {_tabla(Deudor)} deudor ON deudor.id = saldos.deudor_id
+        GROUP BY saldos.deudor_id, deudor.nombre
+        ORDER BY total DESC, saldos.deudor_id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql, parametros + filtro + ESTADOS_ABIERTOS + filtro + ESTADOS_ABIERTOS + [False] + filtro + ESTADOS_ABIERTOS
+        )
+        filas = cursor.fetchall()
+    
+    columnas = [*TRAMOS, 'total']
+    totales = dict.fromkeys(columnas, Decimal('0'))
+    deudores = []
+    for deudor_id, nombre, *montos in filas:
+        # SQLite devuelve las sumas como float
+        montos = [_monto(Decimal(str(monto))) for monto in montos]
+        for columna, monto in zip(columnas, montos):
+            totales[columna] += monto
+        deudores.append({'id': deudor_id, 'nombre': nombre, **dict(zip(columnas, montos))})
+    return {
+        'fecha': fecha.isoformat(),
+        'totales': totales,
+        'deudores': deudores,
+    }
@@ -0,0 +1,92 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .models import MovimientoFinanciero, MovimientoFinancieroArchivo, SaldoDiario, bloquear_hogar
+
+# Primera clave del bloqueo consultivo de PostgreSQL; la segunda es el propietario
+BLOQUEO_SALDOS = 30
+
+def bloquear(propietario_id):
+    """Serializa hasta el final de la transacción las escrituras de saldos de un hogar.
+
+    Sin el bloqueo, un movimiento con fecha anterior confirmado entre la lectura
+    del saldo inicial de un día nuevo y el desplazamiento de los siguientes no
+    llegaría a ese día.
+    """
+    bloquear_hogar(BLOQUEO_SALDOS, propietario_id)
+
+def aplicar_delta(propietario_id, fecha, ingresos=Decimal('0'), egresos=Decimal('0')):
+    """Suma ingresos/egresos al día indicado y desplaza el saldo de ese día en adelante.
+
+    Se llama dentro de la transacción que guarda el movimiento: si algo falla no
+    queda ni el movimiento ni medio delta.
+    """
+    neto = ingresos - egresos
+    dias = SaldoDiario.objects.filter(propietario_id=propietario_id)
+    with transaction.atomic():
+        bloquear(propietario_id)
+        if not dias.filter(fecha=fecha).exists():
+            SaldoDiario.objects.get_or_create(
+                propietario_id=propietario_id,
+                fecha=fecha,
+                defaults={'saldo_acumulado': SaldoDiario.saldo_al(fecha - timedelta(days=1), propietario_id)},
+            )
+        dias.filter(fecha=fecha).update(
+            ingresos=F('ingresos') + ingresos,
+            egresos=F('egresos') + egresos,
+        )
+        if neto:
+            dias.filter(fecha__gte=fecha).update(
+                saldo_acumulado=F('saldo_acumulado') + neto
+            )
+
+def aplicar_movimiento(propietario_id, fecha, tipo, monto, signo=1):
+    """Registra (signo=1) o revierte (signo=-1) el efecto de un movimiento sobre los saldos"""
+    monto = Decimal(monto) * signo
+    if tipo == 'INGRESO':
+        aplicar_delta(propietario_id, fecha, ingresos=monto)
+    else:
+        aplicar_delta(propietario_id, fecha, egresos=monto)
+
+def _reconstruir_hogar(propietario_id):
+    dias = {}
+    for modelo in (MovimientoFinanciero, MovimientoFinancieroArchivo):
+        totales = modelo.objects.filter(propietario_id=propietario_id).values('fecha', 'tipo').annotate(
+            total=Sum('monto')
+        ).order_by()
+        for fila in totales:
+            dia = dias.setdefault(fila['fecha'], SaldoDiario(propietario_id=propietario_id, fecha=fila['fecha']))
+            if fila['tipo'] == 'INGRESO':
+                dia.ingresos += fila['total']
+            else:
+                dia.egresos += fila['total']
+    
+    saldo = Decimal('0.00')
+    for fecha in sorted(dias):
+        dia = dias[fecha]
+        saldo += Decimal(dia.ingresos) - Decimal(dia.egresos)
+        dia.saldo_acumulado = saldo
+    
+    SaldoDiario.objects.filter(propietario_id=propietario_id).delete()
+    SaldoDiario.objects.bulk_create(dias.values(), batch_size=5000)
+    return len(dias)
+
+def reconstruir_saldos():
+    """Recalcula la tabla completa a partir de los movimientos (activos y archivados); devuelve el número de días.
+
+    Hogar por hogar y con el mismo bloqueo que aplicar_delta: los movimientos
+    guardados mientras tanto esperan y aplican su delta sobre la tabla ya reconstruida.
+    """
+    propietarios = set()
+    for modelo in (MovimientoFinanciero, MovimientoFinancieroArchivo, SaldoDiario):
+        propietarios.update(modelo.objects.values_list('propietario_id', flat=True).distinct().order_by())
+    
+    total = 0
+    for propietario_id in sorted(propietarios, key=lambda propietario_id: propietario_id or 0):
+        with transaction.atomic():
+            bloquear(propietario_id)
+            total += _reconstruir_hogar(propietario_id)
+    return total
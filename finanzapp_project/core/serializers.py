@@ -1,40 +1,173 @@
 from rest_framework import serializers
 from .models import *
+from . import catalogo, metas, trabajos
 
-class DeudorSerializer(serializers.ModelSerializer):
+class PropietarioActual:
+    """Valor por defecto del propietario: el usuario autenticado de la petición"""
+    requires_context = True
+    
+    def __call__(self, serializer_field):
+        request = serializer_field.context.get('request')
+        usuario = getattr(request, 'user', None)
+        return usuario if usuario is not None and usuario.is_authenticated else None
+
+class NombreCategoriaField(serializers.Field):
+    """Nombre de la categoría desde el árbol en memoria: no requiere select_related('categoria').
+
+    El árbol de cada hogar se obtiene una vez por serialización y se guarda en
+    el contexto (compartido por todos los elementos de una lista), de modo que
+    la versión del catálogo se consulta en la caché una sola vez y no por cada fila.
+    """
+    
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def to_representation(self, obj):
+        arboles = self.context.setdefault('catalogo', {})
+        if obj.propietario_id not in arboles:
+            arboles[obj.propietario_id] = catalogo.vigente(obj.propietario_id)
+        categoria = catalogo.categoria(obj.categoria_id, arbol=arboles[obj.propietario_id])
+        return categoria.nombre if categoria else None
+
+class DelPropietarioSerializer(serializers.ModelSerializer):
+    """Asigna el hogar del usuario y limita las relaciones a sus propios registros"""
+    propietario = serializers.HiddenField(default=PropietarioActual())
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is not None:
+            for field in fields.values():
+                queryset = getattr(field, 'queryset', None)
+                if hasattr(queryset, 'de'):
+                    field.queryset = queryset.de(request.user)
+        return fields
+
+class DeudorSerializer(DelPropietarioSerializer):
     total_deuda = serializers.ReadOnlyField()
     
     class Meta:
         model = Deudor
         fields = '__all__'
 
-class DeudaSerializer(serializers.ModelSerializer):
+class DeudaSerializer(DelPropietarioSerializer):
     deudor_nombre = serializers.CharField(source='deudor.nombre', read_only=True)
+    interes_pendiente = serializers.ReadOnlyField()
+    total_pendiente = serializers.ReadOnlyField()
     
     class Meta:
         model = Deuda
         fields = '__all__'
 
-class AcreedorSerializer(serializers.ModelSerializer):
+class AcreedorSerializer(DelPropietarioSerializer):
     class Meta:
         model = Acreedor
         fields = '__all__'
 
-class MiDeudaSerializer(serializers.ModelSerializer):
+class MiDeudaSerializer(DelPropietarioSerializer):
     acreedor_nombre = serializers.CharField(source='acreedor.nombre', read_only=True)
+    interes_pendiente = serializers.ReadOnlyField()
+    total_pendiente = serializers.ReadOnlyField()
     
     class Meta:
         model = MiDeuda
         fields = '__all__'
 
-class CategoriaFinancieraSerializer(serializers.ModelSerializer):
+class CategoriaFinancieraSerializer(DelPropietarioSerializer):
     class Meta:
         model = CategoriaFinanciera
         fields = '__all__'
 
-class MovimientoFinancieroSerializer(serializers.ModelSerializer):
-    categoria_nombre = serializers.CharField(source='categoria.nombre', read_only=True)
+class MetaFinancieraSerializer(DelPropietarioSerializer):
+    porcentaje_completado = serializers.ReadOnlyField()
+    monto_faltante = serializers.ReadOnlyField()
+    dias_restantes = serializers.ReadOnlyField()
+    fecha_proyectada = serializers.SerializerMethodField()
+    
+    def get_fecha_proyectada(self, obj):
+        # El viewset calcula las proyecciones de toda la página a la vez
+        proyecciones = self.context.get('proyecciones')
+        if proyecciones is None:
+            proyecciones = metas.proyecciones([obj])
+        return proyecciones.get(obj.pk)
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        if isinstance(self.instance, MetaFinanciera) and self.instance.vinculada:
+            fields['monto_actual'].read_only = True
+        return fields
+    
+    def validate(self, attrs):
+        categoria = attrs.get('categoria', getattr(self.instance, 'categoria', None))
+        subcategoria = attrs.get('subcategoria', getattr(self.instance, 'subcategoria', None))
+        if subcategoria is not None and subcategoria.categoria_id != getattr(categoria, 'pk', None):
+            raise serializers.ValidationError({'subcategoria': 'La subcategoría debe pertenecer a la categoría de aportes'})
+        if categoria is not None:
+            # Vinculada: monto_actual lo calculan los aportes de la categoría
+            attrs.pop('monto_actual', None)
+        return attrs
+    
+    class Meta:
+        model = MetaFinanciera
+        fields = '__all__'
+
+class AlertaGastoSerializer(serializers.ModelSerializer):
+    categoria_nombre = NombreCategoriaField()
+    
+    class Meta:
+        model = AlertaGasto
+        exclude = ['propietario']
+        read_only_fields = [
+            'tipo', 'movimiento', 'categoria', 'subcategoria', 'fecha', 'monto', 'esperado', 'puntaje', 'fecha_creacion'
+        ]
+
+class MovimientoFinancieroSerializer(DelPropietarioSerializer):
+    categoria_nombre = NombreCategoriaField()
     
     class Meta:
         model = MovimientoFinanciero
         fields = '__all__'
+
+class TrabajoSerializer(serializers.ModelSerializer):
+    archivo_disponible = serializers.SerializerMethodField()
+    error = serializers.SerializerMethodField()
+    
+    def get_archivo_disponible(self, obj):
+        return obj.estado == 'COMPLETADO' and bool(obj.archivo)
+    
+    def get_error(self, obj):
+        # Solo la última línea de la traza (el mensaje de la excepción)
+        lineas = [linea for linea in obj.error.splitlines() if linea.strip()]
+        return lineas[-1] if lineas else ''
+    
+    def validate_tarea(self, valor):
+        definicion = trabajos.TAREAS.get(valor)
+        request = self.context.get('request')
+        es_staff = request is not None and request.user.is_staff
+        if definicion is None or not (definicion.publica or es_staff):
+            raise serializers.ValidationError(f"Tarea no disponible: {valor}")
+        return valor
+    
+    def validate_parametros(self, valor):
+        if not isinstance(valor, dict):
+            raise serializers.ValidationError("Los parámetros deben ser un objeto JSON")
+        return valor
+    
+    def validate(self, attrs):
+        errores = trabajos.errores_parametros(attrs['tarea'], attrs.get('parametros') or {})
+        if errores:
+            raise serializers.ValidationError({'parametros': errores})
+        return attrs
+    
+    class Meta:
+        model = Trabajo
+        fields = [
+            'id', 'tarea', 'parametros', 'estado', 'progreso', 'mensaje', 'resultado', 'archivo_disponible',
+            'error', 'intentos', 'max_intentos', 'fecha_creacion', 'fecha_inicio', 'fecha_fin'
+        ]
+        read_only_fields = [
+            'estado', 'progreso', 'mensaje', 'resultado', 'intentos', 'max_intentos',
+            'fecha_creacion', 'fecha_inicio', 'fecha_fin'
+        ]
@@ -0,0 +1,257 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+from functools import wraps
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from . import catalogo, eventos, metas, saldos, sincronizacion, versiones
+from .models import (
+    CategoriaFinanciera, CuotaDiferida, Deuda, MetaFinanciera, MiDeuda, MovimientoFinanciero, PresupuestoCategoria,
+    SubcategoriaFinanciera
+)
+
+# Enviada por las operaciones masivas de la API (bulk_create/bulk_update y
+# borrados con los receptores suspendidos) en lugar de una señal por fila.
+# Argumentos: creados, actualizados (pares anterior/nuevo) y eliminados.
+cambios_masivos = Signal()
+
+_suspendidas = ContextVar('senales_suspendidas', default=False)
+
+@contextmanager
+def senales_suspendidas():
+    """Desactiva los receptores de este módulo (p. ej. al mover filas al archivo)"""
+    token = _suspendidas.set(True)
+    try:
+        yield
+    finally:
+        _suspendidas.reset(token)
+
+def si_activas(receptor):
+    @wraps(receptor)
+    def envoltura(*args, **kwargs):
+        if not _suspendidas.get():
+            return receptor(*args, **kwargs)
+    return envoltura
+
+# ===== ÁRBOL DE CATEGORÍAS =====
+# Sin @si_activas: la caché debe invalidarse siempre, también en operaciones masivas.
+# Solo al confirmar: antes de eso la transacción ve sus cambios sin pasar por la copia en memoria.
+
+def _invalidar_catalogo(*propietarios):
+    for propietario_id in set(propietarios):
+        transaction.on_commit(lambda propietario_id=propietario_id: catalogo.invalidar(propietario_id))
+
+@receiver([post_save, post_delete], sender=CategoriaFinanciera)
+def invalidar_catalogo(sender, instance, **kwargs):
+    _invalidar_catalogo(instance.propietario_id)
+
+@receiver([post_save, post_delete], sender=SubcategoriaFinanciera)
+def invalidar_catalogo_subcategoria(sender, instance, **kwargs):
+    _invalidar_catalogo(instance.categoria.propietario_id)
+
+@receiver(cambios_masivos, sender=CategoriaFinanciera)
+def invalidar_catalogo_en_lote(sender, creados=(), actualizados=(), eliminados=(), **kwargs):
+    _invalidar_catalogo(
+        *(categoria.propietario_id for categoria in creados),
+        *(categoria.propietario_id for pareja in actualizados for categoria in pareja),
+        *(categoria.propietario_id for categoria in eliminados),
+    )
+
+# ===== CACHÉS DE REPORTES =====
+# Versión por hogar de los datos que alimentan los reportes cacheados
+# (movimientos, presupuestos, deudas y sus cuotas); al confirmar también se avisa a los
+# tableros conectados. Con los receptores suspendidos no se invalida:
+# el archivo no cambia los totales y los borrados masivos envían cambios_masivos.
+
+def _invalidar_reportes(*propietarios):
+    for propietario_id in set(propietarios):
+        versiones.invalidar('reportes', propietario_id)
+        transaction.on_commit(lambda propietario_id=propietario_id: versiones.invalidar('reportes', propietario_id))
+        # Los tableros conectados por SSE recalculan con los datos ya confirmados
+        transaction.on_commit(lambda propietario_id=propietario_id: eventos.notificar(propietario_id))
+
+@receiver([post_save, post_delete], sender=MovimientoFinanciero)
+@si_activas
+def invalidar_reportes_movimiento(sender, instance, **kwargs):
+    _invalidar_reportes(instance.propietario_id)
+
+@receiver([post_save, post_delete], sender=Deuda)
+@receiver([post_save, post_delete], sender=MiDeuda)
+@si_activas
+def invalidar_reportes_deuda(sender, instance, **kwargs):
+    _invalidar_reportes(instance.propietario_id)
+
+@receiver([post_save, post_delete], sender=CuotaDiferida)
+@si_activas
+def invalidar_reportes_cuota(sender, instance, **kwargs):
+    # La cartera por edades toma las cuotas no pagadas
+    _invalidar_reportes(*Deuda.objects.filter(pk=instance.deuda_id).values_list('propietario_id', flat=True))
+
+@receiver(cambios_masivos, sender=MovimientoFinanciero)
+@receiver(cambios_masivos, sender=Deuda)
+@receiver(cambios_masivos, sender=MiDeuda)
+@si_activas
+def invalidar_reportes_en_lote(sender, creados=(), actualizados=(), eliminados=(), **kwargs):
+    _invalidar_reportes(
+        *(movimiento.propietario_id for movimiento in creados),
+        *(nuevo.propietario_id for _, nuevo in actualizados),
+        *(movimiento.propietario_id for movimiento in eliminados),
+    )
+
+@receiver([post_save, post_delete], sender=PresupuestoCategoria)
+@si_activas
+def invalidar_reportes_presupuesto(sender, instance, **kwargs):
+    _invalidar_reportes(*CategoriaFinanciera.objects.filter(pk=instance.categoria_id).values_list(
+        'propietario_id', flat=True
+    ))
+
+# ===== SALDOS DIARIOS =====
+
+CAMPOS_SALDO = ('propietario_id', 'fecha', 'tipo', 'monto')
+CAMPOS_META = ('propietario_id', 'categoria_id', 'subcategoria_id', 'fecha')
+
+def _cambio(instance, anterior, campos):
+    return any(getattr(instance, campo) != anterior[campo] for campo in campos)
+
+@receiver(pre_save, sender=MovimientoFinanciero)
+@si_activas
+def recordar_movimiento_anterior(sender, instance, **kwargs):
+    # Valores guardados antes de la edición para revertir su efecto en post_save
+    instance._valores_anteriores = None
+    if instance.pk:
+        instance._valores_anteriores = sender.objects.filter(pk=instance.pk).values(
+            *CAMPOS_SALDO, 'categoria_id', 'subcategoria_id'
+        ).first()
+
+@receiver(post_save, sender=MovimientoFinanciero)
+@si_activas
+def actualizar_saldos_al_guardar(sender, instance, **kwargs):
+    anterior = getattr(instance, '_valores_anteriores', None)
+    if anterior:
+        if not _cambio(instance, anterior, CAMPOS_SALDO):
+            return
+        saldos.aplicar_movimiento(*(anterior[campo] for campo in CAMPOS_SALDO), signo=-1)
+    saldos.aplicar_movimiento(instance.propietario_id, instance.fecha, instance.tipo, instance.monto)
+
+@receiver(post_delete, sender=MovimientoFinanciero)
+@si_activas
+def actualizar_saldos_al_eliminar(sender, instance, **kwargs):
+    saldos.aplicar_movimiento(instance.propietario_id, instance.fecha, instance.tipo, instance.monto, signo=-1)
+
+@receiver(cambios_masivos, sender=MovimientoFinanciero)
+@si_activas
+def actualizar_saldos_en_lote(sender, creados=(), actualizados=(), eliminados=(), **kwargs):
+    # Agrupa los deltas por (propietario, fecha) para tocar cada día una sola vez
+    deltas = defaultdict(lambda: [Decimal('0'), Decimal('0')])
+    
+    def acumular(movimiento, signo):
+        delta = deltas[(movimiento.propietario_id, movimiento.fecha)]
+        delta[0 if movimiento.tipo == 'INGRESO' else 1] += movimiento.monto * signo
+    
+    for movimiento in creados:
+        acumular(movimiento, 1)
+    for anterior, nuevo in actualizados:
+        acumular(anterior, -1)
+        acumular(nuevo, 1)
+    for movimiento in eliminados:
+        acumular(movimiento, -1)
+    
+    for (propietario_id, fecha), (ingresos, egresos) in sorted(deltas.items(), key=lambda item: (item[0][0] or 0, item[0][1])):
+        if ingresos or egresos:
+            saldos.aplicar_delta(propietario_id, fecha, ingresos=ingresos, egresos=egresos)
+
+# ===== METAS FINANCIERAS VINCULADAS =====
+
+def _clave_meta(movimiento):
+    return tuple(getattr(movimiento, campo) for campo in CAMPOS_META)
+
+@receiver(post_save, sender=MovimientoFinanciero)
+@si_activas
+def actualizar_metas_al_guardar(sender, instance, **kwargs):
+    anterior = getattr(instance, '_valores_anteriores', None)
+    deltas = defaultdict(Decimal)
+    if anterior:
+        if not _cambio(instance, anterior, CAMPOS_META + ('monto',)):
+            return
+        deltas[tuple(anterior[campo] for campo in CAMPOS_META)] -= anterior['monto']
+    deltas[_clave_meta(instance)] += instance.monto
+    metas.aplicar_aportes(deltas)
+
+@receiver(post_delete, sender=MovimientoFinanciero)
+@si_activas
+def actualizar_metas_al_eliminar(sender, instance, **kwargs):
+    metas.aplicar_aportes({_clave_meta(instance): -instance.monto})
+
+@receiver(cambios_masivos, sender=MovimientoFinanciero)
+@si_activas
+def actualizar_metas_en_lote(sender, creados=(), actualizados=(), eliminados=(), **kwargs):
+    deltas = defaultdict(Decimal)
+    for movimiento in creados:
+        deltas[_clave_meta(movimiento)] += movimiento.monto
+    for anterior, nuevo in actualizados:
+        deltas[_clave_meta(anterior)] -= anterior.monto
+        deltas[_clave_meta(nuevo)] += nuevo.monto
+    for movimiento in eliminados:
+        deltas[_clave_meta(movimiento)] -= movimiento.monto
+    metas.aplicar_aportes(deltas)
+
+def _vinculo(meta):
+    return (meta.categoria_id, meta.subcategoria_id, meta.fecha_inicio)
+
+def _actualizar_vinculo(meta, vinculo_anterior, monto_anterior):
+    # Solo al vincular, cambiar o quitar el vínculo; el resto del tiempo se actualiza por aportes
+    if meta.vinculada:
+        if _vinculo(meta) != vinculo_anterior:
+            metas.recalcular(meta)
+    elif vinculo_anterior is not None and vinculo_anterior[0] is not None:
+        metas.desvincular(meta, monto_editado=meta.monto_actual != monto_anterior)
+
+@receiver(pre_save, sender=MetaFinanciera)
+@si_activas
+def recordar_vinculo_anterior(sender, instance, **kwargs):
+    instance._anterior = None
+    if instance.pk:
+        instance._anterior = sender.objects.filter(pk=instance.pk).values_list(
+            'categoria_id', 'subcategoria_id', 'fecha_inicio', 'monto_actual'
+        ).first()
+
+@receiver(post_save, sender=MetaFinanciera)
+@si_activas
+def recalcular_meta_vinculada(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_anterior', None)
+    _actualizar_vinculo(instance, anterior[:3] if anterior else None, anterior[3] if anterior else None)
+
+@receiver(cambios_masivos, sender=MetaFinanciera)
+@si_activas
+def recalcular_metas_en_lote(sender, creados=(), actualizados=(), **kwargs):
+    for meta in creados:
+        _actualizar_vinculo(meta, None, None)
+    for anterior, meta in actualizados:
+        _actualizar_vinculo(meta, _vinculo(anterior), anterior.monto_actual)
+
+# ===== BITÁCORA DE SINCRONIZACIÓN =====
+# Con los receptores suspendidos (borrados masivos, archivo) quien escribe
+# registra los cambios: cambios_masivos o sincronizacion.registrar_ids.
+
+@si_activas
+def registrar_guardado(sender, instance, created, **kwargs):
+    sincronizacion.registrar([instance], 'C' if created else 'U')
+
+@si_activas
+def registrar_eliminacion(sender, instance, **kwargs):
+    sincronizacion.registrar([instance], 'D')
+
+@si_activas
+def registrar_en_lote(sender, creados=(), actualizados=(), eliminados=(), **kwargs):
+    sincronizacion.registrar(creados, 'C')
+    sincronizacion.registrar((nuevo for _, nuevo in actualizados), 'U')
+    sincronizacion.registrar(eliminados, 'D')
+
+for modelo in sincronizacion.RECURSOS:
+    post_save.connect(registrar_guardado, sender=modelo)
+    post_delete.connect(registrar_eliminacion, sender=modelo)
+    cambios_masivos.connect(registrar_en_lote, sender=modelo)
@@ -0,0 +1,115 @@
+"""Bitácora de cambios para la sincronización incremental de los clientes.
+
+Cada creación, actualización o borrado de un recurso de la API agrega una
+fila a RegistroCambio al confirmarse la transacción (lo que se revierte no
+queda registrado). Los clientes guardan el último id recibido y piden solo lo
+posterior en ``/api/sync/?since=<id>``.
+
+Las filas se insertan en su propia transacción después de la escritura, así
+que sin más el id N+1 podría confirmarse antes que el N y un cliente que ya
+leyó el N+1 nunca vería el N. Cada cliente lee la bitácora de un solo hogar,
+y la transacción que inserta las filas toma antes el bloqueo de cada hogar
+afectado: dentro de un hogar los ids se asignan y confirman en orden. Como
+red para las bases donde ese bloqueo no existe (el hogar sin propietario
+fuera de PostgreSQL), solo se entregan las filas con cierta antigüedad
+(``SINCRONIZACION_RETRASO_SEGUNDOS``, 5 por defecto) y la página se corta en
+la primera fila más reciente: el resto se entrega en la siguiente consulta.
+
+Las escrituras que no pasan por save()/delete() (bulk_create de la API,
+update() con expresiones F, archivo del histórico) registran sus cambios
+explícitamente con ``registrar`` o ``registrar_ids``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    AlertaGasto, Acreedor, CategoriaFinanciera, Deuda, Deudor, MetaFinanciera, MiDeuda, MovimientoFinanciero,
+    RegistroCambio, bloquear_hogar
+)
+
+# Modelo → nombre del recurso en la API (el prefijo de su ruta)
+RECURSOS = {
+    Deudor: 'deudores',
+    Deuda: 'deudas',
+    Acreedor: 'acreedores',
+    MiDeuda: 'mis-deudas',
+    CategoriaFinanciera: 'categorias',
+    MovimientoFinanciero: 'movimientos',
+    MetaFinanciera: 'metas',
+    AlertaGasto: 'alertas',
+}
+
+PAGINA = 500
+PAGINA_MAXIMA = 2000
+
+# Primera clave del bloqueo consultivo de PostgreSQL (ver models.bloquear_hogar)
+BLOQUEO_BITACORA = 43
+
+def registrar_ids(modelo, pares, operacion):
+    """Registra la operación sobre los pares (id, propietario_id) de un modelo sincronizado"""
+    recurso = RECURSOS.get(modelo)
+    if recurso is None:
+        return
+    filas = [
+        RegistroCambio(propietario_id=propietario_id, recurso=recurso, objeto_id=pk, operacion=operacion)
+        for pk, propietario_id in pares
+    ]
+    if filas:
+        transaction.on_commit(lambda: _insertar(filas))
+
+def _insertar(filas):
+    # Los hogares en orden fijo, para que dos inserciones no se esperen mutuamente
+    with transaction.atomic():
+        for propietario_id in sorted({fila.propietario_id for fila in filas}, key=lambda pk: pk or 0):
+            bloquear_hogar(BLOQUEO_BITACORA, propietario_id)
+        RegistroCambio.objects.bulk_create(filas, batch_size=1000)
+
+def registrar(instancias, operacion):
+    """Registra la operación sobre instancias (todas del mismo modelo)"""
+    instancias = list(instancias)
+    if instancias:
+        registrar_ids(type(instancias[0]), [(instancia.pk, instancia.propietario_id) for instancia in instancias], operacion)
+
+def _corte():
+    """Fecha a partir de la cual las filas de la bitácora aún pueden tener ids anteriores sin confirmar"""
+    return timezone.now() - timedelta(seconds=getattr(settings, 'SINCRONIZACION_RETRASO_SEGUNDOS', 5))
+
+def cursor_actual(usuario):
+    """Último id de la bitácora visible para el usuario antes de la primera fila reciente (0 si no hay)"""
+    corte = _corte()
+    registros = RegistroCambio.objects.de(usuario)
+    reciente = registros.filter(fecha__gte=corte).order_by('id').values_list('id', flat=True).first()
+    if reciente is not None:
+        registros = registros.filter(id__lt=reciente)
+    ultimo = registros.order_by('-id').values_list('id', flat=True).first()
+    return ultimo or 0
+
+def cambios(usuario, desde, limite=PAGINA):
+    """Página de cambios posteriores a ``desde``: (cambios, cursor, hay_mas).
+
+    Dentro de la página cada registro aparece una sola vez, con su última
+    operación; ``cursor`` es el id del último cambio leído. La página termina
+    antes de la primera fila reciente (ver el retraso en la cabecera).
+    """
+    corte = _corte()
+    filas = list(RegistroCambio.objects.de(usuario).filter(id__gt=desde).order_by('id').values_list(
+        'id', 'recurso', 'objeto_id', 'operacion', 'fecha'
+    )[:limite + 1])
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    for posicion, fila in enumerate(filas):
+        if fila[4] >= corte:
+            filas, hay_mas = filas[:posicion], False
+            break
+    ultimos = {}
+    for secuencia, recurso, objeto_id, operacion, _ in filas:
+        ultimos.pop((recurso, objeto_id), None)
+        ultimos[(recurso, objeto_id)] = (secuencia, operacion)
+    resultado = [
+        {'secuencia': secuencia, 'recurso': recurso, 'id': objeto_id, 'operacion': operacion}
+        for (recurso, objeto_id), (secuencia, operacion) in ultimos.items()
+    ]
+    return resultado, (filas[-1][0] if filas else desde), hay_mas
@@ -0,0 +1,71 @@
+"""Tareas registradas en la cola de trabajos (core.trabajos)"""
+import os
+import tempfile
+import zipfile
+from datetime import datetime
+
+from django.contrib.auth.models import AnonymousUser
+
+from . import anomalias, estados_cuenta, exportacion, intereses, saldos
+from .trabajos import ruta_archivo, tarea
+
+def _usuario(trabajo):
+    return trabajo.propietario if trabajo.propietario_id else AnonymousUser()
+
+@tarea()
+def reconstruir_saldos(trabajo):
+    """Recalcula todos los saldos diarios (todos los hogares: solo staff)"""
+    trabajo.informar(0, 'Agregando movimientos')
+    return {'dias': saldos.reconstruir_saldos()}
+
+@tarea()
+def causar_intereses(trabajo, fecha=None):
+    """Causa el interés del día de las deudas abiertas (todos los hogares: solo staff)"""
+    fecha = datetime.strptime(fecha, '%Y-%m-%d').date() if fecha else None
+    return {
+        campo: {'deudas': deudas, 'interes': str(total)}
+        for campo, (deudas, total) in intereses.causar(fecha).items()
+    }
+
+@tarea(publica=True)
+def detectar_anomalias(trabajo, reiniciar=False):
+    """Actualiza las líneas base de gasto del hogar y registra sus alertas"""
+    lineas, alertas = anomalias.actualizar_lineas_base(
+        propietario_id=trabajo.propietario_id, todos=False, reiniciar=bool(reiniciar)
+    )
+    return {'lineas': lineas, 'alertas': alertas}
+
+@tarea(publica=True)
+def exportar_columnar(trabajo, tablas=None, formato='npz'):
+    """Exportación .npz (o .parquet de una tabla) del historial del hogar, descargable al terminar"""
+    tablas = tablas or list(exportacion.TABLAS)
+    desconocidas = set(tablas) - set(exportacion.TABLAS)
+    if desconocidas:
+        raise ValueError(f"Tablas desconocidas: {', '.join(sorted(desconocidas))}")
+    if formato == 'parquet':
+        if len(tablas) != 1:
+            raise ValueError("La exportación a Parquet es de una sola tabla")
+        trabajo.informar(0, f'Exportando {tablas[0]}')
+        filas = exportacion.escribir_parquet(ruta_archivo(trabajo, 'parquet'), tablas[0], _usuario(trabajo))
+        return {'filas': {tablas[0]: filas}}
+    if formato != 'npz':
+        raise ValueError("formato debe ser npz o parquet")
+    filas = exportacion.escribir_npz(
+        ruta_archivo(trabajo, 'npz'), _usuario(trabajo), tablas,
+        informar=lambda posicion, tabla: trabajo.informar(posicion / len(tablas), f'Exportando {tabla}'),
+    )
+    return {'filas': filas}
+
+@tarea(publica=True)
+def estados_cuenta_mes(trabajo, año, mes):
+    """Estados de cuenta del mes de los deudores del hogar, en un .zip descargable"""
+    año, mes = int(año), int(mes)
+    with tempfile.TemporaryDirectory() as directorio:
+        rutas = estados_cuenta.generar(
+            año, mes, directorio, _usuario(trabajo),
+            informar=lambda hechos, total: trabajo.informar(hechos / total, f'{hechos} de {total} deudores'),
+        )
+        with zipfile.ZipFile(ruta_archivo(trabajo, 'zip'), 'w', zipfile.ZIP_DEFLATED) as comprimido:
+            for ruta in rutas:
+                comprimido.write(ruta, os.path.basename(ruta))
+    return {'estados': len(rutas)}
@@ -1,3 +1,1299 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+import shutil
+import tempfile
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from . import anomalias, api_views, archivo, catalogo, codificacion, estados_cuenta, eventos, intereses, reportes, saldos, sincronizacion, trabajos, versiones
+from .models import (
+    Acreedor, AlertaGasto, CausacionInteres, CategoriaFinanciera, CuotaDiferida, Deuda, Deudor, MiDeuda, MiPago, MiPagoArchivo,
+    LineaBaseGasto, MovimientoFinanciero, MovimientoFinancieroArchivo, PagoDeuda, PagoDeudaArchivo, PerfilPeticion, RegistroCambio, SaldoDiario, SubcategoriaFinanciera, Trabajo
+)
+
+MONTO = Decimal('12345678901234567.89')
+
+def crear_hogar(nombre):
+    """Usuario con una categoría de ingresos y otra de egresos"""
+    usuario = get_user_model().objects.create_user(nombre)
+    usuario.ingresos = CategoriaFinanciera.objects.create(
+        propietario=usuario, nombre='Salario', tipo='INGRESO', naturaleza='FIJO'
+    )
+    usuario.egresos = CategoriaFinanciera.objects.create(
+        propietario=usuario, nombre='Mercado', tipo='EGRESO', naturaleza='VARIABLE'
+    )
+    return usuario
+
+def crear_deuda(usuario, monto, vence, documento='1', **campos):
+    """Deuda por cobrar (con su deudor) del hogar del usuario (None: sin propietario)"""
+    deudor = Deudor.objects.create(propietario=usuario, nombre=f'Deudor {documento}', documento=documento)
+    return Deuda.objects.create(
+        propietario=usuario,
+        deudor=deudor,
+        concepto='Préstamo',
+        monto_original=Decimal(monto),
+        monto_pendiente=Decimal(monto),
+        fecha_prestamo=campos.pop('fecha_prestamo', vence - timedelta(days=30)),
+        fecha_vencimiento=vence,
+        **campos
+    )
+
+def crear_mi_deuda(usuario, monto, vence, **campos):
+    acreedor = Acreedor.objects.create(propietario=usuario, nombre='Banco')
+    return MiDeuda.objects.create(
+        propietario=usuario,
+        acreedor=acreedor,
+        tipo_deuda='PRESTAMO',
+        concepto='Crédito',
+        monto_original=Decimal(monto),
+        saldo_pendiente=Decimal(monto),
+        fecha_contrato=campos.pop('fecha_contrato', vence - timedelta(days=365)),
+        fecha_vencimiento=vence,
+        **campos
+    )
+
+def movimiento(usuario, tipo, monto, fecha, **campos):
+    return MovimientoFinanciero.objects.create(
+        propietario=usuario,
+        tipo=tipo,
+        categoria=usuario.ingresos if tipo == 'INGRESO' else usuario.egresos,
+        descripcion=campos.pop('descripcion', f'{tipo} {monto}'),
+        monto=Decimal(monto),
+        fecha=fecha,
+        **campos
+    )
+
+class RenderizadorJSONTests(SimpleTestCase):
+    """Los Decimal crudos nunca pasan por float, con o sin indentación y con o sin orjson"""
+    
+    def render(self, datos, media_type='application/json'):
+        return codificacion.RenderizadorJSON().render(datos, media_type).decode()
+    
+    def assertExacto(self, contenido):
+        self.assertIn('12345678901234567.89', contenido)
+        self.assertEqual(str(json.loads(contenido, parse_float=Decimal)['m']), '12345678901234567.89')
+    
+    def test_con_indentacion(self):
+        self.assertExacto(self.render({'m': MONTO}, 'application/json; indent=2'))
+    
+    def test_sin_indentacion(self):
+        self.assertExacto(self.render({'m': MONTO}))
+    
+    def test_sin_orjson(self):
+        with mock.patch.object(codificacion, 'orjson', None):
+            self.assertExacto(self.render({'m': MONTO}, 'application/json; indent=2'))
+            self.assertEqual(json.loads(self.render({'m': MONTO}))['m'], '12345678901234567.89')
+    
+    @override_settings(FINANZAPP_JSON_DECIMALES='texto')
+    def test_como_texto(self):
+        self.assertEqual(json.loads(self.render({'m': MONTO}, 'application/json; indent=2'))['m'], '12345678901234567.89')
+    
+    @skipUnless(getattr(codificacion.orjson, 'Fragment', None), 'Requiere orjson >= 3.9')
+    def test_como_numero_con_fragmentos(self):
+        contenido = self.render({'m': MONTO}, 'application/json; indent=2')
+        self.assertIn('"m": 12345678901234567.89', contenido)
+    
+    def test_dumps_igual_que_el_renderizador(self):
+        self.assertEqual(codificacion.dumps({'m': MONTO}), self.render({'m': MONTO}))
+
+class SaldosDiariosTests(TestCase):
+    """La tabla incremental coincide con la reconstrucción completa"""
+    
+    def setUp(self):
+        self.usuario = crear_hogar('ana')
+    
+    def dias(self):
+        return {
+            dia.fecha: (dia.ingresos, dia.egresos, dia.saldo_acumulado)
+            for dia in SaldoDiario.objects.filter(propietario=self.usuario)
+        }
+    
+    def test_mismo_dia_acumula(self):
+        movimiento(self.usuario, 'INGRESO', '100.00', date(2024, 3, 1))
+        movimiento(self.usuario, 'EGRESO', '30.50', date(2024, 3, 1))
+        movimiento(self.usuario, 'INGRESO', '5.25', date(2024, 3, 1))
+        self.assertEqual(self.dias(), {date(2024, 3, 1): (Decimal('105.25'), Decimal('30.50'), Decimal('74.75'))})
+    
+    def test_fecha_anterior_desplaza_los_dias_siguientes(self):
+        movimiento(self.usuario, 'INGRESO', '100.00', date(2024, 3, 10))
+        movimiento(self.usuario, 'EGRESO', '40.00', date(2024, 3, 20))
+        movimiento(self.usuario, 'INGRESO', '7.00', date(2024, 3, 5))
+        dias = self.dias()
+        self.assertEqual(dias[date(2024, 3, 5)][2], Decimal('7.00'))
+        self.assertEqual(dias[date(2024, 3, 10)][2], Decimal('107.00'))
+        self.assertEqual(dias[date(2024, 3, 20)][2], Decimal('67.00'))
+    
+    def test_editar_revierte_el_efecto_anterior(self):
+        primero = movimiento(self.usuario, 'INGRESO', '100.00', date(2024, 3, 10))
+        movimiento(self.usuario, 'INGRESO', '1.00', date(2024, 3, 20))
+        
+        primero.monto = Decimal('80.00')
+        primero.fecha = date(2024, 3, 25)
+        primero.save()
+        dias = self.dias()
+        self.assertEqual(dias[date(2024, 3, 10)], (Decimal('0.00'), Decimal('0.00'), Decimal('0.00')))
+        self.assertEqual(dias[date(2024, 3, 20)][2], Decimal('1.00'))
+        self.assertEqual(dias[date(2024, 3, 25)][2], Decimal('81.00'))
+        
+        primero.tipo = 'EGRESO'
+        primero.categoria = self.usuario.egresos
+        primero.save()
+        self.assertEqual(self.dias()[date(2024, 3, 25)], (Decimal('0.00'), Decimal('80.00'), Decimal('-79.00')))
+    
+    def test_eliminar_revierte(self):
+        movimiento(self.usuario, 'INGRESO', '100.00', date(2024, 3, 10))
+        egreso = movimiento(self.usuario, 'EGRESO', '40.00', date(2024, 3, 5))
+        egreso.delete()
+        dias = self.dias()
+        self.assertEqual(dias[date(2024, 3, 5)][2], Decimal('0.00'))
+        self.assertEqual(dias[date(2024, 3, 10)][2], Decimal('100.00'))
+    
+    def test_saldo_al_dia_sin_fila(self):
+        movimiento(self.usuario, 'INGRESO', '100.00', date(2024, 3, 10))
+        movimiento(self.usuario, 'EGRESO', '40.00', date(2024, 3, 20))
+        self.assertEqual(SaldoDiario.saldo_al(date(2024, 3, 9), self.usuario.pk), Decimal('0.00'))
+        self.assertEqual(SaldoDiario.saldo_al(date(2024, 3, 15), self.usuario.pk), Decimal('100.00'))
+        self.assertEqual(SaldoDiario.saldo_al(date(2024, 4, 1), self.usuario.pk), Decimal('60.00'))
+    
+    def test_reconstruir_coincide_con_el_incremental(self):
+        otro = crear_hogar('beto')
+        movimiento(otro, 'INGRESO', '999.00', date(2024, 3, 1))
+        movimientos = [
+            movimiento(self.usuario, tipo, monto, date(2024, 3, dia))
+            for tipo, monto, dia in [
+                ('INGRESO', '100.00', 10), ('EGRESO', '12.34', 3), ('EGRESO', '50.00', 10),
+                ('INGRESO', '0.66', 28), ('EGRESO', '3.00', 15),
+            ]
+        ]
+        movimientos[0].fecha = date(2024, 3, 1)
+        movimientos[0].save()
+        movimientos[3].delete()
+        
+        incremental = self.dias()
+        saldos.reconstruir_saldos()
+        reconstruido = self.dias()
+        # La reconstrucción no conserva los días que quedaron en cero
+        self.assertEqual(
+            {fecha: valores for fecha, valores in incremental.items() if valores[:2] != (0, 0)},
+            reconstruido
+        )
+        self.assertEqual(SaldoDiario.saldo_al(date(2024, 3, 31), otro.pk), Decimal('999.00'))
+    
+    def test_un_delta_fallido_no_deja_el_movimiento(self):
+        with mock.patch.object(saldos, 'aplicar_delta', side_effect=RuntimeError('sin saldos')):
+            with self.assertRaises(RuntimeError):
+                movimiento(self.usuario, 'INGRESO', '100.00', date(2024, 3, 10))
+        self.assertFalse(MovimientoFinanciero.objects.filter(propietario=self.usuario).exists())
+
+def _fallar(trabajo):
+    raise RuntimeError('falla de prueba')
+
+@override_settings(TRABAJOS_ESPERA_REINTENTO_SEGUNDOS=10, TRABAJOS_LATIDO_VENCIDO_SEGUNDOS=60)
+class ColaTrabajosTests(TestCase):
+    """Reclamo condicionado, reintentos, rescate y trabajadores rezagados"""
+    
+    def setUp(self):
+        tareas = mock.patch.dict(trabajos.TAREAS, {
+            'sumar': trabajos.Tarea(lambda trabajo, a, b: {'suma': a + b}, 3, False),
+            'fallar': trabajos.Tarea(_fallar, 2, False),
+            'opaca': trabajos.Tarea(lambda trabajo: object(), 1, False),
+        })
+        tareas.start()
+        self.addCleanup(tareas.stop)
+    
+    def vencer_latido(self, trabajo):
+        Trabajo.objects.filter(pk=trabajo.pk).update(latido=timezone.now() - timedelta(minutes=5))
+    
+    def test_cada_trabajo_lo_toma_un_solo_trabajador(self):
+        primero = trabajos.encolar('sumar', parametros={'a': 1, 'b': 2})
+        segundo = trabajos.encolar('sumar', parametros={'a': 3, 'b': 4})
+        futuro = trabajos.encolar('sumar', parametros={'a': 5, 'b': 6})
+        Trabajo.objects.filter(pk=futuro.pk).update(disponible_desde=timezone.now() + timedelta(hours=1))
+        
+        tomado_a = trabajos.tomar('a')
+        tomado_b = trabajos.tomar('b')
+        self.assertEqual((tomado_a.pk, tomado_a.trabajador, tomado_a.intentos), (primero.pk, 'a', 1))
+        self.assertEqual((tomado_b.pk, tomado_b.trabajador), (segundo.pk, 'b'))
+        # El tercero aún no está disponible y los otros dos ya están en curso
+        self.assertIsNone(trabajos.tomar('c'))
+    
+    def test_reintento_con_espera_exponencial(self):
+        trabajo = trabajos.encolar('fallar')
+        antes = timezone.now()
+        with self.assertLogs('core.trabajos', 'ERROR'):
+            self.assertFalse(trabajos.ejecutar(trabajos.tomar('a')))
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'PENDIENTE')
+        self.assertIn('falla de prueba', trabajo.error)
+        self.assertGreaterEqual(trabajo.disponible_desde, antes + timedelta(seconds=10))
+        self.assertIsNone(trabajos.tomar('a'))
+        self.assertEqual(trabajos._espera_reintento(3), timedelta(seconds=40))
+        
+        Trabajo.objects.filter(pk=trabajo.pk).update(disponible_desde=timezone.now())
+        with self.assertLogs('core.trabajos', 'ERROR'):
+            self.assertFalse(trabajos.ejecutar(trabajos.tomar('a')))
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos), ('FALLIDO', 2))
+        self.assertIsNotNone(trabajo.fecha_fin)
+    
+    def test_resultado_no_serializable_falla_el_trabajo(self):
+        trabajo = trabajos.encolar('opaca')
+        with self.assertLogs('core.trabajos', 'ERROR'):
+            self.assertFalse(trabajos.ejecutar(trabajos.tomar('a')))
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'FALLIDO')
+        self.assertIn('not JSON serializable', trabajo.error)
+    
+    def test_rescatar_abandonados(self):
+        reintentable = trabajos.encolar('sumar', parametros={'a': 1, 'b': 1})
+        agotado = trabajos.encolar('fallar')
+        vivo = trabajos.encolar('sumar', parametros={'a': 2, 'b': 2})
+        for trabajo in (reintentable, agotado, vivo):
+            trabajos.tomar('a')
+        Trabajo.objects.filter(pk=agotado.pk).update(intentos=2)
+        self.vencer_latido(reintentable)
+        self.vencer_latido(agotado)
+        
+        self.assertEqual(trabajos.rescatar_abandonados(), 2)
+        estados = dict(Trabajo.objects.values_list('pk', 'estado'))
+        self.assertEqual(
+            [estados[reintentable.pk], estados[agotado.pk], estados[vivo.pk]], ['PENDIENTE', 'FALLIDO', 'EN_CURSO']
+        )
+    
+    def test_trabajador_rezagado_no_sobrescribe(self):
+        trabajo = trabajos.encolar('sumar', parametros={'a': 1, 'b': 2})
+        rezagado = trabajos.tomar('a')
+        self.vencer_latido(rezagado)
+        trabajos.rescatar_abandonados()
+        nuevo = trabajos.tomar('b')
+        self.assertEqual(nuevo.pk, trabajo.pk)
+        
+        rezagado.informar(0.5, 'rezagado')
+        with self.assertLogs('core.trabajos', 'WARNING'):
+            self.assertFalse(trabajos.ejecutar(rezagado))
+            rezagado.tarea = 'fallar'
+            rezagado.parametros = {}
+            self.assertFalse(trabajos.ejecutar(rezagado))
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.trabajador, trabajo.mensaje), ('EN_CURSO', 'b', ''))
+        self.assertEqual(trabajo.error, 'El trabajador dejó de responder')
+        
+        self.assertTrue(trabajos.ejecutar(nuevo))
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.resultado), ('COMPLETADO', {'suma': 3}))
+    
+    def test_un_error_fuera_de_la_tarea_no_detiene_al_trabajador(self):
+        trabajos.encolar('sumar', parametros={'a': 1, 'b': 2})
+        salida = StringIO()
+        with mock.patch.object(trabajos, 'ejecutar', side_effect=RuntimeError('base caída')), \
+                self.assertLogs('core.management.commands.procesar_trabajos', 'ERROR'):
+            call_command('procesar_trabajos', '--una-vez', stdout=salida)
+        self.assertIn('interrumpido', salida.getvalue())
+
+class CatalogoTests(TransactionTestCase):
+    """Árbol por hogar: invalidación al confirmar, sin fantasmas y sin recargas por ids ajenos"""
+    
+    def setUp(self):
+        cache.clear()
+        catalogo._arboles.clear()
+        self.ana = crear_hogar('ana')
+        self.beto = crear_hogar('beto')
+    
+    def test_escrituras_de_un_hogar_no_invalidan_a_otro(self):
+        arbol_beto = catalogo.vigente(self.beto.pk)
+        arbol_ana = catalogo.vigente(self.ana.pk)
+        nueva = CategoriaFinanciera.objects.create(
+            propietario=self.ana, nombre='Arriendo', tipo='EGRESO', naturaleza='FIJO'
+        )
+        self.assertIs(catalogo.vigente(self.beto.pk), arbol_beto)
+        self.assertIsNot(catalogo.vigente(self.ana.pk), arbol_ana)
+        self.assertEqual(catalogo.categoria(nueva.pk, self.ana.pk).nombre, 'Arriendo')
+    
+    def test_ids_ajenos_se_recuerdan_como_ausentes(self):
+        catalogo.vigente(self.ana.pk)
+        ajena = self.beto.egresos.pk
+        self.assertIsNone(catalogo.categoria(ajena, self.ana.pk))
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertIsNone(catalogo.categoria(ajena, self.ana.pk))
+            self.assertIsNone(catalogo.categoria(999999, self.ana.pk))
+            self.assertIsNone(catalogo.categoria(999999, self.ana.pk))
+        self.assertEqual(len(consultas), 1)
+        self.assertEqual(catalogo.categoria(ajena, self.beto.pk).nombre, 'Mercado')
+    
+    def test_una_transaccion_deshecha_no_deja_fantasmas(self):
+        catalogo.vigente(self.ana.pk)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                fantasma = CategoriaFinanciera.objects.create(
+                    propietario=self.ana, nombre='Fantasma', tipo='EGRESO', naturaleza='FIJO'
+                )
+                # La propia transacción la ve aunque todavía no se haya invalidado
+                self.assertEqual(catalogo.categoria(fantasma.pk, self.ana.pk).nombre, 'Fantasma')
+                movimiento(self.ana, 'EGRESO', '10.00', date(2024, 3, 1))
+                raise RuntimeError('deshacer')
+        self.assertIsNone(catalogo.categoria(fantasma.pk, self.ana.pk))
+        self.assertNotIn(fantasma.pk, catalogo.nombres_categorias(self.ana.pk))
+    
+    def test_subcategorias_del_hogar(self):
+        sub = SubcategoriaFinanciera.objects.create(categoria=self.ana.egresos, nombre='Frutas')
+        self.assertEqual(catalogo.subcategoria(sub.pk, self.ana.pk).categoria_id, self.ana.egresos.pk)
+        self.assertIsNone(catalogo.subcategoria(sub.pk, self.beto.pk))
+        with self.assertRaisesMessage(ValueError, 'subcategoría'):
+            movimiento(self.beto, 'EGRESO', '1.00', date(2024, 3, 1), subcategoria=sub)
+
+@override_settings(SINCRONIZACION_RETRASO_SEGUNDOS=0)
+class HogaresAPITests(APITestCase):
+    """Un usuario solo ve y referencia los registros de su hogar"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.hoy = timezone.now().date()
+        cls.ana = crear_hogar('ana')
+        cls.beto = crear_hogar('beto')
+        cls.deuda_ana = crear_deuda(cls.ana, '100.00', cls.hoy - timedelta(days=10))
+        cls.deuda_beto = crear_deuda(cls.beto, '250.00', cls.hoy - timedelta(days=10))
+        cls.mi_deuda_beto = crear_mi_deuda(cls.beto, '900.00', cls.hoy + timedelta(days=300))
+        cls.movimiento_ana = movimiento(cls.ana, 'INGRESO', '500.00', cls.hoy)
+        cls.movimiento_beto = movimiento(cls.beto, 'EGRESO', '70.00', cls.hoy)
+        cls.deuda_anonima = crear_deuda(None, '40.00', cls.hoy + timedelta(days=5), documento='9')
+    
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.ana)
+    
+    def ids(self, ruta):
+        respuesta = self.client.get(ruta)
+        self.assertEqual(respuesta.status_code, 200)
+        return {fila['id'] for fila in respuesta.json()}
+    
+    def test_listados_solo_del_hogar(self):
+        self.assertEqual(self.ids('/api/deudores/'), {self.deuda_ana.deudor_id})
+        self.assertEqual(self.ids('/api/deudas/'), {self.deuda_ana.pk})
+        self.assertEqual(self.ids('/api/mis-deudas/'), set())
+        self.assertEqual(self.ids('/api/acreedores/'), set())
+        self.assertEqual(self.ids('/api/categorias/'), {self.ana.ingresos.pk, self.ana.egresos.pk})
+        self.assertEqual(self.ids('/api/movimientos/'), {self.movimiento_ana.pk})
+    
+    def test_detalle_ajeno_no_existe(self):
+        for ruta in (
+            f'/api/deudores/{self.deuda_beto.deudor_id}/', f'/api/deudas/{self.deuda_beto.pk}/',
+            f'/api/mis-deudas/{self.mi_deuda_beto.pk}/', f'/api/movimientos/{self.movimiento_beto.pk}/',
+        ):
+            with self.subTest(ruta=ruta):
+                self.assertEqual(self.client.get(ruta).status_code, 404)
+                self.assertEqual(self.client.patch(ruta, {'concepto': 'x', 'descripcion': 'x'}).status_code, 404)
+                self.assertEqual(self.client.delete(ruta).status_code, 404)
+        self.movimiento_beto.refresh_from_db()
+        self.assertEqual(self.movimiento_beto.descripcion, 'EGRESO 70.00')
+        self.assertTrue(Deuda.objects.filter(pk=self.deuda_beto.pk).exists())
+    
+    def test_no_referencia_relaciones_ajenas(self):
+        respuesta = self.client.post('/api/movimientos/', {
+            'tipo': 'EGRESO', 'categoria': self.beto.egresos.pk, 'descripcion': 'x', 'monto': '1.00',
+            'fecha': self.hoy.isoformat(),
+        })
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('categoria', respuesta.json())
+        
+        respuesta = self.client.post('/api/deudas/', {
+            'deudor': self.deuda_beto.deudor_id, 'concepto': 'x', 'monto_original': '1.00', 'monto_pendiente': '1.00',
+            'fecha_prestamo': self.hoy.isoformat(), 'fecha_vencimiento': self.hoy.isoformat(),
+        })
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('deudor', respuesta.json())
+        
+        respuesta = self.client.post('/api/mis-deudas/', {
+            'acreedor': self.mi_deuda_beto.acreedor_id, 'tipo_deuda': 'PRESTAMO', 'concepto': 'x',
+            'monto_original': '1.00', 'saldo_pendiente': '1.00',
+            'fecha_contrato': self.hoy.isoformat(), 'fecha_vencimiento': self.hoy.isoformat(),
+        })
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('acreedor', respuesta.json())
+        
+        respuesta = self.client.patch(f'/api/movimientos/{self.movimiento_ana.pk}/', {'categoria': self.beto.ingresos.pk})
+        self.assertEqual(respuesta.status_code, 400)
+    
+    def test_lotes_no_alcanzan_registros_ajenos(self):
+        respuesta = self.client.patch(
+            '/api/movimientos/', [{'id': self.movimiento_beto.pk, 'descripcion': 'x'}], format='json'
+        )
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json()['errores'][0]['indice'], 0)
+        respuesta = self.client.delete('/api/movimientos/', {'ids': [self.movimiento_beto.pk]}, format='json')
+        self.assertEqual(respuesta.status_code, 404)
+        respuesta = self.client.delete(
+            '/api/movimientos/', {'ids': [self.movimiento_beto.pk, self.movimiento_ana.pk]}, format='json'
+        )
+        self.assertEqual(respuesta.json(), {'eliminados': 1})
+        self.assertTrue(MovimientoFinanciero.objects.filter(pk=self.movimiento_beto.pk).exists())
+        
+        respuesta = self.client.post('/api/movimientos/', [{
+            'tipo': 'EGRESO', 'categoria': self.beto.egresos.pk, 'descripcion': 'x', 'monto': '1.00',
+            'fecha': self.hoy.isoformat(),
+        }], format='json')
+        self.assertEqual(respuesta.status_code, 400)
+    
+    def test_reportes_del_hogar(self):
+        stats = self.client.get('/api/dashboard/stats/').json()
+        self.assertEqual(stats['total_deudores'], 1)
+        self.assertEqual(Decimal(stats['total_por_cobrar']), Decimal('100.00'))
+        self.assertEqual(Decimal(stats['total_por_pagar']), Decimal('0.00'))
+        self.assertEqual(Decimal(stats['egresos_mes']), Decimal('0.00'))
+        self.assertEqual(Decimal(stats['saldo_actual']), Decimal('500.00'))
+        
+        cartera = self.client.get('/api/deudores/cartera/').json()
+        self.assertEqual([deudor['id'] for deudor in cartera['deudores']], [self.deuda_ana.deudor_id])
+        self.assertEqual(Decimal(cartera['totales']['total']), Decimal('100.00'))
+        
+        arbol = self.client.get('/api/categorias/arbol/').json()
+        self.assertEqual({categoria['id'] for categoria in arbol['categorias']}, {self.ana.ingresos.pk, self.ana.egresos.pk})
+        
+        metricas = self.client.get(f'/api/dashboard/metricas/?año={self.hoy.year}&mes={self.hoy.month}&meses=1').json()
+        self.assertEqual((Decimal(metricas['gasto_promedio']), Decimal(metricas['por_cobrar'])), (0, 100))
+        
+        graficos = self.client.get('/api/dashboard/graficos/').json()
+        self.assertEqual(graficos['gastos_por_categoria'], [])
+        self.assertEqual(self.ids('/api/dashboard/movimientos/'), {self.movimiento_ana.pk})
+    
+    def test_estado_cuenta_ajeno(self):
+        self.assertEqual(self.client.get(f'/api/deudores/{self.deuda_ana.deudor_id}/estado-cuenta/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/deudores/{self.deuda_beto.deudor_id}/estado-cuenta/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/mis-deudas/{self.mi_deuda_beto.pk}/estado-cuenta/').status_code, 404)
+    
+    def test_sincronizar_solo_cambios_del_hogar(self):
+        cursor = self.client.get('/api/sync/').json()['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            propio = movimiento(self.ana, 'EGRESO', '5.00', self.hoy)
+            movimiento(self.beto, 'EGRESO', '6.00', self.hoy)
+            crear_deuda(self.beto, '1.00', self.hoy, documento='2')
+        cambios = self.client.get(f'/api/sync/?since={cursor}').json()['cambios']
+        self.assertEqual([(cambio['recurso'], cambio['id']) for cambio in cambios], [('movimientos', propio.pk)])
+    
+    def test_anonimos_ven_solo_lo_que_no_tiene_propietario(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.ids('/api/deudas/'), {self.deuda_anonima.pk})
+        self.assertEqual(self.client.get(f'/api/deudas/{self.deuda_ana.pk}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/dashboard/stats/').json()['total_deudores'], 1)
+        
+        # Y los usuarios no ven lo que no tiene propietario
+        self.client.force_authenticate(self.ana)
+        self.assertEqual(self.client.get(f'/api/deudas/{self.deuda_anonima.pk}/').status_code, 404)
+
+class DashboardAsincronoTests(TransactionTestCase):
+    """Vistas ASGI: las consultas en hilos aparte conservan el hogar del usuario"""
+    
+    def setUp(self):
+        cache.clear()
+        self.hoy = timezone.now().date()
+        self.ana = crear_hogar('ana')
+        self.beto = crear_hogar('beto')
+        crear_deuda(self.ana, '100.00', self.hoy - timedelta(days=10))
+        crear_deuda(self.beto, '250.00', self.hoy - timedelta(days=10), documento='2')
+        movimiento(self.ana, 'INGRESO', '500.00', self.hoy)
+        movimiento(self.beto, 'EGRESO', '70.00', self.hoy)
+    
+    async def primer_evento(self, usuario):
+        await self.async_client.aforce_login(usuario)
+        respuesta = await self.async_client.get('/api/dashboard/eventos/')
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        flujo = aiter(respuesta.streaming_content)
+        try:
+            evento = (await anext(flujo)).decode()
+        finally:
+            await flujo.aclose()
+        nombre, datos = evento.strip().split('\n')
+        self.assertEqual(nombre, 'event: stats')
+        return json.loads(datos.removeprefix('data: '))
+    
+    async def test_eventos_del_hogar(self):
+        stats = await self.primer_evento(self.ana)
+        self.assertEqual(stats['total_deudores'], 1)
+        self.assertEqual(Decimal(stats['total_por_cobrar']), Decimal('100.00'))
+        self.assertEqual(Decimal(stats['egresos_mes']), Decimal('0.00'))
+        
+        stats = await self.primer_evento(self.beto)
+        self.assertEqual(Decimal(stats['total_por_cobrar']), Decimal('250.00'))
+        self.assertEqual(Decimal(stats['saldo_actual']), Decimal('-70.00'))
+    
+    async def test_paralelo_igual_a_serie(self):
+        for usuario, otro in ((self.ana, self.beto), (self.beto, self.ana)):
+            for consultas in (api_views._consultas_stats, api_views._consultas_graficos):
+                serie = await sync_to_async(api_views._en_serie)(consultas(self.hoy, usuario))
+                self.assertEqual(await api_views._en_paralelo(consultas(self.hoy, usuario)), serie)
+                self.assertNotEqual(await sync_to_async(api_views._en_serie)(consultas(self.hoy, otro)), serie)
+    
+    async def test_endpoints_async_igual_a_sync(self):
+        for usuario in (self.ana, self.beto):
+            await self.async_client.aforce_login(usuario)
+            await sync_to_async(self.client.force_login)(usuario)
+            for ruta in ('stats', 'graficos'):
+                asincrona = await self.async_client.get(f'/api/dashboard/async/{ruta}/')
+                sincrona = await sync_to_async(self.client.get)(f'/api/dashboard/{ruta}/')
+                self.assertEqual(asincrona.status_code, 200)
+                self.assertEqual(asincrona.json(), sincrona.json())
+
+class OperacionesMasivasTests(APITestCase):
+    """POST, PATCH y DELETE sobre la lista: todo o nada, con los efectos de las señales por fila"""
+    
+    def setUp(self):
+        self.ana = crear_hogar('ana')
+        self.beto = crear_hogar('beto')
+        self.client.force_authenticate(self.ana)
+    
+    def elemento(self, monto, dia=1, **campos):
+        return {
+            'tipo': 'EGRESO', 'categoria': self.ana.egresos.pk, 'descripcion': f'Compra {monto}', 'monto': monto,
+            'fecha': date(2024, 3, dia).isoformat(), **campos
+        }
+    
+    def saldos(self):
+        return dict(SaldoDiario.objects.filter(propietario=self.ana).values_list('fecha', 'saldo_acumulado'))
+    
+    def test_errores_por_elemento(self):
+        respuesta = self.client.post('/api/movimientos/', [
+            self.elemento('10.00'), self.elemento('abc'), self.elemento('5.00', tipo='INGRESO'),
+        ], format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        errores = respuesta.json()['errores']
+        self.assertEqual([error['indice'] for error in errores], [1])
+        self.assertIn('monto', errores[0]['errores'])
+        
+        # Las reglas de preparar_guardado() también se informan por índice
+        respuesta = self.client.post('/api/movimientos/', [
+            self.elemento('10.00'), self.elemento('5.00', tipo='INGRESO'),
+        ], format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json()['errores'], [
+            {'indice': 1, 'errores': {'non_field_errors': ['El tipo del movimiento debe coincidir con el tipo de categoría']}}
+        ])
+        self.assertFalse(MovimientoFinanciero.objects.exists())
+        
+        self.assertEqual(self.client.post('/api/movimientos/', [], format='json').status_code, 400)
+    
+    @override_settings(API_LOTE_MAXIMO=2)
+    def test_maximo_por_lote(self):
+        respuesta = self.client.post('/api/movimientos/', [self.elemento('1.00')] * 3, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json(), {'error': 'El lote supera el máximo de 2 elementos'})
+        self.assertEqual(self.client.delete('/api/movimientos/', [1, 2, 3], format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/movimientos/', [self.elemento('1.00')] * 2, format='json').status_code, 201)
+    
+    def test_conflicto_de_unicidad(self):
+        categoria = {'nombre': 'Ocio', 'tipo': 'EGRESO', 'naturaleza': 'VARIABLE'}
+        respuesta = self.client.post('/api/categorias/', [categoria, categoria], format='json')
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertFalse(CategoriaFinanciera.objects.filter(nombre='Ocio').exists())
+        
+        # Con referencia: el repetido se omite y se devuelve el existente
+        con_referencia = self.elemento('9.99', referencia='TX-1')
+        creado = self.client.post('/api/movimientos/', [con_referencia], format='json').json()[0]
+        respuesta = self.client.post('/api/movimientos/', [self.elemento('1.00'), con_referencia], format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta['X-Duplicados-Omitidos'], '1')
+        self.assertEqual(respuesta.json()[1]['id'], creado['id'])
+    
+    def test_efectos_de_cambios_masivos(self):
+        version = versiones.version('reportes', self.ana.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            creados = self.client.post('/api/movimientos/', [
+                self.elemento('10.00', 1), self.elemento('5.00', 3), self.elemento('1.00', 3),
+            ], format='json').json()
+        self.assertEqual(self.saldos(), {date(2024, 3, 1): Decimal('-10.00'), date(2024, 3, 3): Decimal('-16.00')})
+        self.assertNotEqual(versiones.version('reportes', self.ana.pk), version)
+        
+        version = versiones.version('reportes', self.ana.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.patch('/api/movimientos/', [
+                {'id': creados[0]['id'], 'monto': '20.00'}, {'id': creados[1]['id'], 'fecha': '2024-03-02'},
+            ], format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.saldos(), {
+            date(2024, 3, 1): Decimal('-20.00'), date(2024, 3, 2): Decimal('-25.00'), date(2024, 3, 3): Decimal('-26.00'),
+        })
+        self.assertNotEqual(versiones.version('reportes', self.ana.pk), version)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.delete('/api/movimientos/', [creados[0]['id'], creados[2]['id']], format='json')
+        self.assertEqual(respuesta.json(), {'eliminados': 2})
+        self.assertEqual(self.saldos()[date(2024, 3, 3)], Decimal('-5.00'))
+        
+        bitacora = list(RegistroCambio.objects.filter(propietario=self.ana).values_list('operacion', 'objeto_id'))
+        ids = [creado['id'] for creado in creados]
+        self.assertEqual(bitacora[:5], [*(('C', pk) for pk in ids), ('U', ids[0]), ('U', ids[1])])
+        self.assertCountEqual(bitacora[5:], [('D', ids[0]), ('D', ids[2])])
+    
+    def test_ids_de_otro_hogar(self):
+        propio = movimiento(self.ana, 'EGRESO', '1.00', date(2024, 3, 1))
+        ajeno = movimiento(self.beto, 'EGRESO', '2.00', date(2024, 3, 1))
+        respuesta = self.client.patch('/api/movimientos/', [
+            {'id': propio.pk, 'monto': '3.00'}, {'id': ajeno.pk, 'monto': '3.00'},
+        ], format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json()['errores'], [{'indice': 1, 'errores': {'id': ['No existe o no pertenece al usuario']}}])
+        propio.refresh_from_db()
+        self.assertEqual(propio.monto, Decimal('1.00'))
+        
+        respuesta = self.client.patch('/api/movimientos/', [{'id': 'x', 'monto': '3.00'}], format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json(), {'error': 'Los ids deben ser números enteros'})
+
+class EstadosCuentaTests(TestCase):
+    """Saldo inicial, saldo corrido y totales del SQL contra un recálculo en Python, página por página"""
+    
+    def setUp(self):
+        self.ana = crear_hogar('ana')
+        self.primera = crear_deuda(self.ana, '1000.00', date(2024, 6, 30), fecha_prestamo=date(2024, 1, 10))
+        self.deudor = self.primera.deudor
+        self.segunda = Deuda.objects.create(
+            propietario=self.ana, deudor=self.deudor, concepto='Segundo préstamo', monto_original=Decimal('500.00'),
+            monto_pendiente=Decimal('500.00'), fecha_prestamo=date(2024, 2, 15), fecha_vencimiento=date(2024, 8, 15),
+        )
+        # Dos líneas el mismo día en distintas deudas y tablas: el orden es fecha, orden, id
+        pagos = [
+            (self.primera, '100.00', date(2024, 1, 31)), (self.segunda, '50.00', date(2024, 2, 29)),
+            (self.primera, '100.00', date(2024, 2, 29)), (self.primera, '200.00', date(2024, 3, 31)),
+            (self.segunda, '75.50', date(2024, 4, 15)),
+        ]
+        for deuda, monto, fecha in pagos:
+            PagoDeuda.objects.create(deuda=deuda, monto_pago=Decimal(monto), fecha_pago=fecha, metodo_pago='EFECTIVO')
+        for pk, (deuda, monto, fecha) in enumerate([
+            (self.primera, '33.33', date(2024, 1, 20)), (self.segunda, '10.01', date(2024, 2, 29)),
+        ], start=900):
+            PagoDeudaArchivo.objects.create(
+                id=pk, deuda=deuda, monto_pago=Decimal(monto), fecha_pago=fecha, metodo_pago='EFECTIVO',
+                fecha_registro=timezone.now(),
+            )
+        for deuda, monto, fecha in [
+            (self.primera, '12.34', date(2024, 1, 31)), (self.segunda, '4.56', date(2024, 3, 31)),
+            (self.primera, '9.99', date(2024, 4, 30)),
+        ]:
+            CausacionInteres.objects.create(
+                propietario=self.ana, deuda=deuda, fecha=fecha, saldo_base=deuda.monto_original,
+                tasa_interes=Decimal('1.00'), monto=Decimal(monto),
+            )
+    
+    def esperadas(self):
+        """(fecha, tipo, id, cargo, abono, archivado, saldo) recalculadas desde los modelos"""
+        lineas = [
+            (deuda.fecha_prestamo, 0, deuda.pk, 'PRESTAMO', deuda.monto_original, Decimal('0'), False)
+            for deuda in (self.primera, self.segunda)
+        ]
+        for modelo in (PagoDeuda, PagoDeudaArchivo):
+            for pago in modelo.objects.filter(deuda__deudor=self.deudor):
+                lineas.append((pago.fecha_pago, 1, pago.pk, 'PAGO', Decimal('0'), pago.monto_pago, modelo is PagoDeudaArchivo))
+        for causacion in CausacionInteres.objects.filter(deuda__deudor=self.deudor):
+            lineas.append((causacion.fecha, 2, causacion.pk, 'INTERES', causacion.monto, Decimal('0'), False))
+        lineas.sort(key=lambda linea: linea[:3])
+        saldo, resultado = Decimal('0'), []
+        for fecha, _, pk, tipo, cargo, abono, archivado in lineas:
+            saldo += cargo - abono
+            resultado.append((fecha, tipo, pk, cargo, abono, archivado, saldo))
+        return resultado
+    
+    def comparar(self, desde, hasta, limite):
+        todas = self.esperadas()
+        en_rango = [
+            linea for linea in todas
+            if (desde is None or linea[0] >= desde) and (hasta is None or linea[0] <= hasta)
+        ]
+        saldo_inicial = sum((l[3] - l[4] for l in todas if desde is not None and l[0] < desde), Decimal('0'))
+        saldo_final = sum((l[3] - l[4] for l in todas if hasta is None or l[0] <= hasta), Decimal('0'))
+        obtenidas = []
+        # Una página más allá de la última: vacía, pero con los mismos totales
+        for desplazamiento in range(0, len(en_rango) + limite + 1, limite):
+            pagina = estados_cuenta.lineas_deudor(self.deudor.pk, desde, hasta, limite, desplazamiento)
+            self.assertEqual(pagina['total'], len(en_rango))
+            self.assertEqual(pagina['saldo_inicial'], saldo_inicial)
+            self.assertEqual(pagina['saldo_final'], saldo_final)
+            self.assertLessEqual(len(pagina['lineas']), limite)
+            obtenidas += [
+                (l['fecha'], l['tipo'], l['id'], l['cargo'], l['abono'], l['archivado'], l['saldo'])
+                for l in pagina['lineas']
+            ]
+        self.assertEqual(obtenidas, en_rango)
+        if en_rango:
+            self.assertEqual(en_rango[0][6] - en_rango[0][3] + en_rango[0][4], saldo_inicial)
+            self.assertEqual(en_rango[-1][6], saldo_final)
+    
+    def test_saldo_corrido_entre_paginas(self):
+        for limite in (1, 3, 4, 100):
+            self.comparar(None, None, limite)
+    
+    def test_rangos_de_fechas(self):
+        self.comparar(date(2024, 2, 1), date(2024, 3, 31), 2)
+        self.comparar(date(2024, 2, 29), None, 3)
+        self.comparar(None, date(2024, 1, 31), 2)
+        # Rango sin movimientos: solo saldos
+        self.comparar(date(2024, 5, 1), date(2024, 5, 31), 2)
+    
+    def test_endpoint(self):
+        self.client.force_login(self.ana)
+        ruta = f'/api/deudores/{self.deudor.pk}/estado-cuenta/'
+        respuesta = self.client.get(ruta, {'desde': '2024-02-01', 'limite': 3, 'pagina': 2}).json()
+        en_rango = [linea for linea in self.esperadas() if linea[0] >= date(2024, 2, 1)]
+        self.assertEqual(respuesta['total'], len(en_rango))
+        self.assertTrue(respuesta['hay_mas'])
+        self.assertEqual([linea['id'] for linea in respuesta['lineas']], [linea[2] for linea in en_rango[3:6]])
+        self.assertEqual(Decimal(respuesta['lineas'][0]['saldo']), en_rango[3][6])
+        self.assertEqual(self.client.get(ruta, {'pagina': 0}).status_code, 400)
+    
+    def test_mi_deuda_con_pagos_archivados(self):
+        deuda = crear_mi_deuda(self.ana, '2000.00', date(2025, 1, 1), fecha_contrato=date(2024, 1, 1))
+        MiPago.objects.create(
+            mi_deuda=deuda, monto_pago=Decimal('150.00'), monto_capital=Decimal('120.00'), monto_interes=Decimal('30.00'),
+            fecha_pago=date(2024, 3, 1), metodo_pago='TRANSFERENCIA', numero_transaccion='T-1',
+        )
+        MiPagoArchivo.objects.create(
+            id=900, mi_deuda=deuda, monto_pago=Decimal('110.00'), monto_capital=Decimal('100.00'),
+            monto_interes=Decimal('10.00'), fecha_pago=date(2024, 2, 1), metodo_pago='EFECTIVO', comprobante='C-1',
+            fecha_registro=timezone.now(),
+        )
+        CausacionInteres.objects.create(
+            propietario=self.ana, mi_deuda=deuda, fecha=date(2024, 2, 15), saldo_base=Decimal('1890.00'),
+            tasa_interes=Decimal('1.00'), monto=Decimal('0.63'),
+        )
+        resultado = estados_cuenta.lineas_mi_deuda(deuda.pk, desde=date(2024, 2, 10), limite=1, desplazamiento=1)
+        self.assertEqual(resultado['total'], 2)
+        self.assertEqual(resultado['saldo_inicial'], Decimal('1890.00'))
+        self.assertEqual(resultado['saldo_final'], Decimal('1740.63'))
+        self.assertEqual(resultado['lineas'], [{
+            'fecha': date(2024, 3, 1), 'tipo': 'PAGO', 'id': MiPago.objects.get().pk, 'deuda': deuda.pk,
+            'concepto': 'TRANSFERENCIA', 'referencia': 'T-1', 'cargo': Decimal('0.00'), 'abono': Decimal('150.00'),
+            'saldo': Decimal('1740.63'), 'archivado': False,
+        }])
+        todas = estados_cuenta.lineas_mi_deuda(deuda.pk)['lineas']
+        self.assertEqual([(l['tipo'], l['archivado'], l['referencia']) for l in todas], [
+            ('CONTRATO', False, ''), ('PAGO', True, 'C-1'), ('INTERES', False, ''), ('PAGO', False, 'T-1'),
+        ])
+    
+    def test_datos_lote(self):
+        (deudor_id, contexto), = estados_cuenta.datos_lote([self.deudor.pk, 0], 2024, 2)
+        self.assertEqual(deudor_id, self.deudor.pk)
+        primera, segunda = contexto['deudas']
+        # Enero: 1000 prestados, 12.34 de interés, 100 pagados y 33.33 archivados
+        self.assertEqual(primera['saldo_inicial'], '$879.01')
+        self.assertEqual(primera['saldo_final'], '$779.01')
+        self.assertEqual([pago['monto'] for pago in primera['pagos']], ['$100.00'])
+        # Nueva en febrero: el pago archivado del mes también cuenta
+        self.assertEqual(segunda['saldo_inicial'], '$0.00')
+        self.assertEqual(segunda['saldo_final'], '$439.99')
+        self.assertEqual(sorted(pago['monto'] for pago in segunda['pagos']), ['$10.01', '$50.00'])
+        self.assertEqual(contexto['totales'], {
+            'saldo_inicial': '$879.01', 'prestado': '$500.00', 'intereses': '$0.00', 'pagado': '$160.01',
+            'saldo_final': '$1,219.00',
+        })
+        # El saldo final del mes coincide con el del estado de cuenta al último día
+        self.assertEqual(
+            estados_cuenta.lineas_deudor(self.deudor.pk, hasta=date(2024, 2, 29), limite=1)['saldo_final'],
+            Decimal('1219.00'),
+        )
+
+class CarteraPorEdadesTests(TestCase):
+    """Cada tramo incluye sus dos extremos de días de mora y ninguno se solapa con el siguiente"""
+    
+    FECHA = date(2024, 6, 30)
+    
+    def setUp(self):
+        cache.clear()
+        self.ana = crear_hogar('ana')
+    
+    def cartera(self):
+        cache.clear()
+        return reportes.cartera_por_edades(self.ana, self.FECHA)
+    
+    def test_extremos_de_cada_tramo(self):
+        # (días de mora, tramo esperado); el monto identifica la deuda
+        casos = [
+            (-30, 'por_vencer'), (-1, 'por_vencer'), (0, 'dias_0_30'), (30, 'dias_0_30'), (31, 'dias_31_60'),
+            (60, 'dias_31_60'), (61, 'dias_61_90'), (90, 'dias_61_90'), (91, 'mas_90'), (400, 'mas_90'),
+        ]
+        esperado = dict.fromkeys(reportes.TRAMOS, Decimal('0'))
+        for indice, (dias, tramo) in enumerate(casos):
+            monto = Decimal(2 ** indice)
+            crear_deuda(self.ana, monto, self.FECHA - timedelta(days=dias), documento=str(indice))
+            esperado[tramo] += monto
+        totales = self.cartera()['totales']
+        self.assertEqual({tramo: totales[tramo] for tramo in reportes.TRAMOS}, esperado)
+        self.assertEqual(totales['total'], Decimal(2 ** len(casos) - 1))
+    
+    def test_cuotas_e_intereses(self):
+        deuda = crear_deuda(self.ana, '900.00', self.FECHA - timedelta(days=61), tipo_pago='DIFERIDA', meses_diferido=3)
+        for numero, dias, pagada in [(1, 61, True), (2, 31, False), (3, -1, False)]:
+            CuotaDiferida.objects.create(
+                deuda=deuda, numero_cuota=numero, monto_cuota=Decimal('300.00'),
+                fecha_vencimiento=self.FECHA - timedelta(days=dias), pagada=pagada,
+            )
+        # El interés pendiente va con el vencimiento de la deuda; el cobrado no cuenta
+        Deuda.objects.filter(pk=deuda.pk).update(interes_causado=Decimal('20.50'), interes_pagado=Decimal('5.25'))
+        simple = crear_deuda(self.ana, '100.00', self.FECHA - timedelta(days=30), documento='2')
+        Deuda.objects.filter(pk=simple.pk).update(
+            monto_pendiente=Decimal('40.00'), interes_causado=Decimal('3.00'), estado='PARCIAL'
+        )
+        saldada = crear_deuda(self.ana, '70.00', self.FECHA - timedelta(days=100), documento='3')
+        Deuda.objects.filter(pk=saldada.pk).update(monto_pendiente=Decimal('0'), estado='PAGADA')
+        
+        cartera = self.cartera()
+        self.assertEqual(cartera['totales'], {
+            'por_vencer': Decimal('300.00'), 'dias_0_30': Decimal('43.00'), 'dias_31_60': Decimal('300.00'),
+            'dias_61_90': Decimal('15.25'), 'mas_90': Decimal('0'), 'total': Decimal('658.25'),
+        })
+        self.assertEqual([deudor['id'] for deudor in cartera['deudores']], [deuda.deudor_id, simple.deudor_id])
+        self.assertEqual(cartera['deudores'][0]['total'], Decimal('615.25'))
+    
+    def test_otro_hogar_y_endpoint(self):
+        crear_deuda(self.ana, '10.00', self.FECHA, documento='1')
+        crear_deuda(crear_hogar('beto'), '99.00', self.FECHA, documento='2')
+        cache.clear()
+        self.client.force_login(self.ana)
+        respuesta = self.client.get('/api/deudores/cartera/', {'fecha': self.FECHA.isoformat()})
+        self.assertEqual(Decimal(respuesta.json()['totales']['dias_0_30']), Decimal('10.00'))
+        self.assertEqual(self.client.get('/api/deudores/cartera/', {'fecha': '30/06/2024'}).status_code, 400)
+
+class CausacionInteresesTests(TestCase):
+    """Centavos enteros, una causación por deuda y día, e interes_causado igual a la suma de causaciones"""
+    
+    def setUp(self):
+        self.hoy = timezone.now().date()
+        self.ana = crear_hogar('ana')
+        # 36.500,00 al 1 % mensual: 12 centavos × 100 por día exactos
+        self.mensual = crear_deuda(
+            self.ana, '36500.00', self.hoy + timedelta(days=30), fecha_prestamo=self.hoy - timedelta(days=30),
+            tasa_interes=Decimal('1.00'),
+        )
+        self.anual = crear_deuda(
+            self.ana, '36500.00', self.hoy + timedelta(days=30), documento='2', fecha_prestamo=self.hoy - timedelta(days=30),
+            tasa_interes=Decimal('1.00'), periodo_tasa='ANUAL',
+        )
+        self.propia = crear_mi_deuda(self.ana, '1000.00', self.hoy + timedelta(days=30), tasa_interes=Decimal('18.25'))
+    
+    def test_redondeo_en_centavos_enteros(self):
+        # Media centésima de centavo exacta: 18.250 centavos al 1 % anual son 0,5 centavos
+        self.assertEqual(list(intereses.interes_diario([18250, 18249, 0], [100, 100, 100], 1)), [1, 0, 0])
+        self.assertEqual(list(intereses.interes_diario([3650000, 3650000], [100, 100], [12, 1])), [1200, 100])
+        # Fuera de int64 el resultado es el mismo que con enteros de Python
+        saldo, tasa = 10 ** 17, 9999
+        esperado = (saldo * tasa * 12 + intereses.DIVISOR // 2) // intereses.DIVISOR
+        self.assertEqual(list(intereses.interes_diario([saldo], [tasa], 12)), [esperado])
+    
+    def test_causar_y_repetir_la_fecha(self):
+        resultado = intereses.causar()
+        self.assertEqual(resultado, {'deuda': (2, Decimal('13.00')), 'mi_deuda': (1, Decimal('0.50'))})
+        montos = dict(CausacionInteres.objects.filter(deuda__isnull=False).values_list('deuda_id', 'monto'))
+        self.assertEqual(montos, {self.mensual.pk: Decimal('12.00'), self.anual.pk: Decimal('1.00')})
+        
+        self.assertEqual(intereses.causar(self.hoy), {'deuda': (0, Decimal('0.00')), 'mi_deuda': (0, Decimal('0.00'))})
+        self.assertEqual(CausacionInteres.objects.count(), 3)
+        self.mensual.refresh_from_db()
+        self.assertEqual(self.mensual.interes_causado, Decimal('12.00'))
+    
+    def test_fecha_distinta_de_hoy(self):
+        for fecha in (self.hoy - timedelta(days=1), self.hoy + timedelta(days=1)):
+            with self.assertRaises(ValueError):
+                intereses.causar(fecha)
+        with self.assertRaisesMessage(CommandError, 'Solo se puede causar el día en curso'):
+            call_command('causar_intereses', fecha=(self.hoy - timedelta(days=1)).isoformat(), stdout=StringIO())
+        self.assertFalse(CausacionInteres.objects.exists())
+    
+    def test_otra_ejecucion_concurrente(self):
+        original = intereses.interes_diario
+        
+        def adelantada(*args):
+            # Otra ejecución causa la misma deuda entre la lectura y la escritura de esta
+            if not CausacionInteres.objects.exists():
+                CausacionInteres.objects.create(
+                    propietario=self.ana, deuda=self.mensual, fecha=self.hoy, saldo_base=Decimal('36500.00'),
+                    tasa_interes=Decimal('1.00'), monto=Decimal('12.00'),
+                )
+            return original(*args)
+        
+        with mock.patch.object(intereses, 'interes_diario', adelantada):
+            with self.assertRaises(IntegrityError):
+                intereses.causar()
+        # El lote fallido no deja causaciones ni sumas a medias
+        self.assertEqual(CausacionInteres.objects.count(), 1)
+        self.assertFalse(Deuda.objects.filter(interes_causado__gt=0).exists())
+    
+    def test_interes_causado_es_la_suma_de_causaciones(self):
+        ayer = self.hoy - timedelta(days=1)
+        CausacionInteres.objects.create(
+            propietario=self.ana, deuda=self.mensual, fecha=ayer, saldo_base=Decimal('36500.00'),
+            tasa_interes=Decimal('1.00'), monto=Decimal('12.00'),
+        )
+        Deuda.objects.filter(pk=self.mensual.pk).update(interes_causado=Decimal('12.00'))
+        intereses.causar()
+        
+        def sumas():
+            for modelo, campo in ((Deuda, 'deuda'), (MiDeuda, 'mi_deuda')):
+                for deuda in modelo.objects.all():
+                    causado = sum(
+                        CausacionInteres.objects.filter(**{campo: deuda}).values_list('monto', flat=True), Decimal('0')
+                    )
+                    self.assertEqual(deuda.interes_causado, causado, deuda)
+        sumas()
+        self.mensual.refresh_from_db()
+        self.assertEqual(self.mensual.interes_causado, Decimal('24.00'))
+        
+        CausacionInteres.objects.filter(fecha=ayer).delete()
+        intereses.recalcular(self.ana)
+        sumas()
+
+@override_settings(SINCRONIZACION_RETRASO_SEGUNDOS=5)
+class SincronizacionTests(APITestCase):
+    """El cursor nunca pasa por encima de una fila de la bitácora que aún puede confirmarse"""
+    
+    def setUp(self):
+        self.ana = crear_hogar('ana')
+        self.ahora = timezone.now()
+        self.client.force_authenticate(self.ana)
+    
+    def registrar(self, *montos):
+        with self.captureOnCommitCallbacks(execute=True):
+            creados = [movimiento(self.ana, 'EGRESO', monto, date(2024, 3, 1)) for monto in montos]
+        RegistroCambio.objects.update(fecha=self.ahora - timedelta(minutes=1))
+        return creados
+    
+    def cambios(self, desde, ahora=None):
+        with mock.patch.object(sincronizacion.timezone, 'now', return_value=ahora or self.ahora):
+            cambios, cursor, hay_mas = sincronizacion.cambios(self.ana, desde)
+        return [cambio['id'] for cambio in cambios], cursor, hay_mas
+    
+    def test_fila_reciente_detiene_el_cursor(self):
+        primero, segundo, tercero = self.registrar('1.00', '2.00', '3.00')
+        # La fila del segundo se acaba de confirmar; la del tercero, mayor, ya es antigua
+        RegistroCambio.objects.filter(objeto_id=segundo.pk).update(fecha=self.ahora - timedelta(seconds=1))
+        ids, cursor, hay_mas = self.cambios(0)
+        self.assertEqual(ids, [primero.pk])
+        self.assertFalse(hay_mas)
+        self.assertEqual(cursor, RegistroCambio.objects.get(objeto_id=primero.pk).pk)
+        # Pasado el retraso se entregan las dos, en orden
+        ids, _, _ = self.cambios(cursor, self.ahora + timedelta(seconds=5))
+        self.assertEqual(ids, [segundo.pk, tercero.pk])
+    
+    def test_fila_en_el_borde_del_retraso(self):
+        primero, segundo = self.registrar('1.00', '2.00')
+        corte = self.ahora - timedelta(seconds=5)
+        RegistroCambio.objects.filter(objeto_id=primero.pk).update(fecha=corte - timedelta(microseconds=1))
+        RegistroCambio.objects.filter(objeto_id=segundo.pk).update(fecha=corte)
+        ids, cursor, _ = self.cambios(0)
+        self.assertEqual(ids, [primero.pk])
+        self.assertEqual(self.cambios(cursor)[0], [])
+        self.assertEqual(self.cambios(cursor, self.ahora + timedelta(microseconds=1))[0], [segundo.pk])
+        
+        # El cursor inicial tampoco se adelanta a la fila del borde
+        with mock.patch.object(sincronizacion.timezone, 'now', return_value=self.ahora):
+            self.assertEqual(sincronizacion.cursor_actual(self.ana), cursor)
+    
+    @override_settings(SINCRONIZACION_RETRASO_SEGUNDOS=0)
+    def test_eliminaciones(self):
+        cursor = self.client.get('/api/sync/').json()['cursor']
+        conservado, borrado, efimero = self.registrar('1.00', '2.00', '3.00')
+        borrados = [borrado.pk, efimero.pk]
+        with self.captureOnCommitCallbacks(execute=True):
+            borrado.delete()
+            efimero.monto = Decimal('4.00')
+            efimero.save()
+            efimero.delete()
+        respuesta = self.client.get(f'/api/sync/?since={cursor}').json()
+        cambios = {cambio['id']: cambio for cambio in respuesta['cambios']}
+        self.assertEqual(cambios[conservado.pk]['operacion'], 'C')
+        self.assertEqual(cambios[conservado.pk]['datos']['monto'], '1.00')
+        # Creado, editado y borrado en la misma página: solo la lápida, sin datos
+        for pk in borrados:
+            self.assertEqual(cambios[pk], {
+                'secuencia': cambios[pk]['secuencia'], 'recurso': 'movimientos', 'id': pk, 'operacion': 'D'
+            })
+        
+        # Borrado después del cursor ya entregado: la lápida llega sola en la página siguiente
+        cursor, pk = respuesta['cursor'], conservado.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            conservado.delete()
+        respuesta = self.client.get(f'/api/sync/?since={cursor}').json()
+        self.assertEqual([(c['id'], c['operacion']) for c in respuesta['cambios']], [(pk, 'D')])
+    
+    def test_la_insercion_bloquea_cada_hogar(self):
+        beto = crear_hogar('beto')
+        bloqueos = []
+        
+        def bloquear(clave, propietario_id):
+            self.assertTrue(connection.in_atomic_block)
+            bloqueos.append((clave, propietario_id))
+        
+        with mock.patch.object(sincronizacion, 'bloquear_hogar', bloquear):
+            with self.captureOnCommitCallbacks(execute=True):
+                sincronizacion.registrar_ids(
+                    MovimientoFinanciero, [(1, beto.pk), (2, None), (3, self.ana.pk), (4, beto.pk)], 'D'
+                )
+        clave = sincronizacion.BLOQUEO_BITACORA
+        self.assertEqual(bloqueos, [(clave, None), (clave, self.ana.pk), (clave, beto.pk)])
+        self.assertEqual(RegistroCambio.objects.filter(operacion='D').count(), 4)
+
+class InstrumentacionSQLTests(TransactionTestCase):
+    """Encabezados de instrumentación con la cadena de middleware síncrona y la asíncrona"""
+    
+    def setUp(self):
+        self.ana = crear_hogar('ana')
+        movimiento(self.ana, 'INGRESO', '10.00', timezone.now().date())
+    
+    def test_peticion_sincrona(self):
+        self.client.force_login(self.ana)
+        respuesta = self.client.get('/api/movimientos/')
+        self.assertGreater(int(respuesta['X-Query-Count']), 0)
+        self.assertIn('db;dur=', respuesta['Server-Timing'])
+    
+    async def test_peticion_asincrona(self):
+        await self.async_client.aforce_login(self.ana)
+        # La sesión y el usuario se leen en el hilo de la petición
+        respuesta = await self.async_client.get('/api/dashboard/async/movimientos/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertGreater(int(respuesta['X-Query-Count']), 0)
+        self.assertIn('total;dur=', respuesta['Server-Timing'])
+    
+    async def test_streaming_sin_encabezados(self):
+        await self.async_client.aforce_login(self.ana)
+        respuesta = await self.async_client.get('/api/dashboard/eventos/')
+        try:
+            self.assertNotIn('X-Query-Count', respuesta)
+            self.assertNotIn('Server-Timing', respuesta)
+        finally:
+            await aiter(respuesta.streaming_content).aclose()
+
+class PerfiladorTests(TestCase):
+    """Solo un usuario staff (por sesión o por autenticación de la API) obtiene un perfil, y solo si está habilitado"""
+    
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        ajustes = self.settings(
+            PERFILADOR_HABILITADO=True, PERFILADOR_DIR=directorio,
+            PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.ana = get_user_model().objects.create_user('ana', password='clave')
+        self.admin = get_user_model().objects.create_user('admin', password='clave', is_staff=True)
+    
+    def cabeceras(self, usuario=None, perfilar='1'):
+        cabeceras = {'X-Perfilar': perfilar}
+        if usuario:
+            cabeceras['Authorization'] = 'Basic ' + base64.b64encode(f'{usuario}:clave'.encode()).decode()
+        return cabeceras
+    
+    def perfil(self, respuesta):
+        return PerfilPeticion.objects.filter(pk=respuesta.get('X-Perfil-Id')).first()
+    
+    def test_staff_por_sesion(self):
+        self.client.force_login(self.admin)
+        respuesta = self.client.get('/api/movimientos/', headers=self.cabeceras(perfilar='muestreo'))
+        perfil = self.perfil(respuesta)
+        self.assertEqual((perfil.usuario, perfil.modo, perfil.status), (self.admin, 'MUESTREO', 200))
+        self.assertEqual(perfil.archivo_perfil, '')
+        self.assertTrue(self.perfil(self.client.get('/api/movimientos/?_perfilar=cprofile')).archivo_perfil)
+    
+    def test_staff_por_autenticacion_de_la_api(self):
+        respuesta = self.client.get('/api/movimientos/', headers=self.cabeceras('admin'))
+        self.assertEqual(self.perfil(respuesta).usuario, self.admin)
+    
+    def test_sin_permiso(self):
+        self.assertNotIn('X-Perfil-Id', self.client.get('/api/movimientos/', headers=self.cabeceras()))
+        self.assertNotIn('X-Perfil-Id', self.client.get('/api/movimientos/', headers=self.cabeceras('ana')))
+        # Credenciales inválidas: sin perfil y la vista responde como sin pedirlo
+        cabeceras = {'Authorization': 'Basic xxx'}
+        esperado = self.client.get('/api/movimientos/', headers=cabeceras).status_code
+        respuesta = self.client.get('/api/movimientos/', headers={**cabeceras, 'X-Perfilar': '1'})
+        self.assertEqual(respuesta.status_code, esperado)
+        self.assertNotIn('X-Perfil-Id', respuesta)
+        self.client.force_login(self.ana)
+        self.assertNotIn('X-Perfil-Id', self.client.get('/api/movimientos/', headers=self.cabeceras()))
+        self.assertFalse(PerfilPeticion.objects.exists())
+    
+    def test_deshabilitado(self):
+        with self.settings(PERFILADOR_HABILITADO=False):
+            self.client = self.client_class()
+            self.client.force_login(self.admin)
+            self.assertNotIn('X-Perfil-Id', self.client.get('/api/movimientos/', headers=self.cabeceras()))
+        self.assertFalse(PerfilPeticion.objects.exists())
+    
+    async def test_peticion_asincrona(self):
+        respuesta = await self.async_client.get('/api/dashboard/async/stats/', headers=self.cabeceras('admin'))
+        perfil = await PerfilPeticion.objects.select_related('usuario').aget(pk=respuesta['X-Perfil-Id'])
+        self.assertEqual(perfil.usuario, self.admin)
+        await self.async_client.aforce_login(self.ana)
+        respuesta = await self.async_client.get('/api/dashboard/async/stats/', headers=self.cabeceras())
+        self.assertNotIn('X-Perfil-Id', respuesta)
+
+class EventosTests(SimpleTestCase):
+    """Los avisos pendientes de un suscriptor se funden en uno, sin importar cuántos lleguen"""
+    
+    async def test_rafaga_se_funde_en_un_aviso(self):
+        broker = eventos.BrokerMemoria()
+        suscripcion = broker.suscribir('hogar:1')
+        otra = broker.suscribir('hogar:2')
+        hilos = [
+            threading.Thread(target=lambda: [broker.publicar('hogar:1', f'cambio {n}') for n in range(500)])
+            for _ in range(4)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        broker.publicar('hogar:1', 'ultimo')
+        await asyncio.sleep(0)
+        
+        self.assertEqual(await suscripcion.recibir(1), 'ultimo')
+        self.assertIsNone(await suscripcion.recibir(0.01))
+        self.assertIsNone(await otra.recibir(0.01))
+        
+        # Lo que llega durante la ventana se consume sin un segundo recálculo
+        bucle = asyncio.get_running_loop()
+        bucle.call_later(0.01, broker.publicar, 'hogar:1', 'a')
+        bucle.call_later(0.02, broker.publicar, 'hogar:1', 'b')
+        self.assertEqual(await eventos.agrupar(suscripcion, 0.1), 2)
+        self.assertIsNone(await suscripcion.recibir(0.01))
+        
+        suscripcion.cerrar()
+        otra.cerrar()
+        self.assertEqual(broker._suscriptores, {})
+    
+    def test_bucle_terminado(self):
+        broker = eventos.BrokerMemoria()
+        
+        async def suscribir():
+            return broker.suscribir('hogar:1')
+        
+        asyncio.run(suscribir())
+        broker.publicar('hogar:1', 'cambio')
+        self.assertEqual(broker._suscriptores, {})
+
+@override_settings(ANOMALIAS_RETRASO_SEGUNDOS=60, ANOMALIAS_MINIMO_OBSERVACIONES=5)
+class AnomaliasTests(TestCase):
+    """Cada egreso se incorpora una vez aunque su transacción se confirme tarde, y las alertas traen montos exactos"""
+    
+    HOY = date(2024, 6, 15)
+    
+    def setUp(self):
+        self.ana = crear_hogar('ana')
+        self.ahora = timezone.now()
+        # Lunes de las semanas anteriores: todos en la línea base del día 0
+        for semana, monto in enumerate(['100.00', '101.00', '99.00', '100.00', '102.00', '98.00', '100.00', '101.00']):
+            movimiento(self.ana, 'EGRESO', monto, date(2024, 6, 3) - timedelta(weeks=semana))
+        self.creados_hace(timedelta(hours=1))
+        self.actualizar()
+    
+    def creados_hace(self, antiguedad, **filtro):
+        MovimientoFinanciero.objects.filter(**filtro).update(fecha_creacion=self.ahora - antiguedad)
+    
+    def actualizar(self, despues=timedelta(0), hoy=None, reiniciar=False):
+        with mock.patch.object(anomalias.timezone, 'now', return_value=self.ahora + despues):
+            return anomalias.actualizar_lineas_base(self.ana.pk, todos=False, hoy=hoy or self.HOY, reiniciar=reiniciar)
+    
+    def observaciones(self):
+        return LineaBaseGasto.objects.get(ambito='TRANSACCION', subcategoria=None, dia_semana=0).n
+    
+    def test_confirmado_despues_de_otro_mas_reciente(self):
+        siguiente = MovimientoFinanciero.objects.order_by('-pk').first().pk + 10
+        # El de id mayor ya está confirmado; el de id menor, creado antes, aún no
+        temprano = movimiento(self.ana, 'EGRESO', '100.00', date(2024, 6, 10), pk=siguiente)
+        self.creados_hace(timedelta(seconds=8), pk=temprano.pk)
+        self.assertEqual(self.actualizar()[1], 0)
+        self.assertEqual(self.observaciones(), 8)
+        
+        tardio = movimiento(self.ana, 'EGRESO', '5000.00', date(2024, 6, 10), pk=siguiente - 5)
+        self.creados_hace(timedelta(seconds=10), pk=tardio.pk)
+        self.assertEqual(self.actualizar(timedelta(minutes=2))[1], 1)
+        self.assertEqual(self.observaciones(), 10)
+        self.assertEqual(AlertaGasto.objects.get().movimiento_id, tardio.pk)
+        
+        # Una nueva ejecución no vuelve a incorporar ni a alertar
+        self.assertEqual(self.actualizar(timedelta(minutes=5))[1], 0)
+        self.assertEqual(self.observaciones(), 10)
+    
+    def test_montos_exactos(self):
+        # Un egreso el primer lunes de cada mes de 2023, para la línea base MENSUAL
+        for mes in range(1, 13):
+            primero = date(2023, mes, 1)
+            movimiento(self.ana, 'EGRESO', f'{300 + mes}.00', primero + timedelta(days=-primero.weekday() % 7))
+        self.creados_hace(timedelta(hours=1))
+        self.actualizar(reiniciar=True)
+        
+        for dia in (10, 17):
+            movimiento(self.ana, 'EGRESO', '3333333333333.33', date(2024, 6, dia))
+        self.creados_hace(timedelta(seconds=30), monto__gt=1000)
+        self.actualizar(timedelta(minutes=2), hoy=date(2024, 7, 15))
+        # Junio: los dos egresos grandes y el del lunes 3 (100.00)
+        self.assertEqual(AlertaGasto.objects.get(tipo='MENSUAL').monto, Decimal('6666666666766.66'))
+        self.assertEqual(
+            list(AlertaGasto.objects.filter(tipo='TRANSACCION').values_list('monto', flat=True)),
+            [Decimal('3333333333333.33')] * 2,
+        )
+
+class ArchivoTests(TestCase):
+    """Archivar mueve filas de tabla sin cambiar reportes, saldos ni estados de cuenta"""
+    
+    def setUp(self):
+        cache.clear()
+        self.hoy = timezone.now().date()
+        self.viejo = self.hoy - timedelta(days=500)
+        self.ana = crear_hogar('ana')
+        self.beto = crear_hogar('beto')
+        movimiento(self.ana, 'INGRESO', '1000.00', self.viejo)
+        movimiento(self.ana, 'EGRESO', '250.25', self.viejo + timedelta(days=3))
+        movimiento(self.ana, 'EGRESO', '80.00', self.hoy)
+        movimiento(self.beto, 'INGRESO', '40.00', self.viejo)
+        self.deuda = crear_deuda(
+            self.ana, '600.00', self.hoy + timedelta(days=30), fecha_prestamo=self.viejo - timedelta(days=10)
+        )
+        for monto, fecha in [('100.00', self.viejo), ('50.00', self.hoy)]:
+            PagoDeuda.objects.create(deuda=self.deuda, monto_pago=Decimal(monto), fecha_pago=fecha, metodo_pago='EFECTIVO')
+    
+    def resultados(self):
+        cache.clear()
+        lineas = estados_cuenta.lineas_deudor(self.deuda.deudor_id)
+        return {
+            'arbol': reportes.arbol_categorias(self.ana, self.viejo.year, self.viejo.month),
+            'metricas': reportes.metricas_financieras(self.ana, self.viejo.year, self.viejo.month, meses=3),
+            'saldos': [
+                SaldoDiario.saldo_al(fecha, propietario_id)
+                for fecha in (self.viejo, self.viejo + timedelta(days=3), self.hoy)
+                for propietario_id in (self.ana.pk, self.beto.pk)
+            ],
+            'estado': (lineas['saldo_inicial'], lineas['saldo_final'], [
+                (l['fecha'], l['id'], l['cargo'], l['abono'], l['saldo']) for l in lineas['lineas']
+            ]),
+        }
+    
+    def test_reportes_y_saldos_incluyen_lo_archivado(self):
+        antes = self.resultados()
+        movidos = archivo.archivar(dias=365)
+        self.assertEqual(MovimientoFinanciero.objects.count(), 1)
+        self.assertEqual(PagoDeuda.objects.get().monto_pago, Decimal('50.00'))
+        self.assertEqual(sum(movidos.values()), 4)
+        self.assertEqual(self.resultados(), antes)
+        self.assertEqual([l['archivado'] for l in estados_cuenta.lineas_deudor(self.deuda.deudor_id)['lineas']], [
+            False, True, False,
+        ])
+        # La tabla de saldos reconstruida desde cero también suma el archivo
+        saldos.reconstruir_saldos()
+        self.assertEqual(self.resultados(), antes)
+    
+    def test_archivar_dos_veces(self):
+        archivo.archivar(dias=365)
+        despues = self.resultados()
+        registros = RegistroCambio.objects.count()
+        self.assertEqual(set(archivo.archivar(dias=365).values()), {0})
+        self.assertEqual(MovimientoFinancieroArchivo.objects.count(), 3)
+        self.assertEqual(RegistroCambio.objects.count(), registros)
+        self.assertEqual(self.resultados(), despues)
@@ -0,0 +1,168 @@
+"""Cola de trabajos en la base de datos para el trabajo pesado fuera de la petición.
+
+Las tareas se registran con ``@tarea`` y se encolan con ``encolar`` (o por la
+API, ``/api/trabajos/``). El comando procesar_trabajos las ejecuta en un
+pool de hilos; se pueden lanzar varias instancias del comando (en una o en
+varias máquinas): cada trabajo se toma con un UPDATE condicionado al estado
+PENDIENTE, de modo que solo un trabajador lo gana.
+
+Una tarea recibe el Trabajo y sus parámetros, informa su avance con
+``trabajo.informar(progreso, mensaje)`` y devuelve un resultado serializable
+a JSON. Si falla se reintenta con espera exponencial hasta ``max_intentos``.
+Los trabajos de un trabajador caído (sin latido) vuelven a la cola.
+"""
+import inspect
+import json
+import logging
+import os
+import traceback
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Trabajo
+
+logger = logging.getLogger(__name__)
+
+Tarea = namedtuple('Tarea', 'funcion intentos publica')
+
+TAREAS = {}
+
+def tarea(nombre=None, intentos=3, publica=False):
+    """Registra una función como tarea.
+
+    ``publica`` permite que cualquier usuario la encole por la API para su
+    hogar; las demás solo las encola el staff.
+    """
+    def registrar(funcion):
+        TAREAS[nombre or funcion.__name__] = Tarea(funcion, intentos, publica)
+        return funcion
+    return registrar
+
+def errores_parametros(nombre, parametros):
+    """Parámetros desconocidos o faltantes según la firma de la tarea (lista de mensajes)"""
+    firma = list(inspect.signature(TAREAS[nombre].funcion).parameters.values())[1:]
+    aceptados = {parametro.name for parametro in firma}
+    requeridos = {parametro.name for parametro in firma if parametro.default is inspect.Parameter.empty}
+    errores = [f"Parámetro desconocido: {clave}" for clave in sorted(set(parametros) - aceptados)]
+    errores += [f"Falta el parámetro: {clave}" for clave in sorted(requeridos - set(parametros))]
+    return errores
+
+def encolar(nombre, propietario=None, parametros=None):
+    if nombre not in TAREAS:
+        raise ValueError(f"Tarea desconocida: {nombre}")
+    parametros = parametros or {}
+    errores = errores_parametros(nombre, parametros)
+    if errores:
+        raise ValueError('; '.join(errores))
+    return Trabajo.objects.create(
+        tarea=nombre,
+        parametros=parametros,
+        propietario=propietario,
+        max_intentos=TAREAS[nombre].intentos,
+    )
+
+def directorio_resultados():
+    return getattr(settings, 'TRABAJOS_DIR', settings.BASE_DIR / 'trabajos')
+
+def ruta_archivo(trabajo, extension):
+    """Ruta donde la tarea escribe su archivo de resultado (queda asociado al trabajo)"""
+    directorio = directorio_resultados()
+    os.makedirs(directorio, exist_ok=True)
+    trabajo.archivo = f'trabajo-{trabajo.pk}.{extension}'
+    Trabajo.objects.filter(pk=trabajo.pk).update(archivo=trabajo.archivo)
+    return os.path.join(directorio, trabajo.archivo)
+
+# ===== EJECUCIÓN =====
+
+def tomar(trabajador, tareas=None):
+    """Reclama el siguiente trabajo disponible; None si no hay"""
+    while True:
+        ahora = timezone.now()
+        pendientes = Trabajo.objects.filter(estado='PENDIENTE', disponible_desde__lte=ahora)
+        if tareas:
+            pendientes = pendientes.filter(tarea__in=tareas)
+        pk = pendientes.order_by('disponible_desde', 'id').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        # Solo un trabajador logra cambiar el estado; los demás buscan otro
+        if Trabajo.objects.filter(pk=pk, estado='PENDIENTE').update(
+            estado='EN_CURSO',
+            trabajador=trabajador,
+            intentos=F('intentos') + 1,
+            progreso=0,
+            mensaje='',
+            fecha_inicio=ahora,
+            latido=ahora,
+        ):
+            return Trabajo.objects.get(pk=pk)
+
+def _espera_reintento(intentos):
+    base = getattr(settings, 'TRABAJOS_ESPERA_REINTENTO_SEGUNDOS', 30)
+    return timedelta(seconds=base * 2 ** (intentos - 1))
+
+def _reclamado(trabajo):
+    """El trabajo mientras siga siendo de este trabajador y de este intento.
+
+    Si dejó de latir, rescatar_abandonados pudo devolverlo a la cola y otro
+    trabajador tomarlo: el que seguía en curso ya no debe escribir su estado.
+    """
+    return Trabajo.objects.filter(
+        pk=trabajo.pk, estado='EN_CURSO', trabajador=trabajo.trabajador, intentos=trabajo.intentos
+    )
+
+def ejecutar(trabajo):
+    """Ejecuta un trabajo ya tomado y registra su resultado o su error.
+
+    Devuelve True si terminó bien; False si falló o si mientras tanto el
+    trabajo pasó a otro trabajador (entonces no se escribe nada).
+    """
+    definicion = TAREAS.get(trabajo.tarea)
+    try:
+        if definicion is None:
+            raise LookupError(f"Tarea no registrada: {trabajo.tarea}")
+        resultado = definicion.funcion(trabajo, **trabajo.parametros)
+        # Un resultado que no se puede guardar como JSON también es un fallo de la tarea
+        resultado = json.loads(json.dumps(resultado, cls=DjangoJSONEncoder))
+    except Exception:
+        ahora = timezone.now()
+        reintentar = definicion is not None and trabajo.intentos < trabajo.max_intentos
+        logger.exception("Trabajo %s (%s) falló en el intento %s", trabajo.pk, trabajo.tarea, trabajo.intentos)
+        if not _reclamado(trabajo).update(
+            estado='PENDIENTE' if reintentar else 'FALLIDO',
+            error=traceback.format_exc(),
+            disponible_desde=ahora + _espera_reintento(trabajo.intentos) if reintentar else F('disponible_desde'),
+            fecha_fin=None if reintentar else ahora,
+        ):
+            logger.warning("Trabajo %s: ya no pertenece a %s, se descarta su error", trabajo.pk, trabajo.trabajador)
+        return False
+    if not _reclamado(trabajo).update(
+        estado='COMPLETADO',
+        progreso=1,
+        resultado=resultado,
+        error='',
+        fecha_fin=timezone.now(),
+    ):
+        logger.warning("Trabajo %s: ya no pertenece a %s, se descarta su resultado", trabajo.pk, trabajo.trabajador)
+        return False
+    return True
+
+def latir(pks):
+    """Marca como vivos los trabajos en ejecución de este trabajador"""
+    if pks:
+        Trabajo.objects.filter(pk__in=pks, estado='EN_CURSO').update(latido=timezone.now())
+
+def rescatar_abandonados():
+    """Devuelve a la cola (o da por fallidos) los trabajos cuyo trabajador dejó de latir"""
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'TRABAJOS_LATIDO_VENCIDO_SEGUNDOS', 300))
+    abandonados = Trabajo.objects.filter(estado='EN_CURSO').filter(Q(latido__lt=limite) | Q(latido__isnull=True))
+    error = 'El trabajador dejó de responder'
+    reintentables = abandonados.filter(intentos__lt=F('max_intentos')).update(
+        estado='PENDIENTE', error=error, disponible_desde=timezone.now()
+    )
+    fallidos = abandonados.update(estado='FALLIDO', error=error, fecha_fin=timezone.now())
+    return reintentables + fallidos
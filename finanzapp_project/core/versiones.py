@@ -0,0 +1,23 @@
+"""Tokens de versión en la caché de Django para invalidar cachés derivadas.
+
+Las cachés de reportes incluyen el token en su clave: al cambiar los datos de
+origen basta con renovar el token y las entradas anteriores dejan de leerse
+(expiran solas). ``propietario_id`` separa los tokens de cada hogar.
+"""
+import uuid
+
+from django.core.cache import cache
+
+def _clave(espacio, propietario_id):
+    return f'core:version:{espacio}:{propietario_id}'
+
+def version(espacio, propietario_id=None):
+    clave = _clave(espacio, propietario_id)
+    valor = cache.get(clave)
+    if valor is None:
+        cache.add(clave, uuid.uuid4().hex, timeout=None)
+        valor = cache.get(clave)
+    return valor
+
+def invalidar(espacio, propietario_id=None):
+    cache.set(_clave(espacio, propietario_id), uuid.uuid4().hex, timeout=None)
@@ -30,10 +30,12 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.InstrumentacionSQLMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.PerfiladorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -106,3 +108,87 @@ STATICFILES_FINDERS = [
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 WHITENOISE_USE_FINDERS = True
 WHITENOISE_AUTOREFRESH = True
+
+
+# Instrumentación SQL por petición (core.middleware.InstrumentacionSQLMiddleware)
+INSTRUMENTACION_LENTO_MS = 500
+INSTRUMENTACION_N_MAS_1 = 10
+
+# Perfilado a demanda (core.middleware.PerfiladorMiddleware): solo usuarios staff.
+# Cada perfil escribe archivos en disco: en producción habilitarlo solo mientras se investiga
+PERFILADOR_HABILITADO = DEBUG
+PERFILADOR_DIR = BASE_DIR / 'perfiles'
+PERFILADOR_INTERVALO_MS = 5
+
+# Antigüedad (días) a partir de la cual archivar_historico mueve movimientos y
+# pagos a las tablas de archivo. Debe superar las ventanas del dashboard (6 meses).
+ARCHIVO_HORIZONTE_DIAS = 730
+
+# Caché de Django. La versión del árbol de categorías en memoria (core.catalogo)
+# vive aquí: con varios procesos debe ser compartida (Redis, Memcached o base de
+# datos) para que una escritura invalide la copia de todos ellos.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Detección de gastos atípicos (core.anomalias, comando detectar_anomalias):
+# z robusto a partir del cual se alerta, meses de la ventana móvil para
+# mediana/MAD y observaciones mínimas de una línea base antes de alertar
+ANOMALIAS_UMBRAL = 3.5
+ANOMALIAS_VENTANA_MESES = 12
+ANOMALIAS_MINIMO_OBSERVACIONES = 8
+# Antigüedad mínima (segundos) de un movimiento para incorporarlo: debe superar
+# la duración de la transacción más larga que cree movimientos (lotes de la API)
+ANOMALIAS_RETRASO_SEGUNDOS = 60
+
+# Máximo de elementos por petición en las operaciones en lote de la API
+API_LOTE_MAXIMO = 1000
+
+# Sincronización incremental (core.sincronizacion): antigüedad mínima de una
+# fila de la bitácora para entregarla, mayor que la duración de sus inserciones
+SINCRONIZACION_RETRASO_SEGUNDOS = 5
+
+# Eventos del dashboard por SSE (core.eventos): broker que reparte los avisos
+# de cambio (el de memoria solo sirve con un único proceso ASGI), ventana en
+# la que se agrupan las escrituras seguidas y segundos entre latidos
+FINANZAPP_BROKER_EVENTOS = 'core.eventos.BrokerMemoria'
+EVENTOS_VENTANA_SEGUNDOS = 0.5
+EVENTOS_LATIDO_SEGUNDOS = 15
+
+# Cola de trabajos (core.trabajos, comando procesar_trabajos): directorio de
+# los archivos de resultado, espera base entre reintentos (se duplica en cada
+# intento) y segundos sin latido tras los que un trabajo en curso se da por abandonado
+TRABAJOS_DIR = BASE_DIR / 'trabajos'
+TRABAJOS_ESPERA_REINTENTO_SEGUNDOS = 30
+TRABAJOS_LATIDO_VENCIDO_SEGUNDOS = 300
+
+# JSON de la API (core.codificacion): orjson si está instalado, Decimal exactos
+# como texto ('texto') o como número ('numero', solo con orjson >= 3.9, que
+# trae orjson.Fragment; con versiones anteriores se escriben como texto) y
+# montos recibidos como Decimal
+FINANZAPP_JSON_DECIMALES = 'texto'
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.codificacion.RenderizadorJSON',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.codificacion.ParserJSON',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}